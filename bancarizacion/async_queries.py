@@ -0,0 +1,272 @@
+# C:\Users\willy\Projects\bancarizacion\bancarizacion\async_queries.py
+"""
+asyncio layer over the blocking data access functions of core_logic.
+mysql.connector is synchronous, so every query runs on a worker thread
+(asyncio.to_thread) with its own pooled connection; the event loop only
+schedules them. A large period can be split into sub-queries (one per
+almacen, per invoice id range or per month of a range) that run
+concurrently up to a cap, are retried independently, and are merged back
+in a deterministic order.
+"""
+import functools
+import heapq
+import itertools
+import math
+from operator import itemgetter
+
+from bancarizacion.core_logic import (
+    db_session, fetch_data_from_db, fetch_positional_from_db, get_auxiliary_sales_data,
+    get_connection_pool, get_partition_probe, get_period_almacenes, get_sales_invoice_data
+)
+from bancarizacion.instrumentation import collect_call, get_collector
+from bancarizacion.query_builder import NULL_ALMACEN
+from bancarizacion.rowsets import PositionalRows
+
+DEFAULT_QUERY_CONCURRENCY = 4
+
+# Partitioning of a period query: every almacen with rows in the period, or
+# invoice id ranges of about DEFAULT_PARTITION_ROWS rows ('idFactura:ROWS' for another size)
+PARTITION_BY_ALMACEN = "almacen"
+PARTITION_BY_ID_RANGE = "idFactura"
+PARTITION_KEYS = (PARTITION_BY_ALMACEN, PARTITION_BY_ID_RANGE)
+DEFAULT_PARTITION_ROWS = 50000
+
+# A failed sub-query is run again up to DEFAULT_PARTITION_RETRIES times, after
+# RETRY_DELAY_SECONDS, doubled on every attempt
+DEFAULT_PARTITION_RETRIES = 2
+RETRY_DELAY_SECONDS = 1.0
+
+# Column each period query is ordered by, for the ordered merge of its partitions
+AUXILIARY_SALES_ORDER_COLUMN = "fechaDocumentoRespaldo"
+
+async def _in_thread(func, *args, label=None, **kwargs):
+    """
+    Runs func(*args, **kwargs) on a worker thread. Stage metrics are recorded
+    per thread, so the worker's records are merged into the caller's collector.
+    """
+    import asyncio
+
+    collector = get_collector()
+    if collector is None:
+        return await asyncio.to_thread(func, *args, **kwargs)
+    result, records = await asyncio.to_thread(collect_call, functools.partial(func, **kwargs), args)
+    collector.extend(records, label=label)
+    return result
+
+def _fetch_pooled(query, params, config_file_path, positional):
+    """Fetches a query with a connection borrowed from the pool for the call."""
+    with db_session(config_file_path) as cnx:
+        fetch_rows = fetch_positional_from_db if positional else fetch_data_from_db
+        return fetch_rows(cnx, query, params)
+
+async def fetch_data_from_db_async(query, params=None, config_file_path="db_config.ini", positional=False):
+    """Async counterpart of fetch_data_from_db, on a pooled connection. Returns the rows or None on error."""
+    return await _in_thread(_fetch_pooled, query, params, config_file_path, positional)
+
+async def get_sales_invoice_data_async(year, month, config_file_path="db_config.ini", label=None, **kwargs):
+    """
+    Async counterpart of get_sales_invoice_data (same keyword arguments).
+    Results are always fetched in full (stream=False): a streamed result
+    would keep its connection until consumed on the event loop thread.
+    """
+    kwargs['stream'] = False
+    return await _in_thread(get_sales_invoice_data, year, month, config_file_path, label=label, **kwargs)
+
+async def get_auxiliary_sales_data_async(year, month, config_file_path="db_config.ini", label=None, **kwargs):
+    """Async counterpart of get_auxiliary_sales_data (same keyword arguments, never streamed)."""
+    kwargs['stream'] = False
+    return await _in_thread(get_auxiliary_sales_data, year, month, config_file_path, label=label, **kwargs)
+
+async def gather_limited(calls, concurrency=DEFAULT_QUERY_CONCURRENCY):
+    """
+    Awaits the coroutines made by calls (callables without arguments), at
+    most concurrency at a time. Returns their results in the order of calls.
+    """
+    import asyncio
+
+    semaphore = asyncio.Semaphore(max(1, concurrency))
+
+    async def limited(call):
+        async with semaphore:
+            return await call()
+
+    return await asyncio.gather(*(limited(call) for call in calls))
+
+def merge_results(results, order_by=None):
+    """
+    Merges the results of partitioned sub-queries (lists of dicts or
+    PositionalRows with the same columns) in the order given. With order_by,
+    partitions that are each sorted by that column are merged into one
+    sorted result (stable: ties keep the partition order).
+    Returns None when any partition failed.
+    """
+    if any(result is None for result in results):
+        return None
+    positional = [result for result in results if isinstance(result, PositionalRows)]
+    if positional:
+        columns = positional[0].columns
+        if any(result.columns != columns for result in positional):
+            raise ValueError("Cannot merge partitions with different columns.")
+        partitions = [list(result) for result in results]
+        key = itemgetter(columns.index(order_by)) if order_by else None
+        merged = list(heapq.merge(*partitions, key=key) if key else itertools.chain.from_iterable(partitions))
+        return PositionalRows(columns, merged)
+    if order_by:
+        return list(heapq.merge(*results, key=itemgetter(order_by)))
+    return list(itertools.chain.from_iterable(results))
+
+def parse_partition_by(partition_by):
+    """
+    Splits a partition option ('almacen', 'idFactura' or 'idFactura:ROWS')
+    into (key, rows per partition). Raises ValueError for an unknown key.
+    """
+    key, _, rows = partition_by.partition(":")
+    if key not in PARTITION_KEYS:
+        raise ValueError(f"Unknown partition key '{key}', expected one of {', '.join(PARTITION_KEYS)}.")
+    if rows and key != PARTITION_BY_ID_RANGE:
+        raise ValueError(f"A partition size only applies to '{PARTITION_BY_ID_RANGE}'.")
+    partition_rows = int(rows) if rows else DEFAULT_PARTITION_ROWS
+    if partition_rows < 1:
+        raise ValueError("The partition size must be positive.")
+    return key, partition_rows
+
+def id_ranges(row_count, min_id, max_id, partition_rows=DEFAULT_PARTITION_ROWS):
+    """
+    Splits the invoice ids min_id..max_id into ranges (low inclusive, high
+    exclusive) of equal width, as many as needed for about partition_rows of
+    row_count rows each. Ids are not evenly spread, so sizes are approximate.
+    """
+    if not row_count or min_id is None:
+        return []
+    id_count = max_id - min_id + 1
+    width = math.ceil(id_count / max(1, min(math.ceil(row_count / partition_rows), id_count)))
+    return [(low, min(low + width, max_id + 1)) for low in range(min_id, max_id + 1, width)]
+
+async def with_retries(call, retries=DEFAULT_PARTITION_RETRIES, label=None):
+    """
+    Awaits call() (a data access coroutine returning None on error) and runs
+    it again, after a growing delay, until it succeeds or retries are used up.
+    """
+    import asyncio
+
+    for attempt in range(retries + 1):
+        result = await call()
+        if result is not None:
+            return result
+        if attempt < retries:
+            delay = RETRY_DELAY_SECONDS * 2 ** attempt
+            print(f"Sub-query {label or ''} failed, retrying in {delay:g}s ({attempt + 1}/{retries}).")
+            await asyncio.sleep(delay)
+    return None
+
+async def period_partitions(year, month, config_file_path="db_config.ini", partition_by=None, by_payment=False,
+                            retries=DEFAULT_PARTITION_RETRIES):
+    """
+    The sub-queries of a period as keyword arguments of the get_* functions:
+    [{}] for the whole period, one almacen=... per branch (NULL_ALMACEN for the
+    invoices without one), or id_range=...
+    ranges sized from the COUNT/MIN/MAX probe. Returns None when the lookup failed.
+    """
+    if partition_by is None:
+        return [{}]
+    key, partition_rows = parse_partition_by(partition_by)
+    label = f"{year}-{month:02d}"
+    if key == PARTITION_BY_ALMACEN:
+        almacenes = await with_retries(functools.partial(_in_thread, get_period_almacenes, year, month, config_file_path,
+                                                         by_payment=by_payment, label=label), retries, label)
+        if almacenes is None:
+            return None
+        return [{'almacen': NULL_ALMACEN if almacen is None else almacen} for almacen in almacenes]
+    probe = await with_retries(functools.partial(_in_thread, get_partition_probe, year, month, config_file_path,
+                                                 by_payment=by_payment, label=label), retries, label)
+    if probe is None:
+        return None
+    ranges = id_ranges(probe['rowCount'], probe['minId'], probe['maxId'], partition_rows)
+    print(f"Period {label}: {probe['rowCount']} rows, invoice ids {probe['minId']}-{probe['maxId']}, {len(ranges)} partitions.")
+    return [{'id_range': id_range} for id_range in ranges]
+
+def _partition_label(year, month, partition):
+    """Label of a sub-query in logs and stage metrics, e.g. '2025-03/almacen=2' or '2025-03/idFactura=1-5000'."""
+    label = f"{year}-{month:02d}"
+    if 'almacen' in partition:
+        label += f"/almacen={partition['almacen']}"
+    if 'id_range' in partition:
+        low, high = partition['id_range']
+        label += f"/idFactura={low}-{high - 1}"
+    return label
+
+def _query_concurrency(concurrency, config_file_path):
+    """The concurrency cap, never above the connection pool size (an exhausted pool fails instead of waiting)."""
+    return max(1, min(concurrency, get_connection_pool(config_file_path).pool_size))
+
+async def _fetch_period_partitioned(fetch, periods, config_file_path, partition_by, concurrency, order_by, by_payment, retries, kwargs):
+    """Fetches every (period, partition) sub-query and merges them: partitions by order_by, periods in order."""
+    if partition_by is not None:
+        parse_partition_by(partition_by)
+    concurrency = _query_concurrency(concurrency, config_file_path)
+    partitions = await gather_limited(
+        [functools.partial(period_partitions, year, month, config_file_path, partition_by, by_payment, retries)
+         for year, month in periods],
+        concurrency)
+    if any(period_partition is None for period_partition in partitions):
+        return None
+
+    sub_queries = []
+    for (year, month), period_partition in zip(periods, partitions):
+        for partition in period_partition:
+            if partition_by is not None and all(value is None for value in partition.values()):
+                # An empty filter would fetch the whole period again and duplicate its rows
+                raise ValueError(f"Partition {partition} of {year}-{month:02d} has no filter.")
+            label = _partition_label(year, month, partition)
+            call = functools.partial(fetch, year, month, config_file_path, label=label, **partition, **kwargs)
+            sub_queries.append(functools.partial(with_retries, call, retries, label))
+    print(f"Running {len(sub_queries)} sub-queries for {len(periods)} periods, at most {concurrency} at a time.")
+    results = await gather_limited(sub_queries, concurrency)
+
+    period_results = []
+    position = 0
+    for period_partition in partitions:
+        period_results.append(merge_results(results[position:position + len(period_partition)], order_by=order_by))
+        position += len(period_partition)
+    return merge_results(period_results)
+
+async def get_sales_invoice_data_partitioned(periods, config_file_path="db_config.ini", partition_by=None,
+                                             concurrency=DEFAULT_QUERY_CONCURRENCY, retries=DEFAULT_PARTITION_RETRIES, **kwargs):
+    """
+    Fetches the Contratos rows of several periods as concurrent sub-queries,
+    each period split by partition_by (see period_partitions) when given.
+    Rows are returned period by period, and per partition within a period.
+    kwargs are passed to get_sales_invoice_data (e.g. positional, accumulated).
+    Returns the merged rows, or None if any sub-query failed after its retries.
+    """
+    return await _fetch_period_partitioned(get_sales_invoice_data_async, periods, config_file_path, partition_by,
+                                           concurrency, None, False, retries, kwargs)
+
+async def get_auxiliary_sales_data_partitioned(periods, config_file_path="db_config.ini", partition_by=None,
+                                               concurrency=DEFAULT_QUERY_CONCURRENCY, retries=DEFAULT_PARTITION_RETRIES, **kwargs):
+    """
+    Fetches the Registro Auxiliar rows of several periods as concurrent
+    sub-queries, each period split by partition_by (see period_partitions)
+    when given. Invoice id ranges also bound the scan of historical invoices
+    (f.fechaFac < end of year) that makes the single query slow. Within a
+    period the partitions are merged by invoice date, like ORDER BY f.fechaFac
+    of the single query. kwargs are passed to get_auxiliary_sales_data.
+    Returns the merged rows, or None if any sub-query failed after its retries.
+    """
+    return await _fetch_period_partitioned(get_auxiliary_sales_data_async, periods, config_file_path, partition_by,
+                                           concurrency, AUXILIARY_SALES_ORDER_COLUMN, True, retries, kwargs)
+
+def run_async(coroutine, max_threads=DEFAULT_QUERY_CONCURRENCY):
+    """
+    Runs a coroutine of this module from synchronous code (e.g. a pipeline
+    thread) on a new event loop whose worker threads are capped at max_threads.
+    """
+    import asyncio
+    from concurrent.futures import ThreadPoolExecutor
+
+    async def with_executor():
+        loop = asyncio.get_running_loop()
+        loop.set_default_executor(ThreadPoolExecutor(max_workers=max(1, max_threads), thread_name_prefix="query"))
+        return await coroutine
+
+    return asyncio.run(with_executor())
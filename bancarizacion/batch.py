@@ -0,0 +1,109 @@
+# C:\Users\willy\Projects\bancarizacion\bancarizacion\batch.py
+"""
+Multi-period batch execution for the Bancarizacion pipelines.
+Runs every (pipeline, period) pair on a bounded thread pool, limits how many
+of them hit the database at the same time and reports per-period timings.
+"""
+import re
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from bancarizacion.instrumentation import collect_call, get_collector
+
+DEFAULT_WORKERS = 4
+DEFAULT_DB_CONCURRENCY = 2
+
+_PERIOD_PATTERN = re.compile(r"^(\d{4})-(\d{1,2})$")
+
+def parse_period(period_text):
+    """Parses a 'YYYY-MM' string into a (year, month) tuple."""
+    match = _PERIOD_PATTERN.match(period_text.strip())
+    if not match:
+        raise ValueError(f"Invalid period '{period_text}'. Expected format YYYY-MM (e.g. 2024-01).")
+    year, month = int(match.group(1)), int(match.group(2))
+    if not 1 <= month <= 12:
+        raise ValueError(f"Invalid month in period '{period_text}'.")
+    return year, month
+
+def iter_periods(start_period, end_period):
+    """Yields every (year, month) from start_period to end_period, both included."""
+    year, month = start_period
+    if (year, month) > tuple(end_period):
+        raise ValueError(f"Period range is empty: {year}-{month:02d} is after {end_period[0]}-{end_period[1]:02d}.")
+    while (year, month) <= tuple(end_period):
+        yield year, month
+        month += 1
+        if month > 12:
+            year, month = year + 1, 1
+
+def pipeline_status(result):
+    """Maps a pipeline return value (output path, None when empty, False on failure) to a status."""
+    if result is False:
+        return "failed"
+    if result is None:
+        return "empty"
+    return "ok"
+
+def run_period_batch(periods, pipelines, max_workers=DEFAULT_WORKERS, db_concurrency=DEFAULT_DB_CONCURRENCY):
+    """
+    Runs every pipeline for every period concurrently.
+
+    Args:
+        periods (list): (year, month) tuples
+        pipelines (dict): Pipeline name -> callable(year, month) returning the output path,
+            None when there were no records, or False on failure
+        max_workers (int): Size of the worker pool
+        db_concurrency (int): Maximum number of pipelines querying the database at once
+
+    Returns:
+        list: One dict per (pipeline, period) with status, output, seconds, wait_seconds
+              (time spent waiting for a database slot) and error, in submission order
+    """
+    db_slots = threading.BoundedSemaphore(max(1, db_concurrency))
+    # Stage metrics of each run are merged into the caller's collector, if any
+    collector = get_collector()
+
+    def run_one(pipeline_name, pipeline, year, month):
+        queued_at = time.perf_counter()
+        entry = {'pipeline': pipeline_name, 'period': f"{year}-{month:02d}", 'output': None, 'error': None}
+        # The rows are streamed from the database into the writer, so the
+        # connection is held for the whole pipeline run
+        with db_slots:
+            start = time.perf_counter()
+            entry['wait_seconds'] = start - queued_at
+            try:
+                if collector is not None:
+                    result, records = collect_call(pipeline, (year, month))
+                    collector.extend(records, label=f"{pipeline_name} {entry['period']}")
+                else:
+                    result = pipeline(year, month)
+                entry['status'] = pipeline_status(result)
+                if entry['status'] == "ok":
+                    entry['output'] = result
+            except Exception as e:
+                entry['status'] = "failed"
+                entry['error'] = str(e)
+            entry['seconds'] = time.perf_counter() - start
+        return entry
+
+    with ThreadPoolExecutor(max_workers=max(1, max_workers), thread_name_prefix="periodo") as executor:
+        futures = [
+            executor.submit(run_one, pipeline_name, pipeline, year, month)
+            for year, month in periods
+            for pipeline_name, pipeline in pipelines.items()
+        ]
+        return [future.result() for future in futures]
+
+def print_batch_report(results, total_seconds=None):
+    """Prints the per-period timing table of a batch run."""
+    print("\n--- Batch Summary ---")
+    print(f"{'PERIOD':<10}{'PIPELINE':<14}{'STATUS':<9}{'SECONDS':>9}{'WAIT':>8}  OUTPUT / ERROR")
+    for entry in sorted(results, key=lambda item: (item['period'], item['pipeline'])):
+        detail = entry['error'] or entry['output'] or ''
+        print(f"{entry['period']:<10}{entry['pipeline']:<14}{entry['status']:<9}{entry['seconds']:>9.2f}{entry['wait_seconds']:>8.2f}  {detail}")
+    failed = sum(1 for entry in results if entry['status'] == "failed")
+    summary = f"{len(results)} runs, {failed} failed"
+    if total_seconds is not None:
+        summary += f", total wall time {total_seconds:.2f}s"
+    print(summary)
@@ -0,0 +1,227 @@
+# C:\Users\willy\Projects\bancarizacion\bancarizacion\chunked_output.py
+"""
+Split outputs for very large periods (e.g. annual exports).
+Rows are cut into chunks by row count and/or by a grouping key (a column
+such as almacen, or the week/month of a date column). Chunks go to
+separate files, written in parallel in a process pool since XLSX
+serialization is CPU bound, or to the sheets of one workbook. A JSON
+manifest lists every chunk with its file, sheet, key and row count.
+"""
+import json
+import os
+import re
+import time
+from concurrent.futures import FIRST_COMPLETED, wait
+from datetime import date, datetime
+
+from bancarizacion.core_logic import as_positional, populate_excel_from_template, write_output
+from bancarizacion.instrumentation import collect_call, get_collector, stage
+from bancarizacion.output_writers import DEFAULT_OUTPUT_FORMAT, XLSX_MAX_ROWS
+
+SPLIT_FILES = "files"
+SPLIT_SHEETS = "sheets"
+
+# Derived keys of a date column, used as 'column:week' or 'column:month'
+DATE_GROUPINGS = {
+    'week': lambda value: "{}-W{:02d}".format(*value.isocalendar()[:2]),
+    'month': lambda value: f"{value.year}-{value.month:02d}",
+}
+
+MANIFEST_SUFFIX = "_manifest.json"
+_INVALID_SHEET_CHARS = re.compile(r"[\[\]:*?/\\]")
+
+def group_key_function(headers, group_by):
+    """
+    Returns a function computing the chunk key of a row tuple.
+    group_by is a column name (e.g. 'almacen') or 'column:week' /
+    'column:month' for the ISO week or month of a date column.
+    """
+    column, _, grouping = group_by.partition(":")
+    if column not in headers:
+        raise ValueError(f"Unknown column '{column}' to split by, expected one of {', '.join(headers)}.")
+    index = headers.index(column)
+    if not grouping:
+        return lambda row: row[index]
+    if grouping not in DATE_GROUPINGS:
+        raise ValueError(f"Unknown grouping '{grouping}', expected one of {', '.join(DATE_GROUPINGS)}.")
+    derive = DATE_GROUPINGS[grouping]
+    return lambda row: derive(row[index]) if isinstance(row[index], (date, datetime)) else None
+
+def _label(key):
+    """File-name friendly form of a chunk key."""
+    return re.sub(r"[^\w.-]+", "_", str(key)).strip("_") or "none"
+
+def iter_chunks(rows, headers, max_rows=None, group_by=None):
+    """
+    Yields (label, key, rows) chunks.
+    Without group_by the rows are streamed in chunks of max_rows. With
+    group_by every row is first assigned to its group (groups are kept in
+    memory, ordered by key) and groups larger than max_rows are cut into parts.
+    """
+    if group_by is None:
+        chunk = []
+        part = 0
+        for row in rows:
+            chunk.append(row)
+            if max_rows and len(chunk) >= max_rows:
+                part += 1
+                yield f"part{part:03d}", None, chunk
+                chunk = []
+        if chunk:
+            part += 1
+            yield f"part{part:03d}", None, chunk
+        return
+
+    key_of = group_key_function(headers, group_by)
+    groups = {}
+    for row in rows:
+        groups.setdefault(key_of(row), []).append(row)
+    for key in sorted(groups, key=lambda key: (key is None, str(key))):
+        group_rows = groups.pop(key)
+        if not max_rows or len(group_rows) <= max_rows:
+            yield _label(key), key, group_rows
+            continue
+        for part, start in enumerate(range(0, len(group_rows), max_rows), start=1):
+            yield f"{_label(key)}_part{part:03d}", key, group_rows[start:start + max_rows]
+
+def write_chunk_file(rows, headers, output_file_path, output_format, template_file_path=None):
+    """
+    Writes one chunk to its own file (with the template when given).
+    Module-level so it can run in a process pool. Returns the number of rows.
+    """
+    if template_file_path:
+        written = populate_excel_from_template(rows, template_file_path, output_file_path, headers, write_only=True)
+    else:
+        written = write_output(rows, output_file_path, output_format, headers=headers)
+    if not written:
+        raise IOError(f"Failed to write {output_file_path}")
+    return len(rows)
+
+def _sheet_title(label, used_titles):
+    """A valid, unique sheet title (at most 31 characters) for a chunk label."""
+    base_title = _INVALID_SHEET_CHARS.sub("_", label)[:31] or "Sheet"
+    title = base_title
+    number = 1
+    while title.lower() in used_titles:
+        number += 1
+        title = f"{base_title[:27]} ({number})"
+    used_titles.add(title.lower())
+    return title
+
+def write_chunk_sheets(chunks, headers, output_file_path):
+    """Writes every chunk to its own sheet of one write-only workbook. Returns the manifest entries."""
+    import openpyxl
+
+    workbook = openpyxl.Workbook(write_only=True)
+    used_titles = set()
+    entries = []
+    with stage("write_rows") as write_stage:
+        for label, key, rows in chunks:
+            sheet = workbook.create_sheet(title=_sheet_title(label, used_titles))
+            sheet.append(list(headers))
+            for row in rows:
+                sheet.append(row)
+            entries.append({'file': os.path.basename(output_file_path), 'sheet': sheet.title, 'key': key, 'rows': len(rows)})
+        write_stage.rows = sum(entry['rows'] for entry in entries)
+    with stage("save"):
+        workbook.save(output_file_path)
+    return entries
+
+def _write_chunk_files(chunks, headers, output_file_path, output_format, template_file_path, max_workers):
+    """
+    Writes the chunks to separate files in a process pool, keeping at most
+    two chunks per worker in flight so a streamed input is not read ahead
+    without bound. Returns the manifest entries in chunk order.
+    """
+    from concurrent.futures import ProcessPoolExecutor
+
+    base_path, extension = os.path.splitext(output_file_path)
+    collector = get_collector()
+    max_workers = max(1, max_workers or os.cpu_count() or 1)
+    entries = []
+    pending = {}
+    with ProcessPoolExecutor(max_workers=max_workers) as executor:
+        for label, key, rows in chunks:
+            chunk_path = f"{base_path}_{label}{extension}"
+            args = (rows, headers, chunk_path, output_format, template_file_path)
+            future = executor.submit(collect_call, write_chunk_file, args) if collector is not None else executor.submit(write_chunk_file, *args)
+            entry = {'file': os.path.basename(chunk_path), 'sheet': None, 'key': key, 'rows': len(rows)}
+            entries.append(entry)
+            pending[future] = entry
+            if len(pending) >= 2 * max_workers:
+                done, _ = wait(pending, return_when=FIRST_COMPLETED)
+                for future in done:
+                    _collect_chunk(future, pending.pop(future), collector)
+        for future in list(pending):
+            _collect_chunk(future, pending.pop(future), collector)
+    return entries
+
+def _collect_chunk(future, entry, collector):
+    """Raises the error of a failed chunk and merges its stage metrics."""
+    result = future.result()
+    if collector is not None:
+        _, records = result
+        collector.extend(records, label=entry['file'])
+
+def write_chunked(data_rows, output_file_path, output_format=DEFAULT_OUTPUT_FORMAT, headers=None, max_rows=None,
+                  group_by=None, split_into=SPLIT_FILES, max_workers=None, template_file_path=None):
+    """
+    Writes rows in chunks and a manifest describing them.
+
+    Args:
+        data_rows (iterable): Rows as dicts, tuples in the order of headers, or a PositionalRows
+        output_file_path (str): Path of the unsplit output; chunk files are named
+            '<name>_<chunk label><extension>' and the manifest '<name>_manifest.json'
+        output_format (str): "xlsx", "csv" or "parquet" ("sheets" requires xlsx)
+        headers (list, optional): Column names, required for tuple rows
+        max_rows (int, optional): Maximum data rows per chunk (capped at the XLSX sheet limit for xlsx)
+        group_by (str, optional): Column, or 'column:week' / 'column:month', to split by
+        split_into (str): SPLIT_FILES (parallel) or SPLIT_SHEETS (one workbook)
+        max_workers (int, optional): Worker processes for SPLIT_FILES. Defaults to the number of CPUs.
+        template_file_path (str, optional): Excel template filled for every chunk file
+
+    Returns:
+        str: Path of the manifest, None when there are no rows, or False on failure
+    """
+    try:
+        if split_into not in (SPLIT_FILES, SPLIT_SHEETS):
+            raise ValueError(f"Unknown split '{split_into}', expected '{SPLIT_FILES}' or '{SPLIT_SHEETS}'.")
+        if split_into == SPLIT_SHEETS and (output_format != "xlsx" or template_file_path):
+            raise ValueError("Splitting into sheets needs the xlsx format without a template.")
+        headers, rows = as_positional(data_rows, headers)
+        if rows is None:
+            print("No data to write.")
+            return None
+        if output_format == "xlsx":
+            max_rows = min(max_rows or XLSX_MAX_ROWS - 1, XLSX_MAX_ROWS - 1)
+
+        output_dir = os.path.dirname(output_file_path)
+        if output_dir and not os.path.exists(output_dir):
+            os.makedirs(output_dir)
+            print(f"Created directory: {output_dir}")
+
+        start = time.perf_counter()
+        chunks = iter_chunks(rows, headers, max_rows=max_rows, group_by=group_by)
+        if split_into == SPLIT_SHEETS:
+            entries = write_chunk_sheets(chunks, headers, output_file_path)
+        else:
+            entries = _write_chunk_files(chunks, headers, output_file_path, output_format, template_file_path, max_workers)
+
+        manifest = {
+            'created': datetime.now().isoformat(timespec="seconds"),
+            'format': output_format,
+            'split_into': split_into,
+            'max_rows': max_rows,
+            'group_by': group_by,
+            'columns': list(headers),
+            'total_rows': sum(entry['rows'] for entry in entries),
+            'chunks': entries,
+        }
+        manifest_path = os.path.splitext(output_file_path)[0] + MANIFEST_SUFFIX
+        with open(manifest_path, "w", encoding="utf-8") as manifest_file:
+            json.dump(manifest, manifest_file, indent=1, default=str)
+        print(f"Wrote {manifest['total_rows']} rows in {len(entries)} chunks ({split_into}) in {time.perf_counter() - start:.2f}s, manifest: {manifest_path}")
+        return manifest_path
+    except Exception as e:
+        print(f"Error writing split output: {e}")
+        return False
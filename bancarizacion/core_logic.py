@@ -5,28 +5,77 @@ This module will handle database interactions, data processing,
 and Excel file generation.
 """
 import configparser
+import glob
+import itertools
 import os
-import mysql.connector
-import openpyxl # For reading/writing .xlsx files
+import threading
+import time
+from contextlib import contextmanager
 from datetime import datetime # Added for potential use, though timestamp generation is in main.py for this feature
+from bancarizacion.excel_templates import get_excel_template
+from bancarizacion.result_cache import format_period, load_cache_config
+from bancarizacion.rowsets import PositionalRows
+from bancarizacion.output_writers import OUTPUT_WRITERS, DEFAULT_OUTPUT_FORMAT, XLSX_MAX_ROWS
+from bancarizacion.instrumentation import stage, add_time, collect_call, get_collector
+from bancarizacion.query_builder import (
+    build_sales_invoice_query, build_auxiliary_sales_query, build_invoice_status_query,
+    build_reconciliation_payments_query, build_bank_extracts_query, advise_indexes,
+    build_payment_summary_tables, build_payment_summary_refresh, build_payment_summary_periods_query,
+    build_first_payment_query, build_period_almacenes_query, build_partition_probe_query,
+    build_invoice_documents_query, build_invoice_payments_query, build_invoice_rows_query, build_statement_lines_query
+)
+from bancarizacion.batch import iter_periods
+from bancarizacion.incremental import (
+    SNAPSHOT_DIR, SNAPSHOT_SPECS, PeriodSnapshot,
+    invoice_status_signature, changed_invoices, advance_watermarks, merge_snapshot_rows
+)
+from bancarizacion.join_snapshot import (
+    AUXILIARY_SALES_COLUMNS, JoinSnapshot, pending_invoice_ids, merge_snapshot_documents,
+    invoice_documents, join_auxiliary_rows
+)
 
-def get_db_config_core(config_file_path="db_config.ini"):
-    """Reads database configuration from an INI file for core logic."""
-    # Correctly locate db_config.ini relative to the project root
+DEFAULT_POOL_SIZE = 5
+
+# One connection pool per configuration file, shared by every get_* call in the process
+_CONNECTION_POOLS = {}
+_POOLS_LOCK = threading.Lock()
+
+# Result caches per configuration file (None when the [cache] section is absent or disabled)
+_RESULT_CACHES = {}
+
+# Serializes refreshes and reads of the join snapshot files between pipeline threads
+_JOIN_SNAPSHOT_LOCK = threading.Lock()
+
+def _resolve_config_path(config_file_path):
+    """Locates a configuration file relative to the project root when the path is not absolute."""
     # Assumes core_logic.py is in 'bancarizacion' subdirectory
     if not os.path.isabs(config_file_path):
         project_root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
         config_file_path = os.path.join(project_root, config_file_path)
+    return config_file_path
+
+def _read_mysql_config(config_file_path):
+    """Parses the INI file and returns (config, resolved path) after checking the [mysql] section."""
+    config_file_path = _resolve_config_path(config_file_path)
 
     if not os.path.exists(config_file_path):
         raise FileNotFoundError(f"Configuration file {config_file_path} not found.")
 
     config = configparser.ConfigParser()
-    config.read(config_file_path)
+    with stage("config_load"):
+        config.read(config_file_path)
 
     if 'mysql' not in config:
         raise ValueError(f"[mysql] section not found in {config_file_path}.")
-    
+    return config, config_file_path
+
+def get_db_config_core(config_file_path="db_config.ini"):
+    """Reads database configuration from an INI file for core logic."""
+    config, config_file_path = _read_mysql_config(config_file_path)
+    return _db_params_from_config(config, config_file_path)
+
+def _db_params_from_config(config, config_file_path):
+    """Extracts the connection parameters from the [mysql] section."""
     db_params = {}
     try:
         db_params['host'] = config.get('mysql', 'host')
@@ -41,12 +90,15 @@ def get_db_config_core(config_file_path="db_config.ini"):
 
 def connect_to_db(db_config_params):
     """Connects to the MySQL database using a dictionary of parameters."""
+    import mysql.connector
+
     try:
         # Ensure port is treated as integer if it's a string coming from certain configs
         if 'port' in db_config_params and isinstance(db_config_params['port'], str):
             db_config_params['port'] = int(db_config_params['port'])
             
-        cnx = mysql.connector.connect(**db_config_params)
+        with stage("connect"):
+            cnx = mysql.connector.connect(**db_config_params)
         print(f"Successfully connected to database: {db_config_params.get('database')} on host {db_config_params.get('host')}:{db_config_params.get('port')}")
         return cnx
     except mysql.connector.Error as err:
@@ -57,14 +109,90 @@ def connect_to_db(db_config_params):
         print(f"Configuration error for database connection: {ve}")
         raise # Re-raise for caller to handle
 
-def fetch_data_from_db(cnx, query, params=None):
-    """Fetches data from the database using a SELECT query and parameters."""
+def get_connection_pool(config_file_path="db_config.ini"):
+    """
+    Returns the connection pool for a configuration file, creating it on first use.
+    The pool size is read from the optional 'pool_size' option of the [mysql] section.
+    """
+    from mysql.connector import pooling
+
+    pool_key = os.path.normcase(os.path.abspath(_resolve_config_path(config_file_path)))
+    with _POOLS_LOCK:
+        pool = _CONNECTION_POOLS.get(pool_key)
+        if pool is None:
+            config, resolved_path = _read_mysql_config(config_file_path)
+            db_params = _db_params_from_config(config, resolved_path)
+            try:
+                pool_size = config.getint('mysql', 'pool_size', fallback=DEFAULT_POOL_SIZE)
+            except ValueError as e:
+                raise ValueError(f"Invalid pool_size in [mysql] section of {resolved_path}: {e}")
+            if not 1 <= pool_size <= pooling.CNX_POOL_MAXSIZE:
+                raise ValueError(f"pool_size must be between 1 and {pooling.CNX_POOL_MAXSIZE}, got {pool_size}.")
+            pool = pooling.MySQLConnectionPool(
+                pool_name=f"bancarizacion_{len(_CONNECTION_POOLS) + 1}",
+                pool_size=pool_size,
+                **db_params
+            )
+            print(f"Created connection pool ({pool_size} connections) for database: {db_params.get('database')} on host {db_params.get('host')}:{db_params.get('port')}")
+            _CONNECTION_POOLS[pool_key] = pool
+    return pool
+
+def get_result_cache(config_file_path="db_config.ini"):
+    """
+    Returns the result cache configured in the optional [cache] section of the
+    configuration file, or None when caching is not configured.
+    """
+    cache_key = os.path.normcase(os.path.abspath(_resolve_config_path(config_file_path)))
+    with _POOLS_LOCK:
+        if cache_key not in _RESULT_CACHES:
+            config, _ = _read_mysql_config(config_file_path)
+            project_root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+            _RESULT_CACHES[cache_key] = load_cache_config(config, project_root)
+        return _RESULT_CACHES[cache_key]
+
+def get_pooled_connection(config_file_path="db_config.ini"):
+    """Gets a connection from the shared pool. Calling close() on it returns it to the pool."""
+    with stage("connect"):
+        return get_connection_pool(config_file_path).get_connection()
+
+@contextmanager
+def db_session(config_file_path="db_config.ini"):
+    """
+    Context manager that lends a pooled connection for several get_* calls, e.g.:
+
+        with db_session(config_file) as cnx:
+            get_sales_invoice_data(2025, 3, cnx=cnx)
+            get_auxiliary_sales_data(2025, 3, cnx=cnx)
+    """
+    cnx = get_pooled_connection(config_file_path)
+    try:
+        yield cnx
+    finally:
+        cnx.close()
+
+def fetch_data_from_db(cnx, query, params=None, cache=None, period=None):
+    """
+    Fetches data from the database using a SELECT query and parameters.
+    When a ResultCache is given, it is checked first and filled after a
+    database fetch; period ('YYYY-MM') tags the entry so it can be pinned.
+    """
+    import mysql.connector
+
+    if cache is not None:
+        cached_rows = cache.get(query, params)
+        if cached_rows is not None:
+            return cached_rows
     cursor = None
     try:
         cursor = cnx.cursor(dictionary=True) # dictionary=True to get results as dicts
-        cursor.execute(query, params)
-        results = cursor.fetchall()
+        with stage("query_execute"):
+            cursor.execute(query, params)
+        with stage("fetch") as fetch_stage:
+            results = cursor.fetchall()
+            fetch_stage.rows = len(results)
         print(f"Fetched {len(results)} rows.")
+        if cache is not None:
+            cache.put(query, params, results, period=period)
         return results
     except mysql.connector.Error as err:
         print(f"Error fetching data: {err}")
@@ -73,6 +201,183 @@ def fetch_data_from_db(cnx, query, params=None):
         if cursor:
             cursor.close()
 
+def fetch_positional_from_db(cnx, query, params=None, cache=None, period=None):
+    """
+    Like fetch_data_from_db, but returns a PositionalRows (column names plus
+    one tuple per row) instead of a list of dicts. Returns None on error.
+    """
+    import mysql.connector
+
+    if cache is not None:
+        cached_rows = cache.get(query, params, positional=True)
+        if cached_rows is not None:
+            return cached_rows
+    cursor = None
+    try:
+        cursor = cnx.cursor()
+        with stage("query_execute"):
+            cursor.execute(query, params)
+        with stage("fetch") as fetch_stage:
+            results = PositionalRows(cursor.column_names, cursor.fetchall())
+            fetch_stage.rows = len(results)
+        print(f"Fetched {len(results)} rows.")
+        if cache is not None:
+            cache.put(query, params, results, period=period)
+        return results
+    except mysql.connector.Error as err:
+        print(f"Error fetching data: {err}")
+        return None
+    finally:
+        if cursor:
+            cursor.close()
+
+def execute_statements(cnx, statements):
+    """
+    Runs (query, params) statements that modify data in one transaction.
+    Returns True when they were committed, False (after a rollback) on error.
+    """
+    import mysql.connector
+
+    cursor = None
+    try:
+        cursor = cnx.cursor()
+        with stage("query_execute"):
+            for query, params in statements:
+                cursor.execute(query, params)
+        cnx.commit()
+        return True
+    except mysql.connector.Error as err:
+        print(f"Error executing statements: {err}")
+        cnx.rollback()
+        return False
+    finally:
+        if cursor:
+            cursor.close()
+
+def _close_streaming_cursor(cursor):
+    import mysql.connector
+
+    try:
+        cursor.close()
+    except mysql.connector.Error as err:
+        # Happens when the consumer stops before reading every row
+        print(f"Error closing streaming cursor: {err}")
+
+def _read_cursor_batches(cursor, query, params, batch_size, cache=None, period=None, columns=None):
+    """
+    Yields the rows of an executed unbuffered cursor, batch_size rows at a
+    time, and closes it. When a ResultCache is given, each batch is also
+    appended to its cache entry, which is stored once the query has been
+    read completely; columns is the header of positional (tuple) rows.
+    """
+    total_rows = 0
+    fetch_seconds = 0.0
+    cache_writer = cache.writer(query, params, columns=columns, period=period) if cache is not None else None
+    try:
+        while True:
+            fetch_start = time.perf_counter()
+            rows = cursor.fetchmany(batch_size)
+            fetch_seconds += time.perf_counter() - fetch_start
+            if not rows:
+                break
+            total_rows += len(rows)
+            if cache_writer is not None:
+                cache_writer.write(rows)
+            yield from rows
+        print(f"Streamed {total_rows} rows.")
+        # Only the time spent in fetchmany, not the time the consumer spent on the rows
+        add_time("fetch", fetch_seconds, total_rows)
+        if cache_writer is not None:
+            cache_writer.close()
+    finally:
+        if cache_writer is not None:
+            cache_writer.abort()
+        _close_streaming_cursor(cursor)
+
+def iter_data_from_db(cnx, query, params=None, batch_size=1000, cache=None, period=None):
+    """
+    Streams the rows of a SELECT query instead of loading them all at once.
+    Uses an unbuffered cursor and fetchmany(batch_size), so only one batch
+    of rows is held in memory at a time.
+    The query is executed right away, so its errors are raised to the
+    caller, and a generator of the rows is returned.
+    When a ResultCache is given, every batch is also appended to its cache
+    entry, which is stored once the query has been read completely.
+    """
+    cursor = cnx.cursor(dictionary=True, buffered=False)
+    try:
+        with stage("query_execute"):
+            cursor.execute(query, params)
+    except BaseException:
+        _close_streaming_cursor(cursor)
+        raise
+    return _read_cursor_batches(cursor, query, params, batch_size, cache=cache, period=period)
+
+def stream_positional_from_db(cnx, query, params=None, batch_size=1000, cache=None, period=None):
+    """
+    Positional counterpart of iter_data_from_db. The query is executed right
+    away (so the column names are known) and a PositionalRows is returned
+    whose tuples are read from an unbuffered cursor as they are iterated.
+    """
+    cursor = cnx.cursor(buffered=False)
+    try:
+        with stage("query_execute"):
+            cursor.execute(query, params)
+        columns = cursor.column_names
+    except BaseException:
+        _close_streaming_cursor(cursor)
+        raise
+    return PositionalRows(columns, _read_cursor_batches(cursor, query, params, batch_size, cache=cache, period=period, columns=columns))
+
+def _close_after(rows, cnx, caller_name):
+    """Yields rows and releases the connection once they are consumed."""
+    try:
+        yield from rows
+    finally:
+        if cnx and cnx.is_connected():
+            cnx.close()
+            print(f"Database connection released for {caller_name}.")
+
+def _release_when_consumed(data_rows, cnx, caller_name):
+    """Wraps streamed rows (a generator or a PositionalRows) so the connection is released once they are consumed."""
+    if isinstance(data_rows, PositionalRows):
+        return PositionalRows(data_rows.columns, _close_after(data_rows.rows, cnx, caller_name))
+    return _close_after(data_rows, cnx, caller_name)
+
+def peek_first_row(data_rows):
+    """
+    Returns the first row of any iterable of rows together with an iterator
+    that still yields every row (first one included). A PositionalRows is
+    returned as a PositionalRows, keeping its column names.
+    Returns (None, None) when there are no rows.
+    """
+    if data_rows is None:
+        return None, None
+    rows = iter(data_rows)
+    first_row = next(rows, None)
+    if first_row is None:
+        return None, None
+    rows = itertools.chain([first_row], rows)
+    if isinstance(data_rows, PositionalRows):
+        return first_row, PositionalRows(data_rows.columns, rows)
+    return first_row, rows
+
+def explain_query(cnx, query, params=None):
+    """Runs EXPLAIN on a SELECT query and returns the plan rows as dictionaries."""
+    import mysql.connector
+
+    cursor = None
+    try:
+        cursor = cnx.cursor(dictionary=True)
+        cursor.execute("EXPLAIN " + query.strip().rstrip(';'), params)
+        return cursor.fetchall()
+    except mysql.connector.Error as err:
+        print(f"Error running EXPLAIN: {err}")
+        return None
+    finally:
+        if cursor:
+            cursor.close()
+
 def process_data(data):
     """Processes the fetched data. (Placeholder)"""
     print("Processing data...")
@@ -85,41 +390,142 @@ def process_data(data):
     print("Data processing complete.")
     return processed
 
-def write_to_excel(data_rows, output_file_path):
-    """Writes the processed data to an Excel .xlsx file."""
-    if not data_rows:
-        print("No data to write to Excel.")
-        return
+def write_to_excel(data_rows, output_file_path, write_only=False, headers=None, max_sheet_rows=XLSX_MAX_ROWS):
+    """
+    Writes the processed data to an Excel .xlsx file.
+    data_rows can be a list or any iterable of dicts (e.g. a streaming fetch);
+    it is consumed row by row. Rows can also be tuples in the order of
+    headers, or a PositionalRows (its column names are the headers); they
+    are then appended as is, without a per-cell lookup.
+    With write_only=True, openpyxl's write-only workbook is used: rows are
+    serialized as they are appended instead of being kept as cell objects
+    until save, so memory stays flat for large exports.
+    A sheet holds at most max_sheet_rows rows (the XLSX limit by default,
+    headers included); the rows continue on new sheets (Sheet2, ...) with
+    the headers repeated.
+    Returns False when there are no rows, or when reading the rows (e.g. a
+    streaming fetch that fails midway) or writing the file fails.
+    """
+    import openpyxl
 
-    workbook = openpyxl.Workbook()
-    sheet = workbook.active
-    
-    # Write headers (column names from the first row of data)
-    headers = list(data_rows[0].keys())
-    sheet.append(headers)
-    
-    # Write data rows
-    for row in data_rows:
-        sheet.append([row.get(header) for header in headers])
-    
+    if headers is None and isinstance(data_rows, PositionalRows):
+        headers = data_rows.columns
     try:
+        first_row, rows = peek_first_row(data_rows)
+        if first_row is None:
+            print("No data to write to Excel.")
+            return False
+        positional = headers is not None and not isinstance(first_row, dict)
+
+        if write_only:
+            workbook = openpyxl.Workbook(write_only=True)
+            sheet = workbook.create_sheet()
+        else:
+            workbook = openpyxl.Workbook()
+            sheet = workbook.active
+
+        # Write headers (column names from the first row of data unless given)
+        if headers is None:
+            headers = list(first_row.keys())
+        sheet.append(list(headers))
+
+        # Write data rows
+        row_count = 0
+        sheet_rows = 1
+        sheet_number = 1
+        with stage("write_rows") as write_stage:
+            for row in rows:
+                if sheet_rows >= max_sheet_rows:
+                    sheet_number += 1
+                    sheet = workbook.create_sheet(title=f"Sheet{sheet_number}")
+                    sheet.append(list(headers))
+                    sheet_rows = 1
+                sheet.append(row if positional else [row.get(header) for header in headers])
+                sheet_rows += 1
+                row_count += 1
+            write_stage.rows = row_count
+
         # Ensure output directory exists
         output_dir = os.path.dirname(output_file_path)
         if not os.path.exists(output_dir):
             os.makedirs(output_dir)
             print(f"Created directory: {output_dir}")
 
-        workbook.save(output_file_path)
-        print(f"Data successfully written to {output_file_path}")
+        with stage("save"):
+            workbook.save(output_file_path)
+        print(f"Data successfully written to {output_file_path} ({row_count} rows" + (f" on {sheet_number} sheets)" if sheet_number > 1 else ")"))
+        return True
     except Exception as e:
         print(f"Error writing to Excel file: {e}")
+        return False
+
+def as_positional(data_rows, headers=None):
+    """
+    Returns (headers, iterator of tuples in headers order) for rows given as
+    dicts, tuples in the order of headers or a PositionalRows, or
+    (headers, None) when there are no rows. Headers default to the column
+    names of a PositionalRows or the keys of the first dict.
+    """
+    if headers is None and isinstance(data_rows, PositionalRows):
+        headers = data_rows.columns
+    first_row, rows = peek_first_row(data_rows)
+    if first_row is None:
+        return headers, None
+    if isinstance(first_row, dict):
+        if headers is None:
+            headers = list(first_row.keys())
+        rows = (tuple(row.get(header) for header in headers) for row in rows)
+    return (list(headers) if headers is not None else None), iter(rows)
+
+def write_output(data_rows, output_file_path, output_format=DEFAULT_OUTPUT_FORMAT, headers=None):
+    """
+    Writes rows in one of the output formats: "xlsx" (write_to_excel,
+    write-only), "csv" (SIAT text layout) or "parquet". Rows are accepted in
+    the same forms as write_to_excel (dicts, tuples in the order of headers
+    or a PositionalRows) and are streamed to the file.
+    Returns True on success, False when there are no rows or the write failed.
+    """
+    if output_format == "xlsx":
+        return write_to_excel(data_rows, output_file_path, write_only=True, headers=headers)
+    writer = OUTPUT_WRITERS.get(output_format)
+    if writer is None:
+        print(f"Unknown output format: {output_format}")
+        return False
+
+    headers, rows = as_positional(data_rows, headers)
+    if rows is None:
+        print(f"No data to write to {output_format}.")
+        return False
+
+    try:
+        output_dir = os.path.dirname(output_file_path)
+        if output_dir and not os.path.exists(output_dir):
+            os.makedirs(output_dir)
+            print(f"Created directory: {output_dir}")
+
+        with stage("write_rows") as write_stage:
+            row_count = writer(rows, headers, output_file_path)
+            write_stage.rows = row_count
+        print(f"Data successfully written to {output_file_path} ({row_count} rows)")
+        return True
+    except Exception as e:
+        print(f"Error writing {output_format} file: {e}")
+        return False
 
-def populate_excel_from_template(data_rows, template_file_path, output_file_path, column_order):
+def populate_excel_from_template(data_rows, template_file_path, output_file_path, column_order, write_only=False):
     """
     Populates an Excel template with data_rows and saves it to output_file_path.
     Assumes headers are already in the template and data should be appended after them.
+    data_rows can be a list or any iterable of dicts, or of tuples already in
+    column_order (e.g. from siat_mapping.map_rows); it is consumed row by row.
+    With write_only=True, the template is parsed once and cached (see
+    bancarizacion/excel_templates.py) and the rows are streamed into a
+    write-only workbook instead of loading the full template workbook.
     """
-    if not data_rows:
+    import openpyxl
+
+    first_row, rows = peek_first_row(data_rows)
+    if first_row is None:
         print("No data provided to populate Excel template.")
         return False
 
@@ -128,22 +534,36 @@ def populate_excel_from_template(data_rows, template_file_path, output_file_path
             print(f"Error: Template file not found at {template_file_path}")
             return False
 
-        workbook = openpyxl.load_workbook(template_file_path)
-        sheet = workbook.active  # Assumes data goes into the active sheet
-
-        # Append data rows based on the specified column_order
-        for record in data_rows:
-            row_values = [record.get(col_name, "") for col_name in column_order] # Use empty string for missing keys
-            sheet.append(row_values)
-        
         # Ensure output directory exists
         output_dir = os.path.dirname(output_file_path)
         if not os.path.exists(output_dir):
             os.makedirs(output_dir)
             print(f"Created directory: {output_dir}")
 
-        workbook.save(output_file_path)
-        print(f"Data successfully written to {output_file_path} using template {os.path.basename(template_file_path)}")
+        if write_only:
+            with stage("workbook_load"):
+                template = get_excel_template(template_file_path)
+            row_count = template.write(rows, output_file_path, column_order)
+        else:
+            with stage("workbook_load"):
+                workbook = openpyxl.load_workbook(template_file_path)
+            sheet = workbook.active  # Assumes data goes into the active sheet
+
+            # Append data rows based on the specified column_order
+            row_count = 0
+            with stage("write_rows") as write_stage:
+                for record in rows:
+                    if isinstance(record, dict):
+                        row_values = [record.get(col_name, "") for col_name in column_order] # Use empty string for missing keys
+                    else:
+                        row_values = record
+                    sheet.append(row_values)
+                    row_count += 1
+                write_stage.rows = row_count
+
+            with stage("save"):
+                workbook.save(output_file_path)
+        print(f"Data successfully written to {output_file_path} using template {os.path.basename(template_file_path)} ({row_count} rows)")
         return True
     except Exception as e:
         print(f"Error populating Excel template: {e}")
@@ -158,9 +578,10 @@ def run_bancarizacion_process(config_path, output_excel_path):
     4. Processes data.
     5. Writes data to Excel.
     """
+    import mysql.connector
+
     try:
-        db_params = get_db_config_core(config_file_path=config_path)
-        cnx = connect_to_db(db_config_params=db_params)
+        cnx = get_pooled_connection(config_file_path=config_path)
         
         if cnx and cnx.is_connected():
             # Placeholder query - replace with actual query logic
@@ -201,49 +622,54 @@ def run_bancarizacion_process(config_path, output_excel_path):
     finally:
         if 'cnx' in locals() and cnx and cnx.is_connected():
             cnx.close()
-            print("Database connection closed in run_bancarizacion_process.")
+            print("Database connection released in run_bancarizacion_process.")
 
-def get_sales_invoice_data(year, month, config_file_path="db_config.ini"):
+def get_sales_invoice_data(year, month, config_file_path="db_config.ini", stream=False, batch_size=1000, cnx=None, use_cache=True, positional=False, accumulated=False,
+                           almacen=None, id_range=None):
     """
     Fetches sales invoice data for a given year and month.
+    With stream=True, returns a generator that yields the rows in batches of
+    batch_size and releases the connection once it has been consumed.
+    An open connection (e.g. from db_session) can be passed as cnx; it is
+    left open. Otherwise a connection is taken from the shared pool.
+    When a [cache] section is configured and use_cache is True, cached
+    results are returned without connecting to the database.
+    With positional=True the rows come as a PositionalRows (column names
+    plus one tuple per row) instead of dicts.
+    With accumulated=True, accumulatedAmount is read from the payment summary
+    (see refresh_payment_summary, which should be run first).
+    almacen/id_range restrict the query to one branch / invoice id range (see async_queries for split periods).
     """
-    db_params = None
-    cnx = None
+    import mysql.connector
+
+    owns_connection = cnx is None
     try:
-        db_params = get_db_config_core(config_file_path=config_file_path)
-        cnx = connect_to_db(db_config_params=db_params)
+        query, params = build_sales_invoice_query(year, month, accumulated=accumulated, almacen=almacen, id_range=id_range)
+        cache = get_result_cache(config_file_path) if use_cache else None
+        period = format_period(year, month)
+        if cache is not None:
+            cached_rows = cache.iter_rows(query, params, batch_size, positional=positional) if stream else cache.get(query, params, positional=positional)
+            if cached_rows is not None:
+                return cached_rows
+
+        if owns_connection:
+            cnx = get_pooled_connection(config_file_path=config_file_path)
 
         if not (cnx and cnx.is_connected()):
             print("Cannot fetch sales invoice data, database connection failed.")
             return None
 
-        query = """
-        SELECT
-            2 AS contractType,
-            1 AS transactionType,
-            'VENTA DE MERCADERIA' AS contractObject,
-            '' AS providerNit,
-            '' AS contractNumber,
-            f.fechaFac AS contractDate,
-            f.total AS totalAmount,
-            0 AS exchangeValue,
-            1 AS numberOfInstallments,
-            0 AS advanceAmount,
-            '' AS exchangeObject,
-            0 AS accumulatedAmount,
-            f.idFactura AS invoiceId,
-            f.pagada AS paid
-        FROM
-            factura f
-        WHERE
-            YEAR(f.fechaFac) = %s
-            AND MONTH(f.fechaFac) = %s
-            AND f.anulada = 0
-            AND f.total >= 50000
-        """
-        params = (year, month)
         print(f"Executing query for sales invoices with year={year}, month={month}")
-        data = fetch_data_from_db(cnx, query, params)
+        if stream:
+            stream_rows = stream_positional_from_db if positional else iter_data_from_db
+            data = stream_rows(cnx, query, params, batch_size, cache=cache, period=period)
+            if not owns_connection:
+                return data
+            data = _release_when_consumed(data, cnx, "get_sales_invoice_data")
+            owns_connection = False # The generator now owns the connection
+            return data
+        fetch_rows = fetch_positional_from_db if positional else fetch_data_from_db
+        data = fetch_rows(cnx, query, params, cache=cache, period=period)
         
         if data is not None:
             print(f"Successfully fetched {len(data)} sales invoices.")
@@ -264,95 +690,54 @@ def get_sales_invoice_data(year, month, config_file_path="db_config.ini"):
         print(f"An unexpected error occurred in get_sales_invoice_data: {e}")
         return None
     finally:
-        if cnx and cnx.is_connected():
+        if owns_connection and cnx and cnx.is_connected():
             cnx.close()
-            print("Database connection closed in get_sales_invoice_data.")
+            print("Database connection released in get_sales_invoice_data.")
 
 # Example of how to use the Excel writing part if needed separately
 # def generate_excel_report(data_to_write, output_path):
 # write_to_excel(data_to_write, output_path)
 
-def get_auxiliary_sales_data(year, month, config_file_path="db_config.ini"):
+def get_auxiliary_sales_data(year, month, config_file_path="db_config.ini", stream=False, batch_size=1000, cnx=None, use_cache=True, positional=False,
+                             almacen=None, id_range=None):
     """
     Fetches auxiliary sales data for bancarizacion for a given year and month.
+    With stream=True, returns a generator that yields the rows in batches of
+    batch_size and releases the connection once it has been consumed.
+    An open connection (e.g. from db_session) can be passed as cnx; it is
+    left open. Otherwise a connection is taken from the shared pool.
+    When a [cache] section is configured and use_cache is True, cached
+    results (e.g. of closed periods) are returned without querying MySQL.
+    With positional=True the rows come as a PositionalRows (column names
+    plus one tuple per row) instead of dicts.
+    almacen/id_range restrict the query to one branch / invoice id range (see async_queries for split periods).
     """
-    db_params = None
-    cnx = None
+    import mysql.connector
+
+    owns_connection = cnx is None
     try:
-        db_params = get_db_config_core(config_file_path)
-        cnx = connect_to_db(db_params)
-
-        query = """
-        SELECT
-            CONCAT(f.fechaFac, '-', ROUND(fs.montoTotal,0)) AS id,
-            2 AS tipoTransaccion,
-            1 AS formaPago,
-            f.ClienteNit AS nitCliente,
-            '' AS complemento,
-            f.ClienteFactura AS nombreRazonSocial,
-            CASE 
-                WHEN df.autorizacion = 'SIAT' THEN fs.cuf
-                ELSE df.autorizacion 
-            END AS codigoAutorizacion,
-            f.nFactura AS numeroFactura,
-            2 AS tipoDocumentoRespaldo,
-            f.nFactura AS numeroDocumentoRespaldo,
-            f.fechaFac AS fechaDocumentoRespaldo,
-            fs.montoTotal AS montoFacturadoVenta,
-            'COLOCAREXCEL' AS numeroContrato,
-            3 AS tipoDocumentoPago, /* deposito en cuenta*/
-            e.fecha AS fechaDocumentoPago,
-            b.cuenta AS numeroCuentaVendedor,
-            b.nit AS nitEntidadFinancieraAbono,
-            e.codigo AS numeroTransaccion,
-            IF(e.monto > fs.montoTotal AND f.pagada = 1, fs.montoTotal, e.monto) AS montoRecibido,
-            e.descripcion AS extractoDescripcion,
-            e.adicional AS extractoAdicional,
-            e.banco AS extractoBanco,
-            e.cheque AS extractoCheque,
-            e.referencia AS extractoReferencia,
-            %s AS gestion, /* Using @gestionPago for gestion */
-            e.id AS idExtracto,
-            /* e.codigo, -- This is duplicated by numeroTransaccion, aliasing to avoid confusion */
-            p.transferencia AS pagoTransferencia,
-            p.idPago AS idPago,
-            f.almacen AS almacen,
-            f.pagada AS pagada,
-            f.idFactura AS idFactura,
-            CASE
-                WHEN tp.tipoPago = 'CHEQUE' THEN 1
-                WHEN tp.tipoPago = 'TRANSFERENCIA' THEN 4
-                ELSE ''
-            END AS tipoDocPagoOriginal, /* Renamed to avoid conflict if 'tipoDocumentoPago' is used differently */
-            p.glosa AS pagoGlosa,
-            p.imagen AS pagoImagen
-        FROM
-            factura f
-            LEFT JOIN factura_siat fs ON fs.factura_id = f.idFactura
-            INNER JOIN datosfactura df ON df.idDatosFactura = f.lote
-            LEFT JOIN pago_factura pf ON pf.idFactura = f.idFactura
-            LEFT JOIN pago p ON p.idPago = pf.idPago
-            LEFT JOIN tipoPago tp ON tp.id = p.tipoPago
-            LEFT JOIN extractos e ON e.codigo = p.transferencia AND YEAR(e.fecha) = %s AND MONTH(e.fecha) = %s AND e.codigo<>''
-            LEFT JOIN bancos b ON b.id = e.banco
-        WHERE
-            YEAR(f.fechaFac) <= %s    AND 
-            f.anulada = 0
-            AND f.total >= 50000
-            AND f.nFactura > 0
-            AND YEAR(p.fechaPago) = %s
-            AND MONTH(p.fechaPago) = %s
-        ORDER BY f.fechaFac;
-        """
-        # Parameters for the query: @gestion, @gestionPago, @mesPago, @gestion, @gestionPago, @mesPago
-        # The query uses @gestion for YEAR(f.fechaFac) <= @gestion
-        # and @gestionPago, @mesPago for payment dates and extract dates.
-        # We'll use the 'year' parameter for all @gestion and @gestionPago instances,
-        # and 'month' for all @mesPago instances.
-        params = (year, year, month, year, year, month)
+        query, params = build_auxiliary_sales_query(year, month, almacen=almacen, id_range=id_range)
+        cache = get_result_cache(config_file_path) if use_cache else None
+        period = format_period(year, month)
+        if cache is not None:
+            cached_rows = cache.iter_rows(query, params, batch_size, positional=positional) if stream else cache.get(query, params, positional=positional)
+            if cached_rows is not None:
+                return cached_rows
+
+        if owns_connection:
+            cnx = get_pooled_connection(config_file_path)
         
         print(f"Executing auxiliary sales data query for Year: {year}, Month: {month}")
-        results = fetch_data_from_db(cnx, query, params)
+        if stream:
+            stream_rows = stream_positional_from_db if positional else iter_data_from_db
+            results = stream_rows(cnx, query, params, batch_size, cache=cache, period=period)
+            if not owns_connection:
+                return results
+            results = _release_when_consumed(results, cnx, "get_auxiliary_sales_data")
+            owns_connection = False # The generator now owns the connection
+            return results
+        fetch_rows = fetch_positional_from_db if positional else fetch_data_from_db
+        results = fetch_rows(cnx, query, params, cache=cache, period=period)
         return results
 
     except FileNotFoundError as e:
@@ -367,85 +752,677 @@ def get_auxiliary_sales_data(year, month, config_file_path="db_config.ini"):
     except Exception as e:
         print(f"An unexpected error occurred in get_auxiliary_sales_data: {e}")
         return None
+    finally:
+        if owns_connection and cnx and cnx.is_connected():
+            cnx.close()
+            print("Database connection released for get_auxiliary_sales_data.")
+
+def fetch_invoice_status(cnx, invoice_ids, batch_size=1000):
+    """
+    Fetches the current anulada/pagada/total of the given invoices, batch_size ids per query.
+    Returns the list of status rows, or None on error.
+    """
+    invoice_ids = sorted(invoice_ids)
+    status_rows = []
+    for start in range(0, len(invoice_ids), batch_size):
+        query, params = build_invoice_status_query(invoice_ids[start:start + batch_size])
+        rows = fetch_data_from_db(cnx, query, params)
+        if rows is None:
+            return None
+        status_rows.extend(rows)
+    return status_rows
+
+def refresh_period_snapshot(name, year, month, config_file_path="db_config.ini", snapshot_dir=None, full=False, cnx=None):
+    """
+    Brings the local snapshot of a period pipeline ('contratos' or 'auxventas')
+    up to date and returns all its rows.
+    Only the rows above the stored high-water marks (idFactura, idPago,
+    extractos.id) are fetched, plus every row of the stored invoices whose
+    anulada/pagada/total changed (voided invoices drop out of the snapshot).
+    The first run, or full=True, fetches the whole period.
+
+    Returns:
+        list: The snapshot rows (dicts, in the order of the full query), or None on error
+    """
+    import mysql.connector
+
+    spec = SNAPSHOT_SPECS[name]
+    if snapshot_dir is None:
+        snapshot_dir = _default_snapshot_dir()
+    snapshot = PeriodSnapshot(snapshot_dir, name, year, month)
+    owns_connection = cnx is None
+    try:
+        if owns_connection:
+            cnx = get_pooled_connection(config_file_path)
+
+        rows, state = ([], {}) if full else snapshot.load()
+        watermarks = state.get('watermarks')
+        stored_status = state.get('invoice_status', {})
+
+        changed_ids = set()
+        if stored_status:
+            status_rows = fetch_invoice_status(cnx, [int(invoice_id) for invoice_id in stored_status])
+            if status_rows is None:
+                return None
+            changed_ids = changed_invoices(stored_status, status_rows)
+
+        query, params = spec['query_builder'](year, month, watermarks=watermarks, invoice_ids=[int(invoice_id) for invoice_id in sorted(changed_ids)])
+        print(f"Refreshing {name} snapshot for {snapshot.period} ({'incremental' if watermarks is not None else 'full'}, {len(changed_ids)} changed invoices)")
+        new_rows = fetch_data_from_db(cnx, query, params)
+        if new_rows is None:
+            return None
+
+        merged_rows = merge_snapshot_rows(rows, new_rows, spec, dropped_invoice_ids=changed_ids)
+
+        # Remember the status of every invoice in the snapshot, querying only the new ones
+        invoice_status = {
+            invoice_id: signature for invoice_id, signature in stored_status.items() if invoice_id not in changed_ids
+        }
+        missing_ids = {row[spec['invoice_column']] for row in merged_rows} - {int(invoice_id) for invoice_id in invoice_status}
+        if missing_ids:
+            status_rows = fetch_invoice_status(cnx, missing_ids)
+            if status_rows is None:
+                return None
+            invoice_status.update({str(row['idFactura']): invoice_status_signature(row) for row in status_rows})
+
+        snapshot.save(merged_rows, {
+            'watermarks': advance_watermarks(watermarks, new_rows, spec['watermark_columns']),
+            'invoice_status': invoice_status,
+        })
+        print(f"Snapshot {name} {snapshot.period}: {len(new_rows)} new or changed rows, {len(merged_rows)} rows in total.")
+        return merged_rows
+
+    except FileNotFoundError as e:
+        print(f"Configuration file error: {e}")
+        return None
+    except ValueError as e:
+        print(f"Configuration value error: {e}")
+        return None
+    except mysql.connector.Error as e:
+        print(f"Database error in refresh_period_snapshot: {e}")
+        return None
+    except Exception as e:
+        print(f"An unexpected error occurred in refresh_period_snapshot: {e}")
+        return None
+    finally:
+        if owns_connection and cnx and cnx.is_connected():
+            cnx.close()
+            print("Database connection released for refresh_period_snapshot.")
+
+def _default_snapshot_dir():
+    project_root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    return os.path.join(project_root, SNAPSHOT_DIR)
+
+def _fetch_in_batches(cnx, query_builder, ids, batch_size=1000):
+    """Runs query_builder(ids) for batch_size ids at a time; returns all rows, or None on error."""
+    ids = sorted(ids)
+    rows = []
+    for start in range(0, len(ids), batch_size):
+        query, params = query_builder(ids[start:start + batch_size])
+        batch_rows = fetch_data_from_db(cnx, query, params)
+        if batch_rows is None:
+            return None
+        rows.extend(batch_rows)
+    return rows
+
+def refresh_join_snapshot(config_file_path="db_config.ini", snapshot_dir=None, full=False, cnx=None):
+    """
+    Brings the invoice document snapshot (see join_snapshot) up to date:
+    fetches the document data of invoices above the stored highest id, and
+    again for SIAT invoices still without CUF. The first run, or full=True,
+    fetches everything.
+
+    Returns:
+        JoinSnapshot: The refreshed snapshot, or None on error
+    """
+    import mysql.connector
+
+    snapshot = JoinSnapshot(snapshot_dir or _default_snapshot_dir())
+    owns_connection = cnx is None
+    try:
+        if owns_connection:
+            cnx = get_pooled_connection(config_file_path)
+        with _JOIN_SNAPSHOT_LOCK:
+            state = {} if full else snapshot.load_state()
+            documents = snapshot.read_documents(memory_map=False) if state else None
+
+            query, params = build_invoice_documents_query(min_invoice_id=state.get('max_invoice_id'))
+            print(f"Refreshing join snapshot ({'incremental' if state else 'full'})")
+            document_rows = fetch_data_from_db(cnx, query, params)
+            if document_rows is None:
+                return None
+            pending_ids = pending_invoice_ids(documents) if documents is not None else []
+            pending_rows = _fetch_in_batches(cnx, lambda ids: build_invoice_documents_query(invoice_ids=ids), pending_ids)
+            if pending_rows is None:
+                return None
+
+            with stage("transform"):
+                documents, new_state = merge_snapshot_documents(documents, document_rows + pending_rows)
+                snapshot.save(documents, new_state)
+        print(f"Join snapshot: {len(document_rows)} new invoices, {len(pending_rows)} pending invoices checked "
+              f"({documents.num_rows} invoices in total).")
+        return snapshot
+
+    except mysql.connector.Error as e:
+        print(f"Database error in refresh_join_snapshot: {e}")
+        return None
+    except Exception as e:
+        print(f"An unexpected error occurred in refresh_join_snapshot: {e}")
+        return None
+    finally:
+        if owns_connection and cnx and cnx.is_connected():
+            cnx.close()
+            print("Database connection released for refresh_join_snapshot.")
+
+def get_auxiliary_sales_data_from_snapshot(year, month, config_file_path="db_config.ini", snapshot_dir=None, refresh=True,
+                                           positional=False, cnx=None):
+    """
+    Builds the auxiliary sales rows of a period from the join snapshot
+    instead of the full auxiliary query: the period's payment links, the
+    current factura columns of their invoices and the period's statement
+    lines are queried, and the document data of the invoices is read from
+    the memory-mapped snapshot (queried for invoices not stored yet).
+    The snapshot is refreshed first unless refresh=False.
+
+    Returns:
+        list: Rows as dicts (a PositionalRows with positional=True), in the
+        columns and order of get_auxiliary_sales_data, or None on error
+    """
+    import mysql.connector
+
+    owns_connection = cnx is None
+    try:
+        if owns_connection:
+            cnx = get_pooled_connection(config_file_path)
+        if refresh:
+            snapshot = refresh_join_snapshot(config_file_path, snapshot_dir, cnx=cnx)
+            if snapshot is None:
+                return None
+        else:
+            snapshot = JoinSnapshot(snapshot_dir or _default_snapshot_dir())
+            if not snapshot.exists():
+                print("No join snapshot yet, refresh it first.")
+                return None
+
+        # Payment links are read on every run, pago rows are edited after the fact
+        query, params = build_invoice_payments_query(year, month)
+        payments = fetch_data_from_db(cnx, query, params)
+        if payments is None:
+            return None
+        invoice_ids = {payment['idFactura'] for payment in payments}
+        with _JOIN_SNAPSHOT_LOCK:
+            documents = invoice_documents(snapshot.read_documents(), invoice_ids)
+        missing_ids = invoice_ids - set(documents)
+        missing_rows = _fetch_in_batches(cnx, lambda ids: build_invoice_documents_query(invoice_ids=ids), missing_ids)
+        if missing_rows is None:
+            return None
+        documents.update((row['idFactura'], row) for row in missing_rows)
+        print(f"Join snapshot: {len(payments)} payment links of {len(invoice_ids)} invoices in {format_period(year, month)}, "
+              f"{len(missing_ids)} documents not in the snapshot")
+
+        invoice_rows = _fetch_in_batches(cnx, build_invoice_rows_query, invoice_ids)
+        if invoice_rows is None:
+            return None
+        query, params = build_statement_lines_query(year, month)
+        statement_lines = fetch_data_from_db(cnx, query, params)
+        if statement_lines is None:
+            return None
+
+        with stage("transform") as transform_stage:
+            rows = join_auxiliary_rows(year, month, payments, documents, {row['idFactura']: row for row in invoice_rows}, statement_lines)
+            transform_stage.rows = len(rows)
+        print(f"Joined {len(rows)} auxiliary sales rows in-process.")
+        if positional:
+            return PositionalRows(AUXILIARY_SALES_COLUMNS, rows)
+        return [dict(zip(AUXILIARY_SALES_COLUMNS, row)) for row in rows]
+
+    except mysql.connector.Error as e:
+        print(f"Database error in get_auxiliary_sales_data_from_snapshot: {e}")
+        return None
+    except Exception as e:
+        print(f"An unexpected error occurred in get_auxiliary_sales_data_from_snapshot: {e}")
+        return None
+    finally:
+        if owns_connection and cnx and cnx.is_connected():
+            cnx.close()
+            print("Database connection released for get_auxiliary_sales_data_from_snapshot.")
+
+def refresh_payment_summary(year, month, config_file_path="db_config.ini", refresh_months=1, full=False, cnx=None):
+    """
+    Brings the monthly payment summary up to the given period, so the
+    accumulated amount of the Contratos report is a lookup instead of a scan
+    of every historical payment.
+    The tables are created on first use. Months not summarized yet (from the
+    oldest payment on) are computed, and the last refresh_months months up to
+    the period are recomputed since they may still receive payments; older
+    months are left as they are. full=True recomputes every month.
+
+    Returns:
+        int: Number of months refreshed, or None on error
+    """
+    import mysql.connector
+
+    owns_connection = cnx is None
+    try:
+        if owns_connection:
+            cnx = get_pooled_connection(config_file_path)
+
+        if not execute_statements(cnx, [(statement, ()) for statement in build_payment_summary_tables()]):
+            return None
+        query, params = build_payment_summary_periods_query()
+        summarized_rows = fetch_data_from_db(cnx, query, params)
+        query, params = build_first_payment_query()
+        first_payment_rows = fetch_data_from_db(cnx, query, params)
+        if summarized_rows is None or first_payment_rows is None:
+            return None
+        first_payment = first_payment_rows[0]['primerPago'] if first_payment_rows else None
+        if first_payment is None:
+            print("No payments to summarize.")
+            return 0
+
+        summarized = {(row['periodo'].year, row['periodo'].month) for row in summarized_rows}
+        periods = list(iter_periods((first_payment.year, first_payment.month), (int(year), int(month))))
+        recent = set(periods[-refresh_months:]) if refresh_months > 0 else set()
+        pending = [period for period in periods if full or period not in summarized or period in recent]
+
+        print(f"Refreshing payment summary: {len(pending)} of {len(periods)} months up to {int(year)}-{int(month):02d}")
+        refreshed_at = datetime.now().replace(microsecond=0)
+        for period_year, period_month in pending:
+            if not execute_statements(cnx, build_payment_summary_refresh(period_year, period_month, refreshed_at)):
+                print(f"Failed to refresh the payment summary of {period_year}-{period_month:02d}.")
+                return None
+        return len(pending)
+
+    except FileNotFoundError as e:
+        print(f"Configuration file error: {e}")
+        return None
+    except ValueError as e:
+        print(f"Configuration value error: {e}")
+        return None
+    except mysql.connector.Error as e:
+        print(f"Database error in refresh_payment_summary: {e}")
+        return None
+    except Exception as e:
+        print(f"An unexpected error occurred in refresh_payment_summary: {e}")
+        return None
+    finally:
+        if owns_connection and cnx and cnx.is_connected():
+            cnx.close()
+            print("Database connection released for refresh_payment_summary.")
+
+def get_reconciliation_data(year, month, config_file_path="db_config.ini", date_tolerance_days=0, cnx=None):
+    """
+    Loads the period's payments (with their invoices) and bank statement lines
+    for the reconciliation engine, the lines widened by date_tolerance_days.
+
+    Returns:
+        tuple: (payment rows, statement rows), or None on error
+    """
+    import mysql.connector
+
+    owns_connection = cnx is None
+    try:
+        if owns_connection:
+            cnx = get_pooled_connection(config_file_path)
+
+        query, params = build_reconciliation_payments_query(year, month)
+        print(f"Loading payments for reconciliation, Year: {year}, Month: {month}")
+        payment_rows = fetch_data_from_db(cnx, query, params)
+        if payment_rows is None:
+            return None
+
+        query, params = build_bank_extracts_query(year, month, margin_days=date_tolerance_days)
+        print(f"Loading bank statement lines from {params[0]} to {params[1]} (exclusive)")
+        extract_rows = fetch_data_from_db(cnx, query, params)
+        if extract_rows is None:
+            return None
+        return payment_rows, extract_rows
+
+    except FileNotFoundError as e:
+        print(f"Configuration file error: {e}")
+        return None
+    except ValueError as e:
+        print(f"Configuration value error: {e}")
+        return None
+    except mysql.connector.Error as e:
+        print(f"Database error in get_reconciliation_data: {e}")
+        return None
+    except Exception as e:
+        print(f"An unexpected error occurred in get_reconciliation_data: {e}")
+        return None
+    finally:
+        if owns_connection and cnx and cnx.is_connected():
+            cnx.close()
+            print("Database connection released for get_reconciliation_data.")
+
+def get_period_almacenes(year, month, config_file_path="db_config.ini", by_payment=False, cnx=None):
+    """
+    Lists the branches (almacen) with invoices in the period or, with
+    by_payment=True, with invoices paid in the period (the rows of the
+    Registro Auxiliar). Returns the sorted list, or None on error.
+    """
+    owns_connection = cnx is None
+    try:
+        if owns_connection:
+            cnx = get_pooled_connection(config_file_path)
+        query, params = build_period_almacenes_query(year, month, by_payment=by_payment)
+        rows = fetch_data_from_db(cnx, query, params)
+        if rows is None:
+            return None
+        return [row['almacen'] for row in rows]
+    except Exception as e:
+        print(f"An unexpected error occurred in get_period_almacenes: {e}")
+        return None
+    finally:
+        if owns_connection and cnx and cnx.is_connected():
+            cnx.close()
+
+def get_partition_probe(year, month, config_file_path="db_config.ini", by_payment=False, cnx=None):
+    """
+    Runs the partition probe of a period (see build_partition_probe_query).
+    Returns a dict with rowCount, minId and maxId, or None on error.
+    """
+    owns_connection = cnx is None
+    try:
+        if owns_connection:
+            cnx = get_pooled_connection(config_file_path)
+        query, params = build_partition_probe_query(year, month, by_payment=by_payment)
+        rows = fetch_data_from_db(cnx, query, params)
+        if not rows:
+            return None
+        return rows[0]
+    except Exception as e:
+        print(f"An unexpected error occurred in get_partition_probe: {e}")
+        return None
+    finally:
+        if owns_connection and cnx and cnx.is_connected():
+            cnx.close()
+
+def explain_period_queries(year, month, config_file_path="db_config.ini"):
+    """
+    Runs EXPLAIN on the period queries and reports, per table, the index used
+    or the composite index that should be created to avoid a full scan.
+
+    Returns:
+        dict: Query name -> list of per-table entries (see advise_indexes), or None on error
+    """
+    import mysql.connector
+
+    cnx = None
+    try:
+        cnx = get_pooled_connection(config_file_path)
+
+        queries = {
+            'sales_invoice': build_sales_invoice_query(year, month),
+            'auxiliary_sales': build_auxiliary_sales_query(year, month),
+        }
+        report = {}
+        for name, (query, params) in queries.items():
+            print(f"\nEXPLAIN {name} for Year: {year}, Month: {month}")
+            plan = explain_query(cnx, query, params)
+            report[name] = advise_indexes(plan)
+            for entry in report[name]:
+                index_info = entry['key'] if entry['key'] else "NO INDEX"
+                print(f"  {entry['table']} ({entry['alias']}): type={entry['type']}, key={index_info}, rows={entry['rows']}")
+                if entry['note']:
+                    print(f"    Note: {entry['note']}")
+                if entry['suggestion']:
+                    print(f"    Suggested: {entry['suggestion']}")
+        return report
+
+    except FileNotFoundError as e:
+        print(f"Configuration file error: {e}")
+        return None
+    except ValueError as e:
+        print(f"Configuration value error: {e}")
+        return None
+    except mysql.connector.Error as e:
+        print(f"Database error in explain_period_queries: {e}")
+        return None
     finally:
         if cnx and cnx.is_connected():
             cnx.close()
-            print("Database connection closed for get_auxiliary_sales_data.")
+            print("Database connection released for explain_period_queries.")
+
+# Markers found in the cells of the SIAT "Reporte Contrato Ventas" sheet
+CONTRACT_HEADER_MARKER = "NRO CONTRATO/ACUERDO :"
+CONTRACT_STATE_PENDIENTE = "ESTADO CONTRATO= PENDIENTE"
+CONTRACT_STATE_CONCLUIDO = "ESTADO CONTRATO=CONCLUIDO"
+
+def classify_contract_rows(df):
+    """
+    Classifies the rows of a SIAT contracts report in a single pass.
+
+    A row matches a marker when any of its string cells (stripped) starts
+    with CONTRACT_HEADER_MARKER, or equals CONTRACT_STATE_PENDIENTE /
+    CONTRACT_STATE_CONCLUIDO. The string cells of every column are gathered
+    into one string array, stripped once and compared with vectorized string
+    operations; non-string cells (numbers, dates, NaN) never match.
+
+    Returns:
+        tuple: (mask_headers, mask_pendiente, mask_concluido) as numpy boolean arrays
+    """
+    import numpy as np
+    import pandas as pd
+
+    row_count = len(df)
+    mask_headers = np.zeros(row_count, dtype=bool)
+    mask_pendiente = np.zeros(row_count, dtype=bool)
+    mask_concluido = np.zeros(row_count, dtype=bool)
+
+    string_cells = []
+    string_rows = []
+    for column_name in df.columns:
+        values = df[column_name].to_numpy(dtype=object)
+        is_string = np.fromiter((isinstance(value, str) for value in values), dtype=bool, count=row_count)
+        if is_string.any():
+            string_cells.append(values[is_string])
+            string_rows.append(np.flatnonzero(is_string))
+    if not string_cells:
+        return mask_headers, mask_pendiente, mask_concluido
+
+    row_positions = np.concatenate(string_rows)
+    stripped = pd.Series(np.concatenate(string_cells), dtype="string").str.strip()
+    mask_headers[row_positions[stripped.str.startswith(CONTRACT_HEADER_MARKER).to_numpy(dtype=bool)]] = True
+    mask_pendiente[row_positions[(stripped == CONTRACT_STATE_PENDIENTE).to_numpy(dtype=bool)]] = True
+    mask_concluido[row_positions[(stripped == CONTRACT_STATE_CONCLUIDO).to_numpy(dtype=bool)]] = True
+
+    return mask_headers, mask_pendiente, mask_concluido
+
+# Faster read-only parser that pandas can use when python-calamine is installed
+FAST_EXCEL_ENGINE = "calamine"
+
+def filter_pending_contracts(df):
+    """Drops the header rows and keeps the PENDIENTE (not CONCLUIDO) contract rows of a SIAT report sheet."""
+    mask_headers, mask_pendiente, mask_concluido = classify_contract_rows(df)
+    return df[~mask_headers & mask_pendiente & ~mask_concluido]
+
+def find_excel_member(zip_ref, preferred_name="Contratos.xlsx"):
+    """Returns the name of the Excel member to read: preferred_name if present, otherwise the first .xlsx."""
+    member_names = zip_ref.namelist()
+    if preferred_name in member_names:
+        return preferred_name
+    excel_members = [name for name in member_names if name.lower().endswith('.xlsx')]
+    if not excel_members:
+        return None
+    print(f"Using Excel file: {excel_members[0]}")
+    return excel_members[0]
+
+def read_excel_sheet_from_zip(zip_file_path, sheet_name="Reporte Contrato Ventas", member_name=None, engine=None):
+    """
+    Reads one sheet of an Excel file inside a zip archive without extracting it to disk.
+    The zip member is decompressed into an in-memory buffer and only the
+    requested sheet is parsed.
+
+    Args:
+        zip_file_path (str): Path to the zip file containing the Excel file
+        sheet_name (str, optional): Name of the sheet to read. Defaults to "Reporte Contrato Ventas".
+        member_name (str, optional): Excel file inside the zip. Defaults to Contratos.xlsx or the first .xlsx.
+        engine (str, optional): pandas Excel engine. None uses the pandas default (openpyxl);
+            FAST_EXCEL_ENGINE ("calamine") is much faster but needs python-calamine.
+
+    Returns:
+        pandas.DataFrame: The sheet contents
+    """
+    import io
+    import zipfile
+    import pandas as pd
+
+    with zipfile.ZipFile(zip_file_path, 'r') as zip_ref:
+        print(f"Zip file contains: {zip_ref.namelist()}")
+        if member_name is None:
+            member_name = find_excel_member(zip_ref)
+            if member_name is None:
+                raise FileNotFoundError(f"No Excel file found in {zip_file_path}")
+        buffer = io.BytesIO(zip_ref.read(member_name))
 
-def process_zipped_contracts_excel(zip_file_path, sheet_name="Reporte Contrato Ventas"):
+    print(f"Reading Excel file: {member_name} (in memory), sheet: {sheet_name}" + (f", engine: {engine}" if engine else ""))
+    return pd.read_excel(buffer, sheet_name=sheet_name, engine=engine)
+
+def process_zipped_contracts_excel(zip_file_path, sheet_name="Reporte Contrato Ventas", engine=None):
     """
-    Extracts an Excel file from a zip archive, reads a specific sheet,
+    Reads an Excel file from a zip archive (in memory), reads a specific sheet,
     and filters the data based on contract state.
     
     Args:
         zip_file_path (str): Path to the zip file containing the Excel file
         sheet_name (str, optional): Name of the sheet to read. Defaults to "Reporte Contrato Ventas".
+        engine (str, optional): pandas Excel engine, e.g. FAST_EXCEL_ENGINE. Defaults to the pandas default.
     
     Returns:
         list: Filtered data rows with only PENDIENTE contracts and valid contract codes
     """
-    import zipfile
-    import pandas as pd
-    import tempfile
-    import os
-    
     try:
         print(f"Processing zipped contracts Excel file: {zip_file_path}")
+        with stage("workbook_load") as load_stage:
+            df = read_excel_sheet_from_zip(zip_file_path, sheet_name=sheet_name, engine=engine)
+            load_stage.rows = len(df) if df is not None else None
         
-        # Create a temporary directory to extract files
-        with tempfile.TemporaryDirectory() as temp_dir:
-            # Extract the zip file
-            with zipfile.ZipFile(zip_file_path, 'r') as zip_ref:
-                print(f"Zip file contains: {zip_ref.namelist()}")
-                zip_ref.extractall(temp_dir)
-            
-            # Assuming the Excel file is named Contratos.xlsx within the zip
-            excel_file_path = os.path.join(temp_dir, "Contratos.xlsx")
-            if not os.path.exists(excel_file_path):
-                # Try to find any Excel file if the expected name is not found
-                excel_files = [f for f in os.listdir(temp_dir) if f.endswith('.xlsx')]
-                if excel_files:
-                    excel_file_path = os.path.join(temp_dir, excel_files[0])
-                    print(f"Using Excel file: {excel_files[0]}")
-                else:
-                    raise FileNotFoundError(f"No Excel file found in {zip_file_path}")
-            
-            # Read the Excel file
-            print(f"Reading Excel file: {excel_file_path}, sheet: {sheet_name}")
-            df = pd.read_excel(excel_file_path, sheet_name=sheet_name)
-            
-            # Clean and filter data
-            # First, remove rows that are just headers (contain "NRO CONTRATO/ACUERDO :")
-            print("Filtering out header rows...")
-            mask_headers = ~df.apply(
-                lambda row: any(str(val).strip().startswith("NRO CONTRATO/ACUERDO :") if isinstance(val, str) else False 
-                             for val in row), axis=1
-            )
-            df_no_headers = df[mask_headers]
-            
-            # Filter to keep only rows with "ESTADO CONTRATO= PENDIENTE"
-            print("Filtering for PENDIENTE contracts...")
-            # Create a mask to identify rows with "ESTADO CONTRATO= PENDIENTE"
-            mask_pendiente = df_no_headers.apply(
-                lambda row: any(str(val).strip() == "ESTADO CONTRATO= PENDIENTE" if isinstance(val, str) else False
-                             for val in row), axis=1
-            )
-            
-            # Filter out rows with "ESTADO CONTRATO=CONCLUIDO"
-            mask_not_concluido = ~df_no_headers.apply(
-                lambda row: any(str(val).strip() == "ESTADO CONTRATO=CONCLUIDO" if isinstance(val, str) else False
-                              for val in row), axis=1
-            )
-            
-            # Combine the masks
-            df_filtered = df_no_headers[mask_pendiente & mask_not_concluido]
-            
-            # Convert to list of dictionaries for consistency with other functions
-            filtered_data = df_filtered.to_dict('records')
-            
-            print(f"Found {len(filtered_data)} PENDIENTE contracts after filtering")
-            return filtered_data
+        # Clean and filter data in a single pass:
+        # drop header rows (contain "NRO CONTRATO/ACUERDO :"), keep rows with
+        # "ESTADO CONTRATO= PENDIENTE" and drop rows with "ESTADO CONTRATO=CONCLUIDO"
+        print("Filtering out header rows and keeping PENDIENTE contracts...")
+        with stage("transform") as transform_stage:
+            df_filtered = filter_pending_contracts(df)
+            transform_stage.rows = len(df)
+        
+        # Convert to list of dictionaries for consistency with other functions
+        filtered_data = df_filtered.to_dict('records')
+        
+        print(f"Found {len(filtered_data)} PENDIENTE contracts after filtering")
+        return filtered_data
             
     except Exception as e:
         print(f"Error processing zipped contracts Excel file: {e}")
         return None
+
+# Columns added to the merged rows of a multi-file run
+SOURCE_FILE_COLUMN = "source_file"
+SOURCE_SHEET_COLUMN = "source_sheet"
+
+def find_zip_files(zip_source):
+    """
+    Returns the sorted zip files of a directory (its *.zip files), a glob
+    pattern, or a single zip path.
+    """
+    if os.path.isdir(zip_source):
+        zip_source = os.path.join(zip_source, "*.zip")
+    return sorted(path for path in glob.glob(zip_source) if path.lower().endswith('.zip'))
+
+def list_zip_workbooks(zip_file_paths):
+    """Returns one (zip path, member name) per .xlsx inside the zips (Office lock files and __MACOSX entries skipped)."""
+    import zipfile
+
+    workbooks = []
+    for zip_file_path in zip_file_paths:
+        with zipfile.ZipFile(zip_file_path, 'r') as zip_ref:
+            for member_name in zip_ref.namelist():
+                base_name = os.path.basename(member_name)
+                if (member_name.lower().endswith('.xlsx') and not base_name.startswith('~$')
+                        and not member_name.startswith('__MACOSX/')):
+                    workbooks.append((zip_file_path, member_name))
+    return workbooks
+
+def parse_zip_workbook(zip_file_path, member_name, sheet_name=None, engine=None):
+    """
+    Reads the sheets of one workbook inside a zip (every sheet when
+    sheet_name is None) and returns its PENDIENTE contract rows as dicts,
+    tagged with the workbook ('<zip name>/<member>') and sheet they come from.
+    Module-level so it can run in a process pool.
+    """
+    import io
+    import zipfile
+    import pandas as pd
+
+    source_file = f"{os.path.basename(zip_file_path)}/{member_name}"
+    with stage("workbook_load") as load_stage:
+        with zipfile.ZipFile(zip_file_path, 'r') as zip_ref:
+            buffer = io.BytesIO(zip_ref.read(member_name))
+        sheets = pd.read_excel(buffer, sheet_name=sheet_name, engine=engine)
+        if sheet_name is not None:
+            sheets = {sheet_name: sheets}
+        load_stage.rows = sum(len(df) for df in sheets.values())
+
+    rows = []
+    with stage("transform") as transform_stage:
+        for current_sheet, df in sheets.items():
+            for record in filter_pending_contracts(df).to_dict('records'):
+                record[SOURCE_FILE_COLUMN] = source_file
+                record[SOURCE_SHEET_COLUMN] = current_sheet
+                rows.append(record)
+        transform_stage.rows = load_stage.rows
+    return rows
+
+def process_zipped_contracts_parallel(zip_source, sheet_name=None, engine=None, max_workers=None):
+    """
+    Parses every workbook (and every sheet, unless sheet_name is given) of
+    the zips in a directory or glob in a process pool, one workbook per task,
+    and merges their PENDIENTE contract rows in file order.
+
+    Args:
+        zip_source (str): Directory with the zips (e.g. one per almacen and month), glob pattern or zip path
+        sheet_name (str, optional): Sheet to read from every workbook. Defaults to all sheets.
+        engine (str, optional): pandas Excel engine, e.g. FAST_EXCEL_ENGINE. Defaults to the pandas default.
+        max_workers (int, optional): Worker processes. Defaults to the number of CPUs.
+
+    Returns:
+        list: Merged rows with source_file and source_sheet columns, or None when
+              no workbook could be parsed. Workbooks that fail are reported and skipped.
+    """
+    from concurrent.futures import ProcessPoolExecutor
+
+    try:
+        workbooks = list_zip_workbooks(find_zip_files(zip_source))
+    except Exception as e:
+        print(f"Error listing the zipped contracts in {zip_source}: {e}")
+        return None
+    if not workbooks:
+        print(f"No zipped Excel workbooks found in {zip_source}")
+        return None
+
+    max_workers = max(1, min(max_workers or os.cpu_count() or 1, len(workbooks)))
+    print(f"Parsing {len(workbooks)} workbooks from {zip_source} with {max_workers} worker processes")
+    # Stage metrics of every workbook are merged into the caller's collector, if any
+    collector = get_collector()
+    results = {}
+    with ProcessPoolExecutor(max_workers=max_workers) as executor:
+        futures = {
+            workbook: executor.submit(collect_call, parse_zip_workbook, workbook + (sheet_name, engine))
+            if collector is not None else executor.submit(parse_zip_workbook, *workbook, sheet_name, engine)
+            for workbook in workbooks
+        }
+        for workbook, future in futures.items():
+            try:
+                result = future.result()
+                if collector is not None:
+                    result, records = result
+                    collector.extend(records, label=os.path.basename(workbook[0]))
+                results[workbook] = result
+            except Exception as e:
+                print(f"Error processing {workbook[1]} in {workbook[0]}: {e}")
+
+    if not results:
+        return None
+    merged_rows = [row for workbook in workbooks if workbook in results for row in results[workbook]]
+    print(f"Found {len(merged_rows)} PENDIENTE contracts in {len(results)} of {len(workbooks)} workbooks")
+    return merged_rows
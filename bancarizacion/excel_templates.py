@@ -0,0 +1,196 @@
+# C:\Users\willy\Projects\bancarizacion\bancarizacion\excel_templates.py
+"""
+Template engine for the SIAT Excel templates (PlantillaContratos.xlsx, PlantillaVenta.xlsx).
+The template is parsed once (values, cell styles and sheet layout) and cached;
+each report then streams its data rows into a new write-only workbook.
+"""
+import os
+import threading
+from copy import copy
+
+from bancarizacion.instrumentation import stage
+from bancarizacion.output_writers import XLSX_MAX_ROWS
+
+# Parsed templates keyed by absolute path; reloaded when the file changes on disk
+_TEMPLATE_CACHE = {}
+_TEMPLATE_CACHE_LOCK = threading.Lock()
+
+# Font colors drawn as the default (black) text: indexed black, system foreground, theme "Text 1"
+_AUTOMATIC_FONT_COLORS = {('indexed', 8), ('indexed', 64), ('theme', 1)}
+
+def font_appearance(font):
+    """The attributes a font is drawn with, the default text color variants counting as one."""
+    color = font.color
+    if color is None or ((color.type, color.value) in _AUTOMATIC_FONT_COLORS and not color.tint):
+        color_key = None
+    else:
+        color_key = (color.type, color.value, color.tint)
+    return (font.name, font.sz, font.b, font.i, font.u, font.strike, font.vertAlign, color_key)
+
+class ExcelTemplate:
+    """
+    The active sheet of a template workbook, parsed once.
+    Keeps the existing rows (headers and any pre-filled rows) with their
+    styles, the column widths, row heights, freeze panes, auto filter and
+    merged cells. Other sheets, charts and images are not carried over.
+    """
+
+    def __init__(self, template_file_path):
+        import openpyxl
+        from openpyxl.cell import Cell
+
+        self.template_file_path = template_file_path
+        self.mtime = os.path.getmtime(template_file_path)
+
+        workbook = openpyxl.load_workbook(template_file_path)
+        sheet = workbook.active
+        self.sheet_title = sheet.title
+        self.rows = [
+            [(cell.value, self._cell_style(cell)) for cell in row]
+            for row in sheet.iter_rows()
+        ]
+        self.column_widths = {
+            letter: dimension.width
+            for letter, dimension in sheet.column_dimensions.items()
+            if dimension.customWidth and dimension.width
+        }
+        self.row_heights = {
+            index: dimension.height
+            for index, dimension in sheet.row_dimensions.items()
+            if dimension.height
+        }
+        self.freeze_panes = sheet.freeze_panes
+        self.auto_filter_ref = sheet.auto_filter.ref
+        self.merged_ranges = [str(cell_range) for cell_range in sheet.merged_cells.ranges]
+        # Unstyled data cells use the workbook's default font, which differs between templates:
+        # it is the font of any cell without a style
+        self.default_font = copy(Cell(sheet).font)
+        workbook.close()
+
+    @staticmethod
+    def _cell_style(cell):
+        """Copies the style components of a cell, or returns None when it has the default style."""
+        if not cell.has_style:
+            return None
+        return {
+            'font': copy(cell.font),
+            'fill': copy(cell.fill),
+            'border': copy(cell.border),
+            'alignment': copy(cell.alignment),
+            'number_format': cell.number_format,
+            'protection': copy(cell.protection),
+        }
+
+    def _template_row(self, sheet, row, needs_default_font):
+        """Builds the write-only cells of one template row."""
+        from openpyxl.cell import WriteOnlyCell
+
+        cells = []
+        for value, style in row:
+            cell = WriteOnlyCell(sheet, value=value)
+            if not style and needs_default_font:
+                cell.font = self.default_font
+            elif style:
+                cell.font = style['font']
+                cell.fill = style['fill']
+                cell.border = style['border']
+                cell.alignment = style['alignment']
+                cell.number_format = style['number_format']
+                cell.protection = style['protection']
+            cells.append(cell)
+        return cells
+
+    def _create_sheet(self, workbook, title):
+        """Adds a write-only sheet with the template layout and rows."""
+        sheet = workbook.create_sheet(title=title)
+
+        # Layout has to be set before the first row is written
+        for letter, width in self.column_widths.items():
+            sheet.column_dimensions[letter].width = width
+        for index, height in self.row_heights.items():
+            sheet.row_dimensions[index].height = height
+        if self.freeze_panes:
+            sheet.freeze_panes = self.freeze_panes
+        if self.auto_filter_ref:
+            sheet.auto_filter.ref = self.auto_filter_ref
+        for cell_range in self.merged_ranges:
+            sheet.merged_cells.add(cell_range)
+
+        needs_default_font = self._needs_default_font(sheet)
+        for row in self.rows:
+            sheet.append(self._template_row(sheet, row, needs_default_font))
+        return sheet
+
+    def _needs_default_font(self, sheet):
+        """
+        Whether unstyled cells need the template's default font set on each
+        cell, i.e. the new workbook's default font (that of an unstyled cell)
+        looks different from the template's. Setting it costs about as much
+        as writing the cell, so it is skipped when only the encoding differs.
+        """
+        from openpyxl.cell import WriteOnlyCell
+
+        return font_appearance(WriteOnlyCell(sheet).font) != font_appearance(self.default_font)
+
+    def _styled_row(self, sheet, values):
+        """The data values as write-only cells with the template's default font (None stays an empty cell)."""
+        from openpyxl.cell import WriteOnlyCell
+
+        font = self.default_font
+        row = []
+        for value in values:
+            if value is None:
+                row.append(None)
+                continue
+            cell = WriteOnlyCell(sheet, value=value)
+            cell.font = font
+            row.append(cell)
+        return row
+
+    def write(self, data_rows, output_file_path, column_order, max_sheet_rows=XLSX_MAX_ROWS):
+        """
+        Writes the template rows followed by data_rows to output_file_path.
+        data_rows is any iterable of dicts, whose values are taken in
+        column_order, or of tuples/lists already in column order (see
+        bancarizacion/siat_mapping.py), which are appended as is.
+        When a sheet reaches max_sheet_rows rows (the XLSX limit by default),
+        the rows continue on a new copy of the template sheet.
+        Returns the number of data rows written.
+        """
+        import openpyxl
+
+        workbook = openpyxl.Workbook(write_only=True)
+        sheet = self._create_sheet(workbook, self.sheet_title)
+        needs_default_font = self._needs_default_font(sheet)
+        sheet_rows = len(self.rows)
+        sheet_number = 1
+
+        row_count = 0
+        with stage("write_rows") as write_stage:
+            for record in data_rows:
+                if sheet_rows >= max_sheet_rows:
+                    sheet_number += 1
+                    sheet = self._create_sheet(workbook, f"{self.sheet_title[:26]} ({sheet_number})")
+                    sheet_rows = len(self.rows)
+                if isinstance(record, dict):
+                    record = [record.get(col_name, "") for col_name in column_order] # Use empty string for missing keys
+                sheet.append(self._styled_row(sheet, record) if needs_default_font else record)
+                sheet_rows += 1
+                row_count += 1
+            write_stage.rows = row_count
+
+        with stage("save"):
+            workbook.save(output_file_path)
+        return row_count
+
+def get_excel_template(template_file_path):
+    """Returns the parsed template for a path, parsing it only on first use or after it changed."""
+    cache_key = os.path.normcase(os.path.abspath(template_file_path))
+    mtime = os.path.getmtime(template_file_path)
+    with _TEMPLATE_CACHE_LOCK:
+        template = _TEMPLATE_CACHE.get(cache_key)
+        if template is None or template.mtime != mtime:
+            print(f"Parsing Excel template: {os.path.basename(template_file_path)}")
+            template = ExcelTemplate(template_file_path)
+            _TEMPLATE_CACHE[cache_key] = template
+    return template
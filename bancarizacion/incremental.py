@@ -0,0 +1,133 @@
+# C:\Users\willy\Projects\bancarizacion\bancarizacion\incremental.py
+"""
+Incremental extraction of the period queries.
+Each (pipeline, period) keeps a local snapshot: the rows of the last run as a
+Parquet file plus a JSON file with the high-water marks of its ids
+(idFactura, idPago, extractos.id) and the status of its invoices. A refresh
+only fetches the rows above the marks and the invoices whose status changed,
+and merges them into the snapshot.
+"""
+import json
+import os
+import threading
+from datetime import datetime
+
+from bancarizacion.query_builder import (
+    SALES_WATERMARK_COLUMNS, AUXILIARY_WATERMARK_COLUMNS,
+    build_sales_invoice_query, build_auxiliary_sales_query
+)
+from bancarizacion.result_cache import format_period, write_rows_parquet, read_rows_parquet
+
+SNAPSHOT_DIR = os.path.join("data", "snapshots")
+
+# Pipeline name -> how its rows are fetched, identified and merged
+SNAPSHOT_SPECS = {
+    'contratos': {
+        'query_builder': build_sales_invoice_query,
+        'watermark_columns': tuple(SALES_WATERMARK_COLUMNS),
+        'invoice_column': 'invoiceId',
+        'key_columns': ('invoiceId',),
+        'unmatched_column': None,
+        'sort_column': None,
+    },
+    'auxventas': {
+        'query_builder': build_auxiliary_sales_query,
+        'watermark_columns': tuple(AUXILIARY_WATERMARK_COLUMNS),
+        'invoice_column': 'idFactura',
+        'key_columns': ('idFactura', 'idPago', 'idExtracto'),
+        # A payment row without a bank statement is replaced once its statement is loaded
+        'unmatched_column': 'idExtracto',
+        'sort_column': 'fechaDocumentoRespaldo',
+    },
+}
+
+class PeriodSnapshot:
+    """Rows and incremental state of one pipeline for one period, stored in snapshot_dir."""
+
+    def __init__(self, snapshot_dir, name, year, month):
+        self.snapshot_dir = snapshot_dir
+        self.name = name
+        self.period = format_period(year, month)
+        base_name = f"{name}_{self.period}"
+        self.rows_path = os.path.join(snapshot_dir, f"{base_name}.parquet")
+        self.state_path = os.path.join(snapshot_dir, f"{base_name}.json")
+
+    def exists(self):
+        return os.path.exists(self.rows_path) and os.path.exists(self.state_path)
+
+    def load(self):
+        """Returns (rows, state); ([], {}) when there is no snapshot yet."""
+        if not self.exists():
+            return [], {}
+        with open(self.state_path, "r", encoding="utf-8") as state_file:
+            state = json.load(state_file)
+        return read_rows_parquet(self.rows_path), state
+
+    def save(self, rows, state):
+        """Stores the rows and the state (the state last, so a partial save is never trusted)."""
+        os.makedirs(self.snapshot_dir, exist_ok=True)
+        write_rows_parquet(rows, self.rows_path)
+        state = dict(state, updated=datetime.now().isoformat(timespec="seconds"), rows=len(rows))
+        temp_path = f"{self.state_path}.tmp{threading.get_ident()}"
+        with open(temp_path, "w", encoding="utf-8") as state_file:
+            json.dump(state, state_file, indent=1)
+        os.replace(temp_path, self.state_path)
+
+def invoice_status_signature(status_row):
+    """JSON friendly signature of an invoice's anulada/pagada/total, compared between runs."""
+    return [str(status_row['anulada']), str(status_row['pagada']), str(status_row['total'])]
+
+def changed_invoices(stored_status, status_rows):
+    """
+    Returns the ids (as strings) of the stored invoices whose status changed
+    since the last run or that no longer exist.
+    """
+    current_status = {str(row['idFactura']): invoice_status_signature(row) for row in status_rows}
+    return {invoice_id for invoice_id, signature in stored_status.items() if current_status.get(invoice_id) != signature}
+
+def advance_watermarks(watermarks, new_rows, watermark_columns):
+    """Returns the high-water marks raised to the highest ids of new_rows."""
+    advanced = {column: (watermarks or {}).get(column) for column in watermark_columns}
+    for column in watermark_columns:
+        values = [row[column] for row in new_rows if row.get(column) is not None]
+        if advanced[column] is not None:
+            values.append(advanced[column])
+        if values:
+            advanced[column] = max(values)
+    return advanced
+
+def merge_snapshot_rows(rows, new_rows, spec, dropped_invoice_ids=()):
+    """
+    Merges freshly fetched rows into the snapshot rows.
+    Rows of dropped_invoice_ids (string ids) are removed first, new rows replace
+    stored rows with the same key and, when the spec has an unmatched_column,
+    rows where it is empty are dropped once a matched row of the same group exists.
+    """
+    key_columns = spec['key_columns']
+    invoice_column = spec['invoice_column']
+    dropped_invoice_ids = set(dropped_invoice_ids)
+    new_keys = {tuple(row.get(column) for column in key_columns) for row in new_rows}
+    merged = [
+        row for row in rows
+        if str(row.get(invoice_column)) not in dropped_invoice_ids
+        and tuple(row.get(column) for column in key_columns) not in new_keys
+    ]
+    merged.extend(new_rows)
+
+    unmatched_column = spec['unmatched_column']
+    if unmatched_column:
+        group_columns = [column for column in key_columns if column != unmatched_column]
+        matched_groups = {
+            tuple(row.get(column) for column in group_columns)
+            for row in merged if row.get(unmatched_column) is not None
+        }
+        merged = [
+            row for row in merged
+            if row.get(unmatched_column) is not None
+            or tuple(row.get(column) for column in group_columns) not in matched_groups
+        ]
+
+    if spec['sort_column']:
+        # Stable sort: rows of the same date keep the database order
+        merged.sort(key=lambda row: row[spec['sort_column']])
+    return merged
@@ -0,0 +1,274 @@
+# C:\Users\willy\Projects\bancarizacion\bancarizacion\instrumentation.py
+"""
+Per-stage metrics of the pipelines: wall time, rows, rows/sec and memory.
+A MetricsCollector is bound to the current thread with collecting(); the
+stage() context manager and add_time() then record into it. Without a bound
+collector they do nothing, so instrumented code costs nothing when metrics
+are off. Each worker thread (or process) of a concurrent run gets its own
+collector, whose records are merged into the run's collector with a label.
+
+Stages nest: self_seconds is a stage's time minus the time of the stages
+recorded inside it (e.g. the rows streamed from MySQL while writing).
+
+Memory is reported per stage as rss_growth_mib, the growth of the RSS over
+its value when the stage started: up to the process high-water mark when the
+stage raised it, otherwise up to the RSS when the stage ended. The process
+high-water mark itself is recorded as process_peak_rss_mib.
+"""
+import json
+import os
+import sys
+import threading
+import time
+from contextlib import contextmanager
+
+_local = threading.local()
+
+# --- Memory ---
+
+def current_rss_bytes():
+    """Resident set size of this process, or None when it cannot be read."""
+    try:
+        import psutil
+        return psutil.Process().memory_info().rss
+    except ImportError:
+        pass
+    if sys.platform == "win32":
+        counters = _windows_memory_counters()
+        return counters.WorkingSetSize if counters else None
+    try:
+        with open("/proc/self/statm", "r") as statm:
+            return int(statm.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError, IndexError):
+        return None
+
+def peak_rss_bytes():
+    """Peak resident set size of this process so far, or None when it cannot be read."""
+    if sys.platform == "win32":
+        counters = _windows_memory_counters()
+        return counters.PeakWorkingSetSize if counters else None
+    try:
+        import resource
+    except ImportError:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # ru_maxrss is in bytes on macOS and in kilobytes elsewhere
+    return peak if sys.platform == "darwin" else peak * 1024
+
+def _windows_memory_counters():
+    """PROCESS_MEMORY_COUNTERS of this process (psapi.GetProcessMemoryInfo), or None."""
+    import ctypes
+    from ctypes import wintypes
+
+    class PROCESS_MEMORY_COUNTERS(ctypes.Structure):
+        _fields_ = [
+            ("cb", wintypes.DWORD),
+            ("PageFaultCount", wintypes.DWORD),
+            ("PeakWorkingSetSize", ctypes.c_size_t),
+            ("WorkingSetSize", ctypes.c_size_t),
+            ("QuotaPeakPagedPoolUsage", ctypes.c_size_t),
+            ("QuotaPagedPoolUsage", ctypes.c_size_t),
+            ("QuotaPeakNonPagedPoolUsage", ctypes.c_size_t),
+            ("QuotaNonPagedPoolUsage", ctypes.c_size_t),
+            ("PagefileUsage", ctypes.c_size_t),
+            ("PeakPagefileUsage", ctypes.c_size_t),
+        ]
+
+    try:
+        counters = PROCESS_MEMORY_COUNTERS()
+        counters.cb = ctypes.sizeof(counters)
+        process = ctypes.windll.kernel32.GetCurrentProcess()
+        if not ctypes.windll.psapi.GetProcessMemoryInfo(process, ctypes.byref(counters), counters.cb):
+            return None
+        return counters
+    except (AttributeError, OSError):
+        return None
+
+def _mib(value):
+    return round(value / (1024 * 1024), 1) if value is not None else None
+
+# --- Collection ---
+
+class MetricsCollector:
+    """Thread-safe list of stage records (plain dicts, so they can cross process boundaries)."""
+
+    def __init__(self, label=None):
+        self.label = label
+        self.records = []
+        self._lock = threading.Lock()
+
+    def add(self, record):
+        with self._lock:
+            self.records.append(record)
+
+    def extend(self, records, label=None):
+        """Adds records collected elsewhere (another thread or process), tagging them with label."""
+        with self._lock:
+            for record in records:
+                if label and not record.get('label'):
+                    record = dict(record, label=label)
+                self.records.append(record)
+
+    def summary(self):
+        """
+        Aggregates the records per (label, stage), in first-seen order.
+        Returns a list of dicts with calls, seconds, self_seconds, rows, rows_per_second and
+        rss_growth_mib (the largest growth of a single call).
+        """
+        totals = {}
+        with self._lock:
+            records = list(self.records)
+        for record in records:
+            key = (record.get('label') or "", record['stage'])
+            total = totals.setdefault(key, {
+                'label': key[0], 'stage': key[1], 'calls': 0, 'seconds': 0.0, 'self_seconds': 0.0,
+                'rows': None, 'rss_growth_mib': None,
+            })
+            total['calls'] += 1
+            total['seconds'] += record['seconds']
+            total['self_seconds'] += record['self_seconds']
+            if record.get('rows') is not None:
+                total['rows'] = (total['rows'] or 0) + record['rows']
+            if record.get('rss_growth_mib') is not None:
+                total['rss_growth_mib'] = max(total['rss_growth_mib'] or 0, record['rss_growth_mib'])
+        for total in totals.values():
+            total['rows_per_second'] = round(total['rows'] / total['self_seconds']) if total['rows'] and total['self_seconds'] > 0 else None
+        return list(totals.values())
+
+    def print_summary(self):
+        """Prints the per-stage table of the run."""
+        print("\n--- Stage Metrics ---")
+        print(f"{'LABEL':<22}{'STAGE':<16}{'CALLS':>6}{'SECONDS':>9}{'SELF':>9}{'ROWS':>10}{'ROWS/S':>10}{'+RSS MiB':>10}")
+        for total in self.summary():
+            rows = total['rows'] if total['rows'] is not None else "-"
+            rows_per_second = total['rows_per_second'] if total['rows_per_second'] is not None else "-"
+            growth = total['rss_growth_mib'] if total['rss_growth_mib'] is not None else "-"
+            print(f"{total['label'][:21]:<22}{total['stage']:<16}{total['calls']:>6}{total['seconds']:>9.2f}"
+                  f"{total['self_seconds']:>9.2f}{rows:>10}{rows_per_second:>10}{growth:>10}")
+
+    def write_json_lines(self, file_path, run_id=None):
+        """Appends one JSON object per stage record to file_path."""
+        run_id = run_id or time.strftime("%Y%m%d_%H%M%S")
+        with self._lock:
+            records = list(self.records)
+        with open(file_path, "a", encoding="utf-8") as metrics_file:
+            for record in records:
+                metrics_file.write(json.dumps(dict(record, run=run_id), default=str) + "\n")
+        print(f"Metrics of {len(records)} stages appended to {file_path}")
+
+def get_collector():
+    """The collector bound to the current thread, or None when metrics are off."""
+    return getattr(_local, 'collector', None)
+
+def set_collector(collector):
+    """Binds collector to the current thread until changed (None turns metrics off)."""
+    _local.collector = collector
+    _local.stack = []
+
+@contextmanager
+def collecting(collector):
+    """Binds collector to the current thread for the duration of the block (None leaves metrics off)."""
+    previous = getattr(_local, 'collector', None)
+    previous_stack = getattr(_local, 'stack', None)
+    _local.collector = collector
+    _local.stack = []
+    try:
+        yield collector
+    finally:
+        _local.collector = previous
+        _local.stack = previous_stack
+
+def collect_call(func, args, label=None):
+    """
+    Calls func(*args) with a fresh collector bound to this thread.
+    Returns (result, records); used to run a job in a worker thread or process.
+    """
+    collector = MetricsCollector(label)
+    with collecting(collector):
+        result = func(*args)
+    return result, collector.records
+
+class _StageRecord:
+    """Mutable handle yielded by stage(); set .rows once known."""
+    __slots__ = ('rows', 'child_seconds')
+
+    def __init__(self):
+        self.rows = None
+        self.child_seconds = 0.0
+
+def _stage_growth(rss_start, rss_end, peak_start, peak_end):
+    """
+    Growth of the RSS during a stage, or None when it cannot be read.
+    When the stage raised the process high-water mark, the stage itself reached
+    it; otherwise its highest known RSS is the one at the end.
+    """
+    if rss_start is None or rss_end is None:
+        return None
+    stage_peak = rss_end
+    if peak_start is not None and peak_end is not None and peak_end > peak_start:
+        stage_peak = max(stage_peak, peak_end)
+    return max(0, stage_peak - rss_start)
+
+def _record(collector, name, start_wall, seconds, self_seconds, rows, rss_start, peak_start=None):
+    rss_end = current_rss_bytes()
+    peak_rss = peak_rss_bytes()
+    if peak_rss is not None and rss_end is not None:
+        # The kernel's high-water mark can lag behind the current RSS slightly
+        peak_rss = max(peak_rss, rss_end)
+    collector.add({
+        'label': collector.label,
+        'stage': name,
+        'thread': threading.current_thread().name,
+        'start': round(start_wall, 3),
+        'seconds': round(seconds, 6),
+        'self_seconds': round(self_seconds, 6),
+        'rows': rows,
+        'rows_per_second': round(rows / self_seconds) if rows and self_seconds > 0 else None,
+        'rss_start_mib': _mib(rss_start),
+        'rss_end_mib': _mib(rss_end),
+        'rss_growth_mib': _mib(_stage_growth(rss_start, rss_end, peak_start, peak_rss)),
+        'process_peak_rss_mib': _mib(peak_rss),
+    })
+
+@contextmanager
+def stage(name):
+    """
+    Times a stage of the pipeline in the current thread's collector.
+    Yields a handle whose rows attribute can be set inside the block.
+    """
+    collector = get_collector()
+    handle = _StageRecord()
+    if collector is None:
+        yield handle
+        return
+    stack = _local.stack
+    stack.append(handle)
+    rss_start = current_rss_bytes()
+    peak_start = peak_rss_bytes()
+    start_wall = time.time()
+    start = time.perf_counter()
+    try:
+        yield handle
+    finally:
+        seconds = time.perf_counter() - start
+        stack.pop()
+        if stack:
+            stack[-1].child_seconds += seconds
+        _record(collector, name, start_wall, seconds, seconds - handle.child_seconds, handle.rows, rss_start, peak_start)
+
+def add_time(name, seconds, rows=None):
+    """
+    Records time measured by the caller (e.g. accumulated over the batches of
+    a streamed fetch) as a stage, deducting it from the enclosing stage.
+    """
+    collector = get_collector()
+    if collector is None:
+        return
+    stack = _local.stack
+    if stack:
+        stack[-1].child_seconds += seconds
+    _record(collector, name, time.time() - seconds, seconds, seconds, rows, None)
+
+def metrics_enabled():
+    """True when a collector is bound to the current thread."""
+    return get_collector() is not None
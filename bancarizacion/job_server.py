@@ -0,0 +1,270 @@
+# C:\Users\willy\Projects\bancarizacion\bancarizacion\job_server.py
+"""
+Resident job server for repeated report generation.
+Instead of starting `python main.py` for every report, one long-running
+process accepts jobs (pipeline plus period) over a local HTTP API and runs
+them on a worker pool. The connection pools, parsed Excel templates and
+result caches of core_logic/excel_templates are per process, so they stay
+warm from one job to the next.
+
+    POST /jobs        {"pipeline": "auxventas", "period": "2025-03", "format": "csv"}
+                      queues a job and streams its events as JSON lines until it ends
+                      ("wait": false answers with the queued job instead)
+    GET  /jobs        summary of every job kept by the server
+    GET  /jobs/<id>   events of a job as JSON lines, following it until it ends
+    GET  /health      server state (workers, queued and running jobs, warm resources)
+
+Events: "queued", "started", one "stage" per stage metric as it is recorded
+(see instrumentation), and "done" with the status (ok, empty or failed),
+the output path, seconds and error.
+"""
+import itertools
+import json
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import urlsplit
+
+from bancarizacion.batch import DEFAULT_DB_CONCURRENCY, DEFAULT_WORKERS, parse_period, pipeline_status
+from bancarizacion.instrumentation import MetricsCollector, collecting, get_collector
+
+DEFAULT_HOST = "127.0.0.1"
+DEFAULT_PORT = 8765
+
+# Finished jobs kept for GET /jobs and GET /jobs/<id>, oldest dropped first
+MAX_FINISHED_JOBS = 200
+
+# Request fields that are not options of the pipeline
+_REQUEST_FIELDS = ("pipeline", "period", "wait")
+
+class Job:
+    """A report run queued on the server and the events published so far."""
+
+    def __init__(self, job_id, pipeline, year, month, options):
+        self.id = job_id
+        self.pipeline = pipeline
+        self.year = year
+        self.month = month
+        self.period = f"{year}-{month:02d}"
+        self.options = options
+        self.status = "queued"
+        self.output = None
+        self.error = None
+        self.seconds = None
+        self.queued_at = time.perf_counter()
+        self.events = []
+        self._changed = threading.Condition()
+
+    def publish(self, event, **fields):
+        """Appends an event and wakes up the clients following the job."""
+        with self._changed:
+            self.events.append(dict(fields, event=event, job=self.id))
+            self._changed.notify_all()
+
+    def follow(self):
+        """Yields every event of the job from the first one, waiting for new ones until "done"."""
+        index = 0
+        while True:
+            with self._changed:
+                while index >= len(self.events):
+                    self._changed.wait()
+                events = self.events[index:]
+            index += len(events)
+            for event in events:
+                yield event
+                if event['event'] == "done":
+                    return
+
+    def summary(self):
+        return {
+            'job': self.id, 'pipeline': self.pipeline, 'period': self.period, 'status': self.status,
+            'output': self.output, 'error': self.error, 'seconds': self.seconds,
+        }
+
+class JobCollector(MetricsCollector):
+    """Collector of one job that publishes every stage record as soon as it is recorded."""
+
+    def __init__(self, job):
+        super().__init__(label=f"{job.pipeline} {job.period}")
+        self.job = job
+
+    def add(self, record):
+        super().add(record)
+        self.job.publish("stage", **record)
+
+    def extend(self, records, label=None):
+        # Records of the job's own worker threads or processes (partitioned queries, chunk files)
+        for record in records:
+            self.add(dict(record, label=label) if label and not record.get('label') else record)
+
+class JobServer:
+    """
+    Queue and worker pool of the server.
+
+    Args:
+        pipelines (dict): Pipeline name -> callable(year, month, options) returning the
+            output path, None when there were no records, or False on failure
+        validate_options (callable, optional): (pipeline, options) -> options for the callable;
+            raises ValueError to reject a request
+        workers (int): Jobs running at once
+        db_concurrency (int): Maximum jobs querying the database at once
+        info (dict, optional): Extra state shown by GET /health (e.g. the warm resources)
+    """
+
+    def __init__(self, pipelines, validate_options=None, workers=DEFAULT_WORKERS, db_concurrency=DEFAULT_DB_CONCURRENCY, info=None):
+        self.pipelines = pipelines
+        self.validate_options = validate_options
+        self.workers = max(1, workers)
+        self.db_concurrency = max(1, db_concurrency)
+        self.info = info or {}
+        self.started_at = time.time()
+        self._executor = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="job")
+        self._db_slots = threading.BoundedSemaphore(self.db_concurrency)
+        self._jobs = {}
+        self._lock = threading.Lock()
+        self._ids = itertools.count(1)
+        # Stage metrics of every job are also merged into the caller's collector, if any
+        self._collector = get_collector()
+
+    def submit(self, request):
+        """Validates a request (dict with pipeline, period and options) and queues its job. Raises ValueError."""
+        if not isinstance(request, dict):
+            raise ValueError("The request must be a JSON object.")
+        pipeline = request.get('pipeline')
+        if pipeline not in self.pipelines:
+            raise ValueError(f"Unknown pipeline '{pipeline}', expected one of {', '.join(self.pipelines)}.")
+        year, month = parse_period(str(request.get('period') or ""))
+        options = {name: value for name, value in request.items() if name not in _REQUEST_FIELDS}
+        if self.validate_options is not None:
+            options = self.validate_options(pipeline, options)
+
+        with self._lock:
+            job = Job(str(next(self._ids)), pipeline, year, month, options)
+            self._jobs[job.id] = job
+            queued = sum(1 for other in self._jobs.values() if other.status == "queued")
+            self._prune_finished()
+        job.publish("queued", pipeline=pipeline, period=job.period, queued=queued)
+        print(f"Job {job.id} queued: {pipeline} {job.period}")
+        self._executor.submit(self._run, job)
+        return job
+
+    def _prune_finished(self):
+        finished = [job_id for job_id, job in self._jobs.items() if job.seconds is not None]
+        for job_id in finished[:max(0, len(finished) - MAX_FINISHED_JOBS)]:
+            del self._jobs[job_id]
+
+    def _run(self, job):
+        collector = JobCollector(job)
+        # The rows are streamed from the database into the writer, so a slot is held for the whole job
+        with self._db_slots:
+            start = time.perf_counter()
+            job.status = "running"
+            job.publish("started", wait_seconds=round(start - job.queued_at, 3))
+            try:
+                with collecting(collector):
+                    result = self.pipelines[job.pipeline](job.year, job.month, job.options)
+                job.status = pipeline_status(result)
+                if job.status == "ok":
+                    job.output = result
+            except Exception as e:
+                job.status = "failed"
+                job.error = str(e)
+            job.seconds = round(time.perf_counter() - start, 3)
+        if self._collector is not None:
+            self._collector.extend(collector.records)
+        print(f"Job {job.id} {job.status} in {job.seconds:.2f}s: {job.pipeline} {job.period} {job.error or job.output or ''}")
+        job.publish("done", status=job.status, output=job.output, error=job.error, seconds=job.seconds)
+
+    def get(self, job_id):
+        with self._lock:
+            return self._jobs.get(job_id)
+
+    def jobs(self):
+        with self._lock:
+            return [job.summary() for job in self._jobs.values()]
+
+    def state(self):
+        """Server state for GET /health."""
+        with self._lock:
+            statuses = [job.status for job in self._jobs.values()]
+        return dict(self.info, workers=self.workers, db_concurrency=self.db_concurrency, pipelines=list(self.pipelines),
+                    uptime_seconds=round(time.time() - self.started_at), queued=statuses.count("queued"),
+                    running=statuses.count("running"), finished=len(statuses) - statuses.count("queued") - statuses.count("running"))
+
+    def make_http_server(self, host=DEFAULT_HOST, port=DEFAULT_PORT):
+        """The HTTP server of the API, bound to host:port (port 0 picks a free one)."""
+        from http.server import ThreadingHTTPServer
+
+        return ThreadingHTTPServer((host, port), _request_handler(self))
+
+    def serve(self, host=DEFAULT_HOST, port=DEFAULT_PORT):
+        """Serves the API until interrupted (Ctrl+C), then lets the running jobs finish. Returns True."""
+        http_server = self.make_http_server(host, port)
+        print(f"Job server listening on http://{http_server.server_address[0]}:{http_server.server_address[1]} "
+              f"({self.workers} workers, DB concurrency {self.db_concurrency}), Ctrl+C to stop")
+        try:
+            http_server.serve_forever()
+        except KeyboardInterrupt:
+            print("Stopping the job server, waiting for the running jobs...")
+        finally:
+            http_server.server_close()
+            self._executor.shutdown(wait=True, cancel_futures=True)
+        return True
+
+def _request_handler(job_server):
+    """Request handler class of the API of job_server."""
+    from http.server import BaseHTTPRequestHandler
+
+    class JobRequestHandler(BaseHTTPRequestHandler):
+        def do_POST(self):
+            if urlsplit(self.path).path.rstrip("/") != "/jobs":
+                self._send_json(404, {'error': f"Not found: {self.path}"})
+                return
+            try:
+                length = int(self.headers.get("Content-Length") or 0)
+                request = json.loads(self.rfile.read(length) or b"{}")
+                job = job_server.submit(request)
+            except ValueError as e:
+                self._send_json(400, {'error': str(e)})
+                return
+            if request.get('wait', True) is False:
+                self._send_json(202, job.summary())
+            else:
+                self._stream(job)
+
+        def do_GET(self):
+            path = urlsplit(self.path).path.rstrip("/")
+            if path == "/health":
+                self._send_json(200, job_server.state())
+            elif path == "/jobs":
+                self._send_json(200, job_server.jobs())
+            elif path.startswith("/jobs/") and job_server.get(path[len("/jobs/"):]) is not None:
+                self._stream(job_server.get(path[len("/jobs/"):]))
+            else:
+                self._send_json(404, {'error': f"Not found: {self.path}"})
+
+        def _send_json(self, status, body):
+            content = json.dumps(body, default=str).encode("utf-8")
+            self.send_response(status)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(content)))
+            self.end_headers()
+            self.wfile.write(content)
+
+        def _stream(self, job):
+            """Writes the job's events as JSON lines as they are published; the response ends with the job."""
+            self.send_response(200)
+            self.send_header("Content-Type", "application/x-ndjson")
+            self.end_headers()
+            try:
+                for event in job.follow():
+                    self.wfile.write((json.dumps(event, default=str) + "\n").encode("utf-8"))
+                    self.wfile.flush()
+            except (BrokenPipeError, ConnectionResetError):
+                # The client went away, the job keeps running
+                pass
+
+        def log_message(self, format, *args):
+            print(f"Job server: {self.address_string()} {format % args}")
+
+    return JobRequestHandler
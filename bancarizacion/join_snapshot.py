@@ -0,0 +1,199 @@
+# C:\Users\willy\Projects\bancarizacion\bancarizacion\join_snapshot.py
+"""
+Local snapshot of the invoice document joins behind the Registro Auxiliar.
+The auxiliary query resolves factura_siat/datosfactura (CUF or authorization
+code) for every invoice ever issued, although those rows do not change once
+written. The snapshot keeps them in an Arrow IPC file, memory-mapped when read:
+
+    invoice_documents.arrow  idFactura -> codigoAutorizacion, montoTotal
+
+plus a JSON state with the highest invoice id stored. A refresh only fetches
+the invoices above that id (and SIAT invoices still waiting for their CUF).
+Payment links are not kept: pago rows are edited and links to older payments
+are added, so a period reads its links from the database on every run. A
+period is then built from its payment links, the snapshot documents, the
+current factura columns of its invoices and its bank statement lines
+(join_auxiliary_rows), with the same columns as build_auxiliary_sales_query.
+"""
+import json
+import os
+import threading
+from datetime import datetime
+from decimal import Decimal, ROUND_HALF_UP
+
+from bancarizacion.query_builder import year_end_exclusive
+
+DOCUMENTS_FILE_NAME = "invoice_documents.arrow"
+STATE_FILE_NAME = "join_snapshot.json"
+
+# Columns of the auxiliary sales query, in its order
+AUXILIARY_SALES_COLUMNS = (
+    'id', 'tipoTransaccion', 'formaPago', 'nitCliente', 'complemento', 'nombreRazonSocial',
+    'codigoAutorizacion', 'numeroFactura', 'tipoDocumentoRespaldo', 'numeroDocumentoRespaldo',
+    'fechaDocumentoRespaldo', 'montoFacturadoVenta', 'numeroContrato', 'tipoDocumentoPago',
+    'fechaDocumentoPago', 'numeroCuentaVendedor', 'nitEntidadFinancieraAbono', 'numeroTransaccion',
+    'montoRecibido', 'extractoDescripcion', 'extractoAdicional', 'extractoBanco', 'extractoCheque',
+    'extractoReferencia', 'gestion', 'idExtracto', 'pagoTransferencia', 'idPago', 'almacen', 'pagada',
+    'idFactura', 'tipoDocPagoOriginal', 'pagoGlosa', 'pagoImagen',
+)
+
+# tipoPago name -> tipoDocPagoOriginal, as the CASE of the auxiliary query (a string, as its ELSE '')
+PAYMENT_DOCUMENT_TYPES = {'CHEQUE': '1', 'TRANSFERENCIA': '4'}
+
+def _documents_schema():
+    import pyarrow as pa
+
+    # Amounts are kept as text so the Decimal values read back unchanged
+    return pa.schema([
+        pa.field('idFactura', pa.int64()),
+        pa.field('codigoAutorizacion', pa.string()),
+        pa.field('montoTotal', pa.string()),
+    ])
+
+def _as_text(value):
+    return None if value is None else str(value)
+
+def rows_to_table(rows, schema):
+    """Builds a pyarrow Table of the given schema from query rows (dicts); text columns are converted with str()."""
+    import pyarrow as pa
+
+    columns = []
+    for field in schema:
+        values = [row[field.name] for row in rows]
+        if pa.types.is_string(field.type):
+            values = [_as_text(value) for value in values]
+        elif pa.types.is_date(field.type):
+            values = [value.date() if isinstance(value, datetime) else value for value in values]
+        columns.append(pa.array(values, type=field.type))
+    return pa.Table.from_arrays(columns, schema=schema)
+
+class JoinSnapshot:
+    """The Arrow file and the state of the join snapshot in snapshot_dir."""
+
+    def __init__(self, snapshot_dir):
+        self.snapshot_dir = snapshot_dir
+        self.documents_path = os.path.join(snapshot_dir, DOCUMENTS_FILE_NAME)
+        self.state_path = os.path.join(snapshot_dir, STATE_FILE_NAME)
+
+    def exists(self):
+        return all(os.path.exists(path) for path in (self.documents_path, self.state_path))
+
+    def load_state(self):
+        """Returns the stored state, {} when there is no snapshot yet."""
+        if not self.exists():
+            return {}
+        with open(self.state_path, "r", encoding="utf-8") as state_file:
+            return json.load(state_file)
+
+    def read_documents(self, memory_map=True):
+        """
+        Returns the documents as a pyarrow Table. With memory_map the file is
+        mapped instead of read, so only the pages a lookup touches are loaded;
+        take what is needed (to_pylist) and drop the table.
+        """
+        import pyarrow as pa
+
+        source = pa.memory_map(self.documents_path, "r") if memory_map else pa.OSFile(self.documents_path, "rb")
+        with source:
+            return pa.ipc.open_file(source).read_all()
+
+    def save(self, documents, state):
+        """Writes the table (atomically) and then the state, so a partial save is never trusted."""
+        import pyarrow as pa
+
+        os.makedirs(self.snapshot_dir, exist_ok=True)
+        temp_path = f"{self.documents_path}.tmp{threading.get_ident()}"
+        with pa.OSFile(temp_path, "wb") as sink:
+            with pa.ipc.new_file(sink, documents.schema) as writer:
+                writer.write_table(documents)
+        os.replace(temp_path, self.documents_path)
+        state = dict(state, updated=datetime.now().isoformat(timespec="seconds"), documents=documents.num_rows)
+        temp_path = f"{self.state_path}.tmp{threading.get_ident()}"
+        with open(temp_path, "w", encoding="utf-8") as state_file:
+            json.dump(state, state_file, indent=1)
+        os.replace(temp_path, self.state_path)
+
+def _max_id(table, column):
+    import pyarrow.compute as pc
+
+    return pc.max(table[column]).as_py() if table.num_rows else None
+
+def pending_invoice_ids(documents):
+    """Invoices stored without an authorization code (SIAT invoices still waiting for their CUF)."""
+    import pyarrow.compute as pc
+
+    return documents.filter(pc.is_null(documents['codigoAutorizacion']))['idFactura'].to_pylist()
+
+def merge_snapshot_documents(documents, document_rows):
+    """
+    Adds fetched rows to the stored documents (None when there are none yet),
+    replacing the stored ones of the same invoice. Returns (documents, state).
+    """
+    import pyarrow as pa
+    import pyarrow.compute as pc
+
+    new_documents = rows_to_table(document_rows, _documents_schema())
+    if documents is not None:
+        kept = documents.filter(pc.invert(pc.is_in(documents['idFactura'], value_set=new_documents['idFactura'])))
+        new_documents = pa.concat_tables([kept, new_documents])
+    return new_documents, {'max_invoice_id': _max_id(new_documents, 'idFactura')}
+
+def invoice_documents(documents, invoice_ids):
+    """idFactura -> stored document row of the given invoices."""
+    import pyarrow as pa
+    import pyarrow.compute as pc
+
+    selected = documents.filter(pc.is_in(documents['idFactura'], value_set=pa.array(sorted(invoice_ids), type=pa.int64())))
+    return {row['idFactura']: row for row in selected.to_pylist()}
+
+def _rounded_text(amount):
+    """ROUND(amount, 0) as MySQL renders it inside CONCAT."""
+    return str(amount.quantize(Decimal(1), rounding=ROUND_HALF_UP))
+
+def join_auxiliary_rows(year, month, payments, documents, invoices, statement_lines):
+    """
+    Builds the Registro Auxiliar rows of a period in-process, as the SQL of
+    build_auxiliary_sales_query does: one row per paid invoice and matching
+    statement line (or None), ordered by invoice date.
+
+    Args:
+        payments (list): The period's payment links (build_invoice_payments_query)
+        documents (dict): idFactura -> document row (invoice_documents)
+        invoices (dict): idFactura -> current factura row (build_invoice_rows_query)
+        statement_lines (list): The period's statement lines (build_statement_lines_query)
+
+    Returns:
+        list: Tuples in AUXILIARY_SALES_COLUMNS order
+    """
+    year_end = year_end_exclusive(year)
+    lines_by_code = {}
+    for line in statement_lines:
+        lines_by_code.setdefault(line['codigo'], []).append(line)
+
+    joined = []
+    for payment in payments:
+        invoice = invoices.get(payment['idFactura'])
+        document = documents.get(payment['idFactura'])
+        if invoice is None or document is None:
+            continue
+        if not (invoice['fechaFac'] < year_end and not invoice['anulada'] and invoice['total'] >= 50000 and invoice['nFactura'] > 0):
+            continue
+        amount = Decimal(document['montoTotal']) if document['montoTotal'] is not None else None
+        row_id = f"{invoice['fechaFac']}-{_rounded_text(amount)}" if amount is not None else None
+        document_type = PAYMENT_DOCUMENT_TYPES.get(payment['tipoPago'], '')
+        for line in lines_by_code.get(payment['transferencia'], [None]):
+            line = line or {}
+            line_amount = line.get('monto')
+            received = amount if line_amount is not None and amount is not None and line_amount > amount and invoice['pagada'] == 1 else line_amount
+            joined.append((invoice['fechaFac'], (
+                row_id, 2, 1, invoice['ClienteNit'], '', invoice['ClienteFactura'],
+                document['codigoAutorizacion'], invoice['nFactura'], 2, invoice['nFactura'],
+                invoice['fechaFac'], amount, 'COLOCAREXCEL', 3,
+                line.get('fecha'), line.get('cuenta'), line.get('nit'), line.get('codigo'),
+                received, line.get('descripcion'), line.get('adicional'), line.get('banco'), line.get('cheque'),
+                line.get('referencia'), int(year), line.get('idExtracto'), payment['transferencia'], payment['idPago'],
+                invoice['almacen'], invoice['pagada'],
+                invoice['idFactura'], document_type, payment['glosa'], payment['imagen'],
+            )))
+    joined.sort(key=lambda entry: entry[0])
+    return [row for _, row in joined]
@@ -0,0 +1,83 @@
+# C:\Users\willy\Projects\bancarizacion\bancarizacion\orchestrator.py
+"""
+Concurrent execution of independent pipelines.
+Database/I-O bound pipelines run on threads; CPU bound pipelines (pandas,
+openpyxl parsing) run in a separate process so they do not compete for the GIL.
+"""
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from bancarizacion.batch import pipeline_status
+from bancarizacion.instrumentation import collect_call, get_collector
+
+def _timed_call(func, args, collect_metrics=False):
+    """
+    Calls func(*args) and returns (result, seconds, stage records). Module-level so it can run in a process pool.
+    Stage records are only collected when collect_metrics is True (otherwise an empty list).
+    """
+    start = time.perf_counter()
+    if collect_metrics:
+        result, records = collect_call(func, args)
+    else:
+        result, records = func(*args), []
+    return result, time.perf_counter() - start, records
+
+def run_pipelines_concurrently(thread_pipelines, process_pipelines=None):
+    """
+    Runs every pipeline at the same time and collects one result per pipeline.
+
+    Args:
+        thread_pipelines (dict): Pipeline name -> (callable, args tuple), run on threads
+        process_pipelines (dict, optional): Pipeline name -> (callable, args tuple), run in
+            a process pool. Callables must be picklable (module-level functions).
+
+    Returns:
+        list: One dict per pipeline with status ("ok", "empty" or "failed"), output, seconds and error
+    """
+    from concurrent.futures import ProcessPoolExecutor
+
+    process_pipelines = process_pipelines or {}
+    results = {}
+    # Stage metrics of each pipeline are merged into the caller's collector, if any
+    collector = get_collector()
+    collect_metrics = collector is not None
+
+    with ThreadPoolExecutor(max_workers=max(1, len(thread_pipelines)), thread_name_prefix="pipeline") as thread_executor, \
+            ProcessPoolExecutor(max_workers=max(1, len(process_pipelines))) as process_executor:
+        futures = {}
+        # Submit the process pipelines first, process start-up overlaps with the DB work
+        for name, (func, args) in process_pipelines.items():
+            futures[name] = process_executor.submit(_timed_call, func, args, collect_metrics)
+        for name, (func, args) in thread_pipelines.items():
+            futures[name] = thread_executor.submit(_timed_call, func, args, collect_metrics)
+
+        for name, future in futures.items():
+            entry = {'pipeline': name, 'output': None, 'error': None, 'seconds': None}
+            try:
+                result, entry['seconds'], records = future.result()
+                if collect_metrics:
+                    collector.extend(records, label=name)
+                entry['status'] = pipeline_status(result)
+                if entry['status'] == "ok":
+                    entry['output'] = result
+            except Exception as e:
+                entry['status'] = "failed"
+                entry['error'] = f"{type(e).__name__}: {e}"
+            results[name] = entry
+
+    return [results[name] for name in list(thread_pipelines) + list(process_pipelines)]
+
+def print_pipeline_report(results, total_seconds=None):
+    """Prints the per-pipeline result table of a concurrent run."""
+    print("\n--- Pipelines Summary ---")
+    print(f"{'PIPELINE':<14}{'STATUS':<9}{'SECONDS':>9}  OUTPUT / ERROR")
+    for entry in results:
+        detail = entry['error'] or entry['output'] or ''
+        seconds = f"{entry['seconds']:.2f}" if entry['seconds'] is not None else "-"
+        print(f"{entry['pipeline']:<14}{entry['status']:<9}{seconds:>9}  {detail}")
+    if total_seconds is not None:
+        print(f"Total wall time {total_seconds:.2f}s")
+
+def exit_status(results):
+    """Combined exit status: 0 when no pipeline failed, 1 otherwise."""
+    return 1 if any(entry['status'] == "failed" for entry in results) else 0
@@ -0,0 +1,200 @@
+# C:\Users\willy\Projects\bancarizacion\bancarizacion\output_writers.py
+"""
+Tabular output backends other than XLSX: streaming CSV in the layout of the
+SIAT bulk upload files (pipe separated, dd/mm/yyyy dates, no quoting) and
+Parquet for scripts that read the data back. Both take rows as tuples in
+the order of the headers and write them as they are consumed; see
+core_logic.write_output, which also handles dict rows and XLSX.
+"""
+import os
+import threading
+from datetime import date, datetime
+
+OUTPUT_FORMATS = ("xlsx", "csv", "parquet")
+DEFAULT_OUTPUT_FORMAT = "xlsx"
+
+# SIAT text files: fields separated by '|', one record per line, UTF-8
+SIAT_CSV_DELIMITER = "|"
+SIAT_CSV_ENCODING = "utf-8"
+SIAT_CSV_DATE_FORMAT = "%d/%m/%Y"
+
+PARQUET_BATCH_ROWS = 50000
+
+# Rows per XLSX sheet (Excel's limit, headers included)
+XLSX_MAX_ROWS = 1048576
+
+def output_file_name(base_name, output_format):
+    """File name for base_name (without extension) in the given format."""
+    return f"{base_name}.{output_format}"
+
+def _remove_if_exists(file_path):
+    """Removes the temporary file of a write that did not complete."""
+    if os.path.exists(file_path):
+        os.remove(file_path)
+
+def _csv_text(value, delimiter, date_format):
+    """A field of a SIAT text file: no separators or line breaks inside, dates as date_format."""
+    if value is None:
+        return ""
+    if isinstance(value, str):
+        if delimiter in value or "\n" in value or "\r" in value:
+            value = value.replace(delimiter, " ").replace("\r", " ").replace("\n", " ")
+        return value
+    if isinstance(value, (date, datetime)):
+        return value.strftime(date_format)
+    if isinstance(value, float) and value.is_integer():
+        return str(int(value))
+    return str(value)
+
+def write_csv(rows, headers, output_file_path, delimiter=SIAT_CSV_DELIMITER, encoding=SIAT_CSV_ENCODING,
+              date_format=SIAT_CSV_DATE_FORMAT):
+    """
+    Writes a header line and one line per row, streaming.
+    Returns the number of rows written.
+    """
+    row_count = 0
+    temp_path = f"{output_file_path}.tmp{threading.get_ident()}"
+    try:
+        with open(temp_path, "w", encoding=encoding, newline="") as csv_file:
+            csv_file.write(delimiter.join(str(header) for header in headers) + "\r\n")
+            write = csv_file.write
+            for row in rows:
+                write(delimiter.join([_csv_text(value, delimiter, date_format) for value in row]) + "\r\n")
+                row_count += 1
+        os.replace(temp_path, output_file_path)
+    finally:
+        _remove_if_exists(temp_path)
+    return row_count
+
+def _batch_type(values):
+    """Arrow type of a column's values in one batch; decimals get a fixed precision so every batch fits."""
+    import pyarrow as pa
+
+    data_type = pa.array(values).type
+    if pa.types.is_decimal(data_type):
+        return pa.decimal128(38, data_type.scale)
+    return data_type
+
+def _unified_type(stored_type, batch_type):
+    """
+    Type holding the values of both types: a column that was all None so far
+    takes the type of its first values, decimals the larger scale and
+    integers and floats become floats. Raises pyarrow errors on types that
+    do not mix (e.g. numbers and strings).
+    """
+    import pyarrow as pa
+
+    if stored_type == batch_type or pa.types.is_null(batch_type):
+        return stored_type
+    if pa.types.is_null(stored_type):
+        return batch_type
+    if pa.types.is_decimal(stored_type) and pa.types.is_decimal(batch_type):
+        return pa.decimal128(38, max(stored_type.scale, batch_type.scale))
+    schemas = [pa.schema([("value", stored_type)]), pa.schema([("value", batch_type)])]
+    return pa.unify_schemas(schemas, promote_options="permissive").field("value").type
+
+class ParquetRowWriter:
+    """
+    Writes rows (tuples in the order of the headers) to a Parquet file one
+    batch at a time. The column types are inferred from the values and
+    unified over all the batches, not taken from the first one: when a batch
+    needs a wider type (values in a column that was all None so far, a
+    larger decimal scale), the batches written until then are kept in a
+    segment file and rewritten with the final schema by close().
+    Columns that are None in every row are stored with the null type.
+    """
+
+    def __init__(self, headers, output_file_path):
+        self.headers = [str(header) for header in headers]
+        self.output_file_path = output_file_path
+        self.row_count = 0
+        self.schema = None
+        self._temp_prefix = f"{output_file_path}.tmp{threading.get_ident()}"
+        self._segments = []
+        self._writer = None
+
+    def _open_segment(self, schema):
+        import pyarrow.parquet as pq
+
+        if self._writer is not None:
+            self._writer.close()
+        self.schema = schema
+        self._segments.append(f"{self._temp_prefix}.{len(self._segments)}")
+        self._writer = pq.ParquetWriter(self._segments[-1], schema)
+
+    def write(self, batch):
+        """Writes a list of row tuples."""
+        import pyarrow as pa
+
+        if not batch:
+            return
+        columns = list(zip(*batch))
+        batch_types = [_batch_type(values) for values in columns]
+        if self.schema is None:
+            schema = pa.schema([pa.field(header, data_type) for header, data_type in zip(self.headers, batch_types)])
+        else:
+            schema = pa.schema([
+                pa.field(field.name, _unified_type(field.type, data_type)) for field, data_type in zip(self.schema, batch_types)
+            ])
+        if schema != self.schema:
+            self._open_segment(schema)
+        arrays = [pa.array(values, type=field.type) for values, field in zip(columns, schema)]
+        self._writer.write_table(pa.Table.from_arrays(arrays, schema=schema))
+        self.row_count += len(batch)
+
+    def close(self):
+        """Completes the file (atomically) and returns the number of rows written."""
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+
+        if self._writer is None:
+            self._open_segment(pa.schema([pa.field(header, pa.null()) for header in self.headers]))
+        self._writer.close()
+        self._writer = None
+        if len(self._segments) == 1:
+            os.replace(self._segments[0], self.output_file_path)
+        else:
+            # Earlier segments were written with narrower types: cast them to the final schema
+            temp_path = f"{self._temp_prefix}.all"
+            try:
+                with pq.ParquetWriter(temp_path, self.schema) as writer:
+                    for segment_path in self._segments:
+                        for record_batch in pq.ParquetFile(segment_path).iter_batches():
+                            writer.write_table(pa.Table.from_batches([record_batch]).cast(self.schema))
+                os.replace(temp_path, self.output_file_path)
+            finally:
+                _remove_if_exists(temp_path)
+        self.abort()
+        return self.row_count
+
+    def abort(self):
+        """Removes the temporary files of a write that did not complete (no-op after close)."""
+        if self._writer is not None:
+            self._writer.close()
+            self._writer = None
+        for segment_path in self._segments:
+            _remove_if_exists(segment_path)
+        self._segments = []
+
+def write_parquet(rows, headers, output_file_path, batch_rows=PARQUET_BATCH_ROWS):
+    """
+    Writes the rows to a Parquet file, batch_rows at a time, so the whole
+    result is never held in memory. Returns the number of rows written.
+    """
+    writer = ParquetRowWriter(headers, output_file_path)
+    try:
+        rows = iter(rows)
+        while True:
+            batch = [row for _, row in zip(range(batch_rows), rows)]
+            writer.write(batch)
+            if len(batch) < batch_rows:
+                break
+        return writer.close()
+    finally:
+        writer.abort()
+
+# Format -> writer(rows as tuples, headers, output_file_path)
+OUTPUT_WRITERS = {
+    'csv': write_csv,
+    'parquet': write_parquet,
+}
@@ -0,0 +1,597 @@
+# C:\Users\willy\Projects\bancarizacion\bancarizacion\query_builder.py
+"""
+SQL builders for the Bancarizacion queries.
+Periods are expressed as half-open date ranges ([start, next_month)) so that
+MySQL can use the indexes on the date columns instead of scanning the tables.
+"""
+from datetime import date, timedelta
+
+# Alias -> table name, as used in the FROM clauses below
+TABLE_ALIASES = {
+    'f': 'factura',
+    'fs': 'factura_siat',
+    'df': 'datosfactura',
+    'pf': 'pago_factura',
+    'p': 'pago',
+    'tp': 'tipoPago',
+    'e': 'extractos',
+    'b': 'bancos',
+}
+
+# Composite indexes that let the period queries avoid full scans
+RECOMMENDED_INDEXES = {
+    'factura': ('idx_factura_fecha', ('fechaFac', 'anulada', 'total')),
+    'factura_siat': ('idx_factura_siat_factura', ('factura_id',)),
+    'pago_factura': ('idx_pago_factura_factura', ('idFactura', 'idPago')),
+    'pago': ('idx_pago_fecha', ('fechaPago', 'idPago')),
+    'extractos': ('idx_extractos_codigo_fecha', ('codigo', 'fecha')),
+}
+
+# Result column -> SQL expression of the ids used as high-water marks by incremental runs
+SALES_WATERMARK_COLUMNS = {
+    'invoiceId': 'f.idFactura',
+}
+# Monthly paid amount per invoice, maintained by refresh_payment_summary so the
+# accumulated amount of a contract does not require scanning all its payments
+PAYMENT_SUMMARY_TABLE = "resumen_pago_factura"
+# Months already summarized, with the time of their last refresh
+PAYMENT_SUMMARY_PERIODS_TABLE = "resumen_pago_periodo"
+
+# Partition key of the invoices without a branch: almacen=None means no branch filter,
+# so the NULL branch needs its own value (see build_partition_filter)
+NULL_ALMACEN = "NULL"
+
+AUXILIARY_WATERMARK_COLUMNS = {
+    'idFactura': 'f.idFactura',
+    'idPago': 'p.idPago',
+    'idExtracto': 'e.id',
+}
+
+def month_range(year, month):
+    """
+    Returns the half-open date range [start, end) covering a given month.
+
+    Args:
+        year (int): Year of the period (e.g. 2025)
+        month (int): Month of the period (1-12)
+
+    Returns:
+        tuple: (first day of the month, first day of the following month)
+    """
+    year = int(year)
+    month = int(month)
+    if not 1 <= month <= 12:
+        raise ValueError(f"Invalid month: {month}. Expected a value between 1 and 12.")
+    start = date(year, month, 1)
+    end = date(year + 1, 1, 1) if month == 12 else date(year, month + 1, 1)
+    return start, end
+
+def year_end_exclusive(year):
+    """Returns the first day of the following year, the exclusive upper bound of a year."""
+    return date(int(year) + 1, 1, 1)
+
+def build_incremental_filter(watermark_columns, watermarks=None, invoice_ids=()):
+    """
+    Builds the extra WHERE condition of an incremental run.
+
+    Args:
+        watermark_columns (dict): Result column -> SQL expression of its id
+        watermarks (dict, optional): Result column -> highest id already stored.
+            A column without a mark matches any non-NULL id. None means no
+            snapshot exists yet and the whole period is selected.
+        invoice_ids (iterable, optional): Invoices to select again in full
+            (e.g. because their status changed)
+
+    Returns:
+        tuple: (SQL starting with ' AND', parameters), or ('', ()) for the whole period
+    """
+    invoice_ids = list(invoice_ids)
+    if watermarks is None and not invoice_ids:
+        return "", ()
+    conditions = []
+    params = []
+    if watermarks is not None:
+        for column, expression in watermark_columns.items():
+            if watermarks.get(column) is None:
+                conditions.append(f"{expression} IS NOT NULL")
+            else:
+                conditions.append(f"{expression} > %s")
+                params.append(watermarks[column])
+    if invoice_ids:
+        conditions.append(f"f.idFactura IN ({', '.join(['%s'] * len(invoice_ids))})")
+        params.extend(invoice_ids)
+    return f"\n            AND ({' OR '.join(conditions)})", tuple(params)
+
+def build_partition_filter(almacen=None, id_range=None):
+    """
+    Builds the extra WHERE condition restricting a period query to one
+    partition, used to split a large period into smaller sub-queries: one
+    branch (almacen, NULL_ALMACEN for the invoices without one) and/or a range
+    of invoice ids (low inclusive, high exclusive).
+    Returns (SQL starting with ' AND', parameters), or ('', ()) for the whole period.
+    """
+    conditions = []
+    params = []
+    if almacen == NULL_ALMACEN:
+        conditions.append("f.almacen IS NULL")
+    elif almacen is not None:
+        conditions.append("f.almacen = %s")
+        params.append(almacen)
+    if id_range is not None:
+        conditions.append("f.idFactura >= %s AND f.idFactura < %s")
+        params.extend(id_range)
+    if not conditions:
+        return "", ()
+    return f"\n            AND {' AND '.join(conditions)}", tuple(params)
+
+def _period_invoice_scope(year, month, by_payment=False):
+    """
+    FROM/WHERE of the invoices behind a period query: invoices issued in the
+    period (Contratos) or, with by_payment=True, invoices paid in the period
+    (Registro Auxiliar, one row per invoice and payment). Returns (SQL, parameters).
+    """
+    start, end = month_range(year, month)
+    if by_payment:
+        scope = """
+        FROM
+            factura f
+            INNER JOIN pago_factura pf ON pf.idFactura = f.idFactura
+            INNER JOIN pago p ON p.idPago = pf.idPago
+        WHERE
+            f.fechaFac < %s
+            AND f.anulada = 0
+            AND f.total >= 50000
+            AND p.fechaPago >= %s
+            AND p.fechaPago < %s"""
+        return scope, (year_end_exclusive(year), start, end)
+    scope = """
+        FROM
+            factura f
+        WHERE
+            f.fechaFac >= %s
+            AND f.fechaFac < %s
+            AND f.anulada = 0
+            AND f.total >= 50000"""
+    return scope, (start, end)
+
+def build_period_almacenes_query(year, month, by_payment=False):
+    """Builds the query listing the branches (almacen) with rows in a period (see _period_invoice_scope)."""
+    scope, params = _period_invoice_scope(year, month, by_payment)
+    query = """
+        SELECT DISTINCT f.almacen AS almacen""" + scope + """
+        ORDER BY f.almacen
+        """
+    return query, params
+
+def build_partition_probe_query(year, month, by_payment=False):
+    """
+    Builds the probe sizing the invoice id partitions of a period query: the
+    number of rows (invoice/payment pairs with by_payment=True) and the
+    lowest and highest invoice id. Only factura (and the payment links) are read.
+    """
+    scope, params = _period_invoice_scope(year, month, by_payment)
+    query = """
+        SELECT
+            COUNT(*) AS rowCount,
+            MIN(f.idFactura) AS minId,
+            MAX(f.idFactura) AS maxId""" + scope + """
+        """
+    return query, params
+
+def build_invoice_status_query(invoice_ids):
+    """Builds the query returning the current anulada/pagada/total of the given invoices."""
+    invoice_ids = list(invoice_ids)
+    query = f"""
+        SELECT
+            f.idFactura AS idFactura,
+            f.anulada AS anulada,
+            f.pagada AS pagada,
+            f.total AS total
+        FROM
+            factura f
+        WHERE
+            f.idFactura IN ({', '.join(['%s'] * len(invoice_ids))})
+        """
+    return query, tuple(invoice_ids)
+
+def build_sales_invoice_query(year, month, watermarks=None, invoice_ids=(), accumulated=False, almacen=None, id_range=None):
+    """
+    Builds the sales invoice (Contratos) query and its parameters for a given period.
+    watermarks/invoice_ids restrict it to new or changed invoices (see build_incremental_filter),
+    almacen/id_range to one partition (see build_partition_filter).
+    With accumulated=True, accumulatedAmount is the amount paid for each invoice
+    up to the end of the period, read from the payment summary table (see
+    build_payment_summary_refresh) instead of 0.
+    """
+    start, end = month_range(year, month)
+    incremental_sql, incremental_params = build_incremental_filter(SALES_WATERMARK_COLUMNS, watermarks, invoice_ids)
+    partition_sql, partition_params = build_partition_filter(almacen, id_range)
+    accumulated_sql, accumulated_params = "0", ()
+    if accumulated:
+        accumulated_sql = f"""COALESCE((
+                SELECT SUM(s.montoPagado) FROM {PAYMENT_SUMMARY_TABLE} s
+                WHERE s.idFactura = f.idFactura AND s.periodo <= %s
+            ), 0)"""
+        accumulated_params = (start,)
+    query = """
+        SELECT
+            2 AS contractType,
+            1 AS transactionType,
+            'VENTA DE MERCADERIA' AS contractObject,
+            '' AS providerNit,
+            '' AS contractNumber,
+            f.fechaFac AS contractDate,
+            f.total AS totalAmount,
+            0 AS exchangeValue,
+            1 AS numberOfInstallments,
+            0 AS advanceAmount,
+            '' AS exchangeObject,
+            """ + accumulated_sql + """ AS accumulatedAmount,
+            f.idFactura AS invoiceId,
+            f.pagada AS paid
+        FROM
+            factura f
+        WHERE
+            f.fechaFac >= %s
+            AND f.fechaFac < %s
+            AND f.anulada = 0
+            AND f.total >= 50000""" + incremental_sql + partition_sql + """
+        """
+    params = accumulated_params + (start, end) + incremental_params + partition_params
+    return query, params
+
+def build_auxiliary_sales_query(year, month, watermarks=None, invoice_ids=(), almacen=None, id_range=None):
+    """
+    Builds the auxiliary sales (Registro Auxiliar de Ventas) query and its parameters for a given period.
+    watermarks/invoice_ids restrict it to new or changed rows (see build_incremental_filter),
+    almacen/id_range to one partition (see build_partition_filter).
+    """
+    start, end = month_range(year, month)
+    incremental_sql, incremental_params = build_incremental_filter(AUXILIARY_WATERMARK_COLUMNS, watermarks, invoice_ids)
+    partition_sql, partition_params = build_partition_filter(almacen, id_range)
+    query = """
+        SELECT
+            CONCAT(f.fechaFac, '-', ROUND(fs.montoTotal,0)) AS id,
+            2 AS tipoTransaccion,
+            1 AS formaPago,
+            f.ClienteNit AS nitCliente,
+            '' AS complemento,
+            f.ClienteFactura AS nombreRazonSocial,
+            CASE
+                WHEN df.autorizacion = 'SIAT' THEN fs.cuf
+                ELSE df.autorizacion
+            END AS codigoAutorizacion,
+            f.nFactura AS numeroFactura,
+            2 AS tipoDocumentoRespaldo,
+            f.nFactura AS numeroDocumentoRespaldo,
+            f.fechaFac AS fechaDocumentoRespaldo,
+            fs.montoTotal AS montoFacturadoVenta,
+            'COLOCAREXCEL' AS numeroContrato,
+            3 AS tipoDocumentoPago, /* deposito en cuenta*/
+            e.fecha AS fechaDocumentoPago,
+            b.cuenta AS numeroCuentaVendedor,
+            b.nit AS nitEntidadFinancieraAbono,
+            e.codigo AS numeroTransaccion,
+            IF(e.monto > fs.montoTotal AND f.pagada = 1, fs.montoTotal, e.monto) AS montoRecibido,
+            e.descripcion AS extractoDescripcion,
+            e.adicional AS extractoAdicional,
+            e.banco AS extractoBanco,
+            e.cheque AS extractoCheque,
+            e.referencia AS extractoReferencia,
+            %s AS gestion, /* Using @gestionPago for gestion */
+            e.id AS idExtracto,
+            /* e.codigo, -- This is duplicated by numeroTransaccion, aliasing to avoid confusion */
+            p.transferencia AS pagoTransferencia,
+            p.idPago AS idPago,
+            f.almacen AS almacen,
+            f.pagada AS pagada,
+            f.idFactura AS idFactura,
+            CASE
+                WHEN tp.tipoPago = 'CHEQUE' THEN '1'
+                WHEN tp.tipoPago = 'TRANSFERENCIA' THEN '4'
+                ELSE ''
+            END AS tipoDocPagoOriginal, /* Renamed to avoid conflict if 'tipoDocumentoPago' is used differently */
+            p.glosa AS pagoGlosa,
+            p.imagen AS pagoImagen
+        FROM
+            factura f
+            LEFT JOIN factura_siat fs ON fs.factura_id = f.idFactura
+            INNER JOIN datosfactura df ON df.idDatosFactura = f.lote
+            LEFT JOIN pago_factura pf ON pf.idFactura = f.idFactura
+            LEFT JOIN pago p ON p.idPago = pf.idPago
+            LEFT JOIN tipoPago tp ON tp.id = p.tipoPago
+            LEFT JOIN extractos e ON e.codigo = p.transferencia AND e.fecha >= %s AND e.fecha < %s AND e.codigo<>''
+            LEFT JOIN bancos b ON b.id = e.banco
+        WHERE
+            f.fechaFac < %s
+            AND f.anulada = 0
+            AND f.total >= 50000
+            AND f.nFactura > 0
+            AND p.fechaPago >= %s
+            AND p.fechaPago < %s""" + incremental_sql + partition_sql + """
+        ORDER BY f.fechaFac;
+        """
+    # Parameters: gestion, extract date range, invoice year bound, payment date range.
+    # 'YEAR(f.fechaFac) <= year' becomes 'f.fechaFac < first day of year + 1'.
+    params = (int(year), start, end, year_end_exclusive(year), start, end) + incremental_params + partition_params
+    return query, params
+
+def build_reconciliation_payments_query(year, month):
+    """
+    Builds the query of the period's payments with their invoices (one row per
+    payment and invoice, same invoice filters as the auxiliary sales query),
+    loaded by the reconciliation engine instead of joining extractos in SQL.
+    """
+    start, end = month_range(year, month)
+    query = """
+        SELECT
+            p.idPago AS idPago,
+            p.transferencia AS transferencia,
+            p.fechaPago AS fechaPago,
+            f.idFactura AS idFactura,
+            f.nFactura AS numeroFactura,
+            f.pagada AS pagada,
+            COALESCE(fs.montoTotal, f.total) AS montoFactura
+        FROM
+            factura f
+            LEFT JOIN factura_siat fs ON fs.factura_id = f.idFactura
+            INNER JOIN datosfactura df ON df.idDatosFactura = f.lote
+            INNER JOIN pago_factura pf ON pf.idFactura = f.idFactura
+            INNER JOIN pago p ON p.idPago = pf.idPago
+        WHERE
+            f.fechaFac < %s
+            AND f.anulada = 0
+            AND f.total >= 50000
+            AND f.nFactura > 0
+            AND p.fechaPago >= %s
+            AND p.fechaPago < %s
+        ORDER BY p.idPago
+        """
+    params = (year_end_exclusive(year), start, end)
+    return query, params
+
+def build_bank_extracts_query(year, month, margin_days=0):
+    """
+    Builds the query of the bank statement lines (extractos) of a period,
+    widened by margin_days on both sides for date-tolerant matching.
+    """
+    start, end = month_range(year, month)
+    query = """
+        SELECT
+            e.id AS idExtracto,
+            e.codigo AS codigo,
+            e.fecha AS fecha,
+            e.monto AS monto,
+            e.banco AS banco
+        FROM
+            extractos e
+        WHERE
+            e.fecha >= %s
+            AND e.fecha < %s
+        """
+    params = (start - timedelta(days=margin_days), end + timedelta(days=margin_days))
+    return query, params
+
+def build_invoice_documents_query(min_invoice_id=None, invoice_ids=()):
+    """
+    Builds the query of the SIAT document data of invoices for the join
+    snapshot: the authorization code (the CUF for SIAT invoices) and the
+    factura_siat total. Selects the invoices above min_invoice_id and/or the
+    given invoice_ids; every invoice when neither is given.
+    """
+    conditions = []
+    params = []
+    if min_invoice_id is not None:
+        conditions.append("f.idFactura > %s")
+        params.append(min_invoice_id)
+    invoice_ids = list(invoice_ids)
+    if invoice_ids:
+        conditions.append(f"f.idFactura IN ({', '.join(['%s'] * len(invoice_ids))})")
+        params.extend(invoice_ids)
+    where_sql = f"\n        WHERE\n            {' OR '.join(conditions)}" if conditions else ""
+    query = """
+        SELECT
+            f.idFactura AS idFactura,
+            CASE
+                WHEN df.autorizacion = 'SIAT' THEN fs.cuf
+                ELSE df.autorizacion
+            END AS codigoAutorizacion,
+            fs.montoTotal AS montoTotal
+        FROM
+            factura f
+            LEFT JOIN factura_siat fs ON fs.factura_id = f.idFactura
+            INNER JOIN datosfactura df ON df.idDatosFactura = f.lote""" + where_sql + """
+        """
+    return query, tuple(params)
+
+def build_invoice_payments_query(year, month):
+    """
+    Builds the query of the period's invoice -> payment links (pago_factura,
+    pago and tipoPago), joined in-process to the join snapshot documents.
+    """
+    start, end = month_range(year, month)
+    query = """
+        SELECT
+            pf.idFactura AS idFactura,
+            p.idPago AS idPago,
+            p.fechaPago AS fechaPago,
+            p.transferencia AS transferencia,
+            tp.tipoPago AS tipoPago,
+            p.glosa AS glosa,
+            p.imagen AS imagen
+        FROM
+            pago_factura pf
+            INNER JOIN pago p ON p.idPago = pf.idPago
+            LEFT JOIN tipoPago tp ON tp.id = p.tipoPago
+        WHERE
+            p.fechaPago >= %s
+            AND p.fechaPago < %s
+        """
+    return query, (start, end)
+
+def build_invoice_rows_query(invoice_ids):
+    """Builds the query of the current factura columns of the given invoices, joined to the snapshot in-process."""
+    invoice_ids = list(invoice_ids)
+    query = f"""
+        SELECT
+            f.idFactura AS idFactura,
+            f.nFactura AS nFactura,
+            f.fechaFac AS fechaFac,
+            f.total AS total,
+            f.anulada AS anulada,
+            f.pagada AS pagada,
+            f.ClienteNit AS ClienteNit,
+            f.ClienteFactura AS ClienteFactura,
+            f.almacen AS almacen
+        FROM
+            factura f
+        WHERE
+            f.idFactura IN ({', '.join(['%s'] * len(invoice_ids))})
+        """
+    return query, tuple(invoice_ids)
+
+def build_statement_lines_query(year, month):
+    """
+    Builds the query of the period's bank statement lines with a transfer
+    code and the account of their bank, as the Registro Auxiliar joins them.
+    """
+    start, end = month_range(year, month)
+    query = """
+        SELECT
+            e.id AS idExtracto,
+            e.codigo AS codigo,
+            e.fecha AS fecha,
+            e.monto AS monto,
+            e.banco AS banco,
+            e.descripcion AS descripcion,
+            e.adicional AS adicional,
+            e.cheque AS cheque,
+            e.referencia AS referencia,
+            b.cuenta AS cuenta,
+            b.nit AS nit
+        FROM
+            extractos e
+            LEFT JOIN bancos b ON b.id = e.banco
+        WHERE
+            e.fecha >= %s
+            AND e.fecha < %s
+            AND e.codigo <> ''
+        ORDER BY e.id
+        """
+    return query, (start, end)
+
+def build_payment_summary_tables():
+    """
+    Returns the CREATE TABLE statements of the payment summary: one row per
+    invoice and month with the amount paid that month, and the list of
+    months already summarized.
+    """
+    return [
+        f"""
+        CREATE TABLE IF NOT EXISTS {PAYMENT_SUMMARY_TABLE} (
+            idFactura INT NOT NULL,
+            periodo DATE NOT NULL,
+            montoPagado DECIMAL(14,2) NOT NULL,
+            pagos INT NOT NULL,
+            PRIMARY KEY (idFactura, periodo)
+        )
+        """,
+        f"""
+        CREATE TABLE IF NOT EXISTS {PAYMENT_SUMMARY_PERIODS_TABLE} (
+            periodo DATE NOT NULL PRIMARY KEY,
+            actualizado DATETIME NOT NULL
+        )
+        """,
+    ]
+
+def build_payment_summary_refresh(year, month, refreshed_at):
+    """
+    Builds the statements that recompute the payment summary of one month.
+    The amount paid per invoice is the sum of montoRecibido of the auxiliary
+    sales query (the bank statement amount, capped at the invoice amount when
+    the invoice is paid) over the month's payments, so the accumulated amount
+    matches the Registro Auxiliar reports of the previous months.
+
+    Returns:
+        list: (query, params) tuples, to be run in one transaction
+    """
+    start, end = month_range(year, month)
+    delete_query = f"DELETE FROM {PAYMENT_SUMMARY_TABLE} WHERE periodo = %s"
+    insert_query = f"""
+        INSERT INTO {PAYMENT_SUMMARY_TABLE} (idFactura, periodo, montoPagado, pagos)
+        SELECT
+            f.idFactura,
+            %s,
+            SUM(COALESCE(IF(e.monto > fs.montoTotal AND f.pagada = 1, fs.montoTotal, e.monto), 0)),
+            COUNT(DISTINCT p.idPago)
+        FROM
+            pago p
+            INNER JOIN pago_factura pf ON pf.idPago = p.idPago
+            INNER JOIN factura f ON f.idFactura = pf.idFactura
+            LEFT JOIN factura_siat fs ON fs.factura_id = f.idFactura
+            LEFT JOIN extractos e ON e.codigo = p.transferencia AND e.fecha >= %s AND e.fecha < %s AND e.codigo<>''
+        WHERE
+            p.fechaPago >= %s
+            AND p.fechaPago < %s
+            AND f.anulada = 0
+        GROUP BY f.idFactura
+        """
+    period_query = f"REPLACE INTO {PAYMENT_SUMMARY_PERIODS_TABLE} (periodo, actualizado) VALUES (%s, %s)"
+    return [
+        (delete_query, (start,)),
+        (insert_query, (start, start, end, start, end)),
+        (period_query, (start, refreshed_at)),
+    ]
+
+def build_payment_summary_periods_query():
+    """Builds the query of the months already in the payment summary."""
+    return f"SELECT periodo FROM {PAYMENT_SUMMARY_PERIODS_TABLE} ORDER BY periodo", ()
+
+def build_first_payment_query():
+    """Builds the query of the date of the oldest payment (where a full summary starts)."""
+    return "SELECT p.fechaPago AS primerPago FROM pago p WHERE p.fechaPago IS NOT NULL ORDER BY p.fechaPago LIMIT 1", ()
+
+def advise_indexes(explain_rows):
+    """
+    Summarizes EXPLAIN output and suggests the missing composite indexes.
+
+    Args:
+        explain_rows (list): Rows returned by EXPLAIN as dictionaries
+
+    Returns:
+        list: One dictionary per table with the index used; when the table is
+              fully scanned (type ALL) the CREATE INDEX statement that would
+              avoid it, and for a full index scan (type index) a note saying
+              whether the scanned index is the recommended one
+    """
+    report = []
+    for row in explain_rows or []:
+        alias = row.get('table')
+        table_name = TABLE_ALIASES.get(alias, alias)
+        used_key = row.get('key')
+        access_type = row.get('type')
+        suggestion = None
+        note = None
+        if table_name in RECOMMENDED_INDEXES and access_type in ('ALL', 'index'):
+            index_name, columns = RECOMMENDED_INDEXES[table_name]
+            create_index = f"CREATE INDEX {index_name} ON {table_name} ({', '.join(columns)});"
+            if access_type == 'ALL':
+                suggestion = create_index
+            elif used_key == index_name:
+                # The index exists, but its leading columns are not usable for the conditions
+                note = f"full scan of the recommended index {index_name}"
+            else:
+                note = f"full scan of index {used_key}, not the recommended {index_name}"
+                suggestion = create_index
+        elif access_type == 'index':
+            note = f"full scan of index {used_key}"
+        report.append({
+            'table': table_name,
+            'alias': alias,
+            'type': access_type,
+            'key': used_key,
+            'rows': row.get('rows'),
+            'suggestion': suggestion,
+            'note': note,
+        })
+    return report
@@ -0,0 +1,241 @@
+# C:\Users\willy\Projects\bancarizacion\bancarizacion\reconciliation.py
+"""
+In-process reconciliation of payments (pago) against bank statement lines (extractos).
+The period's payments and statement lines are loaded once and the lines are
+indexed by transfer code and by (amount bucket, day), so every payment is
+matched with a few dictionary lookups and the whole run stays linear in the
+number of rows.
+
+A payment is:
+    exact      matched through its transfer code (a duplicated code is resolved by amount)
+    fuzzy      matched by amount and date within the tolerances (no usable code)
+    multiple   several lines qualify equally; left for manual review
+    unmatched  no line qualifies
+Statement lines that no payment uses are reported as unmatched_extract.
+"""
+from collections import Counter
+from datetime import datetime
+from decimal import Decimal
+
+DEFAULT_AMOUNT_TOLERANCE = Decimal("1.00") # Bs
+DEFAULT_DATE_TOLERANCE_DAYS = 3
+
+MATCH_EXACT = "exact"
+MATCH_FUZZY = "fuzzy"
+MATCH_MULTIPLE = "multiple"
+MATCH_UNMATCHED = "unmatched"
+MATCH_UNMATCHED_EXTRACT = "unmatched_extract"
+
+# Columns of the reconciliation report, in order (see reconciliation_report_rows)
+REPORT_COLUMNS = (
+    "estado", "idPago", "transferencia", "fechaPago", "montoPago", "facturas",
+    "idExtracto", "codigoExtracto", "fechaExtracto", "montoExtracto", "diferencia",
+    "montoRecibido", "extractoCompartido", "candidatos",
+)
+
+def _day_number(value):
+    """Day ordinal of a date or datetime (None stays None)."""
+    if value is None:
+        return None
+    if isinstance(value, datetime):
+        value = value.date()
+    return value.toordinal()
+
+def _to_decimal(value):
+    """Amounts as Decimal, whatever the column type (None stays None)."""
+    if value is None or isinstance(value, Decimal):
+        return value
+    return Decimal(str(value))
+
+def _clean_code(code):
+    return str(code).strip() if code is not None else ""
+
+def group_payments(payment_rows):
+    """
+    Collapses the rows of build_reconciliation_payments_query (one per payment
+    and invoice) into one dict per payment. The expected amount is the sum of
+    montoFactura over its invoices.
+    """
+    payments = {}
+    for row in payment_rows:
+        payment = payments.get(row['idPago'])
+        if payment is None:
+            payment = payments[row['idPago']] = {
+                'idPago': row['idPago'],
+                'transferencia': _clean_code(row['transferencia']),
+                'fechaPago': row['fechaPago'],
+                'day': _day_number(row['fechaPago']),
+                'amount': Decimal(0),
+                'invoices': [],
+                'pagada': True,
+            }
+        payment['amount'] += _to_decimal(row['montoFactura']) or 0
+        payment['invoices'].append(row['idFactura'])
+        payment['pagada'] = payment['pagada'] and row['pagada'] == 1
+    return list(payments.values())
+
+class ExtractIndex:
+    """Hash indexes over statement lines: by transfer code and by (amount bucket, day)."""
+
+    def __init__(self, extract_rows, amount_tolerance=DEFAULT_AMOUNT_TOLERANCE, date_tolerance_days=DEFAULT_DATE_TOLERANCE_DAYS):
+        self.amount_tolerance = amount_tolerance
+        self.date_tolerance_days = date_tolerance_days
+        # Buckets as wide as the tolerance: a match is always in the same or a neighbouring bucket
+        self.bucket_width = amount_tolerance if amount_tolerance > 0 else Decimal("0.01")
+        self.extracts = {}
+        self.by_code = {}
+        self.by_amount_day = {}
+        for row in extract_rows:
+            extract = {
+                'idExtracto': row['idExtracto'],
+                'codigo': _clean_code(row['codigo']),
+                'fecha': row['fecha'],
+                'day': _day_number(row['fecha']),
+                'monto': _to_decimal(row['monto']),
+            }
+            self.extracts[extract['idExtracto']] = extract
+            if extract['codigo']:
+                self.by_code.setdefault(extract['codigo'], []).append(extract)
+            if extract['monto'] is not None and extract['day'] is not None:
+                key = (self._bucket(extract['monto']), extract['day'])
+                self.by_amount_day.setdefault(key, []).append(extract)
+
+    def _bucket(self, amount):
+        return int(amount // self.bucket_width)
+
+    def by_transfer_code(self, code):
+        """Statement lines carrying a transfer code."""
+        return self.by_code.get(code, []) if code else []
+
+    def near(self, amount, day):
+        """Statement lines within the amount and date tolerances of (amount, day)."""
+        if amount is None or day is None:
+            return []
+        bucket = self._bucket(amount)
+        candidates = []
+        for bucket_key in (bucket - 1, bucket, bucket + 1):
+            for candidate_day in range(day - self.date_tolerance_days, day + self.date_tolerance_days + 1):
+                for extract in self.by_amount_day.get((bucket_key, candidate_day), ()):
+                    if abs(extract['monto'] - amount) <= self.amount_tolerance:
+                        candidates.append(extract)
+        return candidates
+
+def _distance(payment, extract):
+    """(amount difference, days apart) between a payment and a statement line; missing values rank last."""
+    amount_difference = abs(extract['monto'] - payment['amount']) if extract['monto'] is not None else Decimal("Infinity")
+    days_apart = abs(extract['day'] - payment['day']) if extract['day'] is not None and payment['day'] is not None else 0
+    return amount_difference, days_apart
+
+def _best_candidate(payment, candidates):
+    """
+    Returns (extract, None) when one candidate is strictly closer than the
+    others (amount first, then date), or (None, candidates) on a tie.
+    """
+    if len(candidates) == 1:
+        return candidates[0], None
+    scored = sorted(
+        (_distance(payment, extract) + (extract,) for extract in candidates),
+        key=lambda item: (item[0], item[1])
+    )
+    if scored[0][:2] < scored[1][:2]:
+        return scored[0][2], None
+    return None, [item[2] for item in scored if item[:2] == scored[0][:2]]
+
+def reconcile(payment_rows, extract_rows, amount_tolerance=DEFAULT_AMOUNT_TOLERANCE, date_tolerance_days=DEFAULT_DATE_TOLERANCE_DAYS):
+    """
+    Matches payments to statement lines.
+
+    Args:
+        payment_rows (iterable): Rows of build_reconciliation_payments_query
+        extract_rows (iterable): Rows of build_bank_extracts_query
+        amount_tolerance (Decimal): Maximum amount difference of a fuzzy match
+        date_tolerance_days (int): Maximum date difference of a fuzzy match
+
+    Returns:
+        dict: 'payments' (one dict per payment with status, extract and candidates),
+              'unmatched_extracts' (statement lines no payment uses) and
+              'summary' (Counter of statuses)
+    """
+    payments = group_payments(payment_rows)
+    index = ExtractIndex(extract_rows, amount_tolerance, date_tolerance_days)
+    used_by = Counter()
+
+    # Pass 1: transfer codes
+    pending = []
+    for payment in payments:
+        payment['extract'] = None
+        payment['candidates'] = []
+        candidates = index.by_transfer_code(payment['transferencia'])
+        if not candidates:
+            pending.append(payment)
+            continue
+        if len(candidates) > 1:
+            # Duplicated code: keep the lines with the expected amount
+            candidates = [extract for extract in candidates if _distance(payment, extract)[0] <= amount_tolerance] or candidates
+        extract, tied = _best_candidate(payment, candidates)
+        if extract is not None:
+            payment['status'] = MATCH_EXACT
+            payment['extract'] = extract
+            used_by[extract['idExtracto']] += 1
+        else:
+            payment['status'] = MATCH_MULTIPLE
+            payment['candidates'] = [candidate['idExtracto'] for candidate in tied]
+
+    # Pass 2: amount and date, oldest payments first, over the lines not used yet
+    pending.sort(key=lambda payment: (payment['day'] is None, payment['day'] or 0))
+    for payment in pending:
+        candidates = [extract for extract in index.near(payment['amount'], payment['day']) if extract['idExtracto'] not in used_by]
+        if not candidates:
+            payment['status'] = MATCH_UNMATCHED
+            continue
+        extract, tied = _best_candidate(payment, candidates)
+        if extract is not None:
+            payment['status'] = MATCH_FUZZY
+            payment['extract'] = extract
+            used_by[extract['idExtracto']] += 1
+        else:
+            payment['status'] = MATCH_MULTIPLE
+            payment['candidates'] = [candidate['idExtracto'] for candidate in tied]
+
+    for payment in payments:
+        payment['shared_extract'] = payment['extract'] is not None and used_by[payment['extract']['idExtracto']] > 1
+
+    unmatched_extracts = [extract for extract_id, extract in index.extracts.items() if extract_id not in used_by]
+    summary = Counter(payment['status'] for payment in payments)
+    summary[MATCH_UNMATCHED_EXTRACT] = len(unmatched_extracts)
+    return {'payments': payments, 'unmatched_extracts': unmatched_extracts, 'summary': summary}
+
+def received_amount(payment, extract):
+    """Amount received for a payment, as montoRecibido of the auxiliary query (capped at the invoiced amount when paid)."""
+    if extract['monto'] is not None and extract['monto'] > payment['amount'] and payment['pagada']:
+        return payment['amount']
+    return extract['monto']
+
+def reconciliation_report_rows(result):
+    """Yields one tuple per payment and per unused statement line, in REPORT_COLUMNS order."""
+    for payment in result['payments']:
+        extract = payment['extract']
+        yield (
+            payment['status'], payment['idPago'], payment['transferencia'], payment['fechaPago'], payment['amount'],
+            ", ".join(str(invoice_id) for invoice_id in payment['invoices']),
+            extract['idExtracto'] if extract else None,
+            extract['codigo'] if extract else None,
+            extract['fecha'] if extract else None,
+            extract['monto'] if extract else None,
+            extract['monto'] - payment['amount'] if extract and extract['monto'] is not None else None,
+            received_amount(payment, extract) if extract else None,
+            "SI" if payment['shared_extract'] else "",
+            ", ".join(str(candidate) for candidate in payment['candidates']),
+        )
+    for extract in result['unmatched_extracts']:
+        yield (
+            MATCH_UNMATCHED_EXTRACT, None, None, None, None, "",
+            extract['idExtracto'], extract['codigo'], extract['fecha'], extract['monto'], None, None, "", "",
+        )
+
+def print_reconciliation_summary(result):
+    """Prints the number of payments and statement lines per status."""
+    summary = result['summary']
+    print("\n--- Reconciliation Summary ---")
+    for status in (MATCH_EXACT, MATCH_FUZZY, MATCH_MULTIPLE, MATCH_UNMATCHED, MATCH_UNMATCHED_EXTRACT):
+        print(f"{status:<18}{summary.get(status, 0):>8}")
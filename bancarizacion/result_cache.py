@@ -0,0 +1,321 @@
+# C:\Users\willy\Projects\bancarizacion\bancarizacion\result_cache.py
+"""
+On-disk cache of query results, keyed by a hash of the query text and its parameters.
+Results are stored as Parquet files (one per query) with an index.json holding
+creation/access times and the period of each entry. Entries expire after a
+TTL and the least recently used ones are evicted above max_entries, except for
+periods pinned as closed, which are never refetched.
+"""
+import configparser
+import hashlib
+import json
+import os
+import threading
+import time
+
+from bancarizacion.output_writers import ParquetRowWriter
+from bancarizacion.rowsets import PositionalRows
+
+DEFAULT_TTL_HOURS = 24
+DEFAULT_MAX_ENTRIES = 200
+INDEX_FILE_NAME = "index.json"
+
+def format_period(year, month):
+    """Formats a period as 'YYYY-MM'."""
+    return f"{int(year)}-{int(month):02d}"
+
+def write_rows_parquet(rows, file_path):
+    """
+    Writes a list of dicts, or a PositionalRows with list rows, to a Parquet
+    file (atomically). Raises pyarrow errors on mixed column types.
+    """
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+
+    if isinstance(rows, PositionalRows):
+        column_values = list(zip(*rows.rows)) or [()] * len(rows.columns)
+        table = pa.Table.from_arrays([pa.array(values) for values in column_values], names=list(rows.columns))
+    else:
+        table = pa.Table.from_pylist(rows)
+    temp_path = f"{file_path}.tmp{threading.get_ident()}"
+    pq.write_table(table, temp_path)
+    os.replace(temp_path, file_path)
+
+def _table_tuples(table):
+    """Rows of a pyarrow Table or RecordBatch as tuples, built column by column."""
+    return list(zip(*[column.to_pylist() for column in table.columns]))
+
+def read_rows_parquet(file_path, positional=False):
+    """
+    Reads a Parquet file written by write_rows_parquet back into a list of
+    dicts, or into a PositionalRows when positional is True.
+    """
+    import pyarrow.parquet as pq
+
+    table = pq.read_table(file_path)
+    if positional:
+        return PositionalRows(table.column_names, _table_tuples(table))
+    return table.to_pylist()
+
+def iter_rows_parquet(file_path, batch_size=1000, positional=False):
+    """Yields the rows of a Parquet file as dicts (tuples when positional is True), one record batch at a time."""
+    import pyarrow.parquet as pq
+
+    parquet_file = pq.ParquetFile(file_path)
+    for batch in parquet_file.iter_batches(batch_size=batch_size):
+        if positional:
+            yield from _table_tuples(batch)
+        else:
+            yield from batch.to_pylist()
+
+class ResultCache:
+    """Parquet result cache with TTL, LRU eviction and pinned (closed) periods."""
+
+    def __init__(self, cache_dir, ttl_seconds=DEFAULT_TTL_HOURS * 3600, max_entries=DEFAULT_MAX_ENTRIES, closed_periods=()):
+        self.cache_dir = cache_dir
+        self.ttl_seconds = ttl_seconds
+        self.max_entries = max_entries
+        self._lock = threading.Lock()
+        os.makedirs(cache_dir, exist_ok=True)
+        self._index = self._load_index()
+        for period in closed_periods:
+            self._index['pinned_periods'][period] = True
+
+    @staticmethod
+    def make_key(query, params):
+        """Hash of the whitespace-normalized query text and the repr of its parameters."""
+        normalized_query = " ".join(query.split())
+        return hashlib.sha256(f"{normalized_query}\x00{params!r}".encode("utf-8")).hexdigest()
+
+    def _index_path(self):
+        return os.path.join(self.cache_dir, INDEX_FILE_NAME)
+
+    def _entry_path(self, key):
+        return os.path.join(self.cache_dir, f"{key}.parquet")
+
+    def _load_index(self):
+        try:
+            with open(self._index_path(), "r", encoding="utf-8") as index_file:
+                index = json.load(index_file)
+        except (FileNotFoundError, ValueError):
+            index = {}
+        index.setdefault('entries', {})
+        index.setdefault('pinned_periods', {})
+        return index
+
+    def _save_index(self):
+        temp_path = f"{self._index_path()}.tmp{threading.get_ident()}"
+        with open(temp_path, "w", encoding="utf-8") as index_file:
+            json.dump(self._index, index_file, indent=1)
+        os.replace(temp_path, self._index_path())
+
+    def _is_pinned(self, entry):
+        return bool(entry.get('period')) and entry['period'] in self._index['pinned_periods']
+
+    def _drop_entry(self, key):
+        self._index['entries'].pop(key, None)
+        try:
+            os.remove(self._entry_path(key))
+        except FileNotFoundError:
+            pass
+
+    def _lookup(self, query, params):
+        """Returns the key of a valid entry (updating its access time) or None. Caller holds the lock."""
+        key = self.make_key(query, params)
+        entry = self._index['entries'].get(key)
+        if entry is None:
+            return None
+        if not os.path.exists(self._entry_path(key)):
+            self._drop_entry(key)
+            return None
+        if not self._is_pinned(entry) and time.time() - entry['created'] > self.ttl_seconds:
+            self._drop_entry(key)
+            self._save_index()
+            return None
+        entry['last_access'] = time.time()
+        return key
+
+    def get(self, query, params, positional=False):
+        """Returns the cached rows (a PositionalRows when positional is True) for a query and parameters, or None on a miss."""
+        with self._lock:
+            key = self._lookup(query, params)
+            if key is None:
+                return None
+            self._save_index()
+        rows = read_rows_parquet(self._entry_path(key), positional=positional)
+        print(f"Result cache hit: {len(rows)} rows.")
+        return rows
+
+    def iter_rows(self, query, params, batch_size=1000, positional=False):
+        """
+        Returns an iterator over the cached rows (read batch by batch), or None on a miss.
+        With positional=True a PositionalRows streaming the tuples is returned.
+        """
+        with self._lock:
+            key = self._lookup(query, params)
+            if key is None:
+                return None
+            self._save_index()
+        print("Result cache hit, streaming cached rows.")
+        if positional:
+            import pyarrow.parquet as pq
+
+            columns = pq.read_schema(self._entry_path(key)).names
+            return PositionalRows(columns, iter_rows_parquet(self._entry_path(key), batch_size, positional=True))
+        return iter_rows_parquet(self._entry_path(key), batch_size)
+
+    def put(self, query, params, rows, period=None):
+        """
+        Stores rows (list of dicts or PositionalRows) for a query and parameters.
+        Returns False when the rows cannot be stored as Parquet.
+        """
+        key = self.make_key(query, params)
+        try:
+            write_rows_parquet(rows, self._entry_path(key))
+        except Exception as e:
+            # e.g. a column mixing numbers and strings
+            print(f"Result cache: rows not cached ({e})")
+            return False
+        self._add_entry(key, period, len(rows))
+        return True
+
+    def writer(self, query, params, columns=None, period=None):
+        """
+        Returns a CacheWriter that stores streamed rows for a query and
+        parameters batch by batch; columns is the header of tuple rows.
+        """
+        return CacheWriter(self, self.make_key(query, params), columns, period)
+
+    def _add_entry(self, key, period, row_count):
+        now = time.time()
+        with self._lock:
+            self._index['entries'][key] = {
+                'created': now,
+                'last_access': now,
+                'period': period,
+                'rows': row_count,
+            }
+            self._evict()
+            self._save_index()
+
+    def _evict(self):
+        """Removes the least recently used unpinned entries above max_entries. Caller holds the lock."""
+        unpinned = [(entry['last_access'], key) for key, entry in self._index['entries'].items() if not self._is_pinned(entry)]
+        pinned_count = len(self._index['entries']) - len(unpinned)
+        excess = pinned_count + len(unpinned) - self.max_entries
+        for _, key in sorted(unpinned)[:max(0, excess)]:
+            self._drop_entry(key)
+
+    def pin_period(self, year, month):
+        """Marks a period as closed: its entries never expire, are never evicted and are never refetched."""
+        with self._lock:
+            self._index['pinned_periods'][format_period(year, month)] = True
+            self._save_index()
+
+    def unpin_period(self, year, month):
+        """Removes the closed mark of a period; its entries expire normally again."""
+        with self._lock:
+            self._index['pinned_periods'].pop(format_period(year, month), None)
+            self._save_index()
+
+    def pinned_periods(self):
+        """Returns the sorted list of pinned periods ('YYYY-MM')."""
+        with self._lock:
+            return sorted(self._index['pinned_periods'])
+
+    def clear(self, include_pinned=False):
+        """Removes every entry (pinned periods' entries only when include_pinned is True)."""
+        with self._lock:
+            for key, entry in list(self._index['entries'].items()):
+                if include_pinned or not self._is_pinned(entry):
+                    self._drop_entry(key)
+            self._save_index()
+
+class CacheWriter:
+    """
+    Stores rows in a ResultCache as they are streamed, appending each batch
+    to the entry's Parquet file, so the rows are never collected in memory.
+    The entry is only added by close(), once every row has been written;
+    rows that cannot be stored (e.g. a column mixing numbers and strings)
+    just leave the query uncached.
+    """
+
+    def __init__(self, cache, key, columns, period):
+        self.cache = cache
+        self.key = key
+        self.columns = list(columns) if columns else None
+        self.period = period
+        self._writer = None
+        self._failed = False
+
+    def write(self, rows):
+        """Appends a batch of rows (dicts, or tuples in the order of columns)."""
+        if self._failed or not rows:
+            return
+        try:
+            if self.columns is None:
+                self.columns = list(rows[0].keys())
+            if isinstance(rows[0], dict):
+                rows = [tuple(row.get(column) for column in self.columns) for row in rows]
+            if self._writer is None:
+                self._writer = ParquetRowWriter(self.columns, self.cache._entry_path(self.key))
+            self._writer.write(rows)
+        except Exception as e:
+            print(f"Result cache: rows not cached ({e})")
+            self.abort()
+            self._failed = True
+
+    def close(self):
+        """Adds the entry to the cache. Returns True when the rows were stored."""
+        if self._failed:
+            return False
+        try:
+            if self._writer is None:
+                self._writer = ParquetRowWriter(self.columns or [], self.cache._entry_path(self.key))
+            row_count = self._writer.close()
+        except Exception as e:
+            print(f"Result cache: rows not cached ({e})")
+            self.abort()
+            return False
+        self._writer = None
+        self.cache._add_entry(self.key, self.period, row_count)
+        return True
+
+    def abort(self):
+        """Discards the rows written so far (no-op after close)."""
+        if self._writer is not None:
+            self._writer.abort()
+            self._writer = None
+
+def load_cache_config(config, project_root):
+    """
+    Builds a ResultCache from the optional [cache] section of a parsed config, or returns None.
+
+        [cache]
+        enabled = true
+        directory = data/cache
+        ttl_hours = 24
+        max_entries = 200
+        closed_periods = 2024-12, 2025-01
+    """
+    if 'cache' not in config or not config.getboolean('cache', 'enabled', fallback=True):
+        return None
+    try:
+        import pyarrow # noqa: F401 - only checks that the Parquet backend is available
+    except ImportError:
+        print("Result cache disabled: pyarrow is not installed.")
+        return None
+    try:
+        cache_dir = config.get('cache', 'directory', fallback=os.path.join("data", "cache"))
+        if not os.path.isabs(cache_dir):
+            cache_dir = os.path.join(project_root, cache_dir)
+        ttl_hours = config.getfloat('cache', 'ttl_hours', fallback=DEFAULT_TTL_HOURS)
+        max_entries = config.getint('cache', 'max_entries', fallback=DEFAULT_MAX_ENTRIES)
+        closed_periods = [
+            format_period(*period.strip().split('-'))
+            for period in config.get('cache', 'closed_periods', fallback='').split(',')
+            if period.strip()
+        ]
+    except (configparser.Error, ValueError, TypeError) as e:
+        raise ValueError(f"Invalid [cache] section: {e}")
+    return ResultCache(cache_dir, ttl_seconds=ttl_hours * 3600, max_entries=max_entries, closed_periods=closed_periods)
@@ -0,0 +1,36 @@
+# C:\Users\willy\Projects\bancarizacion\bancarizacion\rowsets.py
+"""
+Compact query results: one header with the column names plus one tuple per row.
+A dict per row repeats every key and costs a hash lookup per cell; the
+positional form is what the cursor returns natively and what the writers
+append, so rows flow from MySQL to the Excel file without being converted.
+"""
+
+class PositionalRows:
+    """
+    Column names plus rows as tuples in that order.
+    rows is a list (buffered fetch, cache) or an iterator (streaming fetch);
+    iterating a PositionalRows yields the tuples.
+    """
+    __slots__ = ('columns', 'rows')
+
+    def __init__(self, columns, rows):
+        self.columns = tuple(columns)
+        self.rows = rows
+
+    def __iter__(self):
+        return iter(self.rows)
+
+    def __len__(self):
+        """Number of rows; only available when rows is a list."""
+        return len(self.rows)
+
+    def column_index(self, column):
+        """Position of a column in the row tuples."""
+        return self.columns.index(column)
+
+    def as_dicts(self):
+        """Yields the rows as dicts, for callers that need them by name."""
+        columns = self.columns
+        for row in self.rows:
+            yield dict(zip(columns, row))
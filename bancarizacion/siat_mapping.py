@@ -0,0 +1,145 @@
+# C:\Users\willy\Projects\bancarizacion\bancarizacion\siat_mapping.py
+"""
+Declarative mappings from query rows to SIAT report rows.
+A mapping is a sequence of (SIAT column name, column spec) pairs. It is
+resolved once into one getter per column, and every record is turned into
+a positional tuple in column order, so no per-row dict is built and the
+writers append the tuple as is.
+"""
+import time
+
+from bancarizacion.instrumentation import add_time, metrics_enabled
+
+# --- Column specs ---
+
+def sequence():
+    """Running row number, starting at 1."""
+    return {'kind': 'sequence'}
+
+def constant(value):
+    """The same value on every row."""
+    return {'kind': 'constant', 'value': value}
+
+def field(key, default=None):
+    """The record value as is."""
+    return {'kind': 'field', 'key': key, 'default': default}
+
+def text(key, max_length=None, default='', blank_when=None):
+    """
+    The record value as a string, optionally truncated to max_length.
+    blank_when=(other key, value) writes '' when record[other key] == value.
+    """
+    return {'kind': 'text', 'key': key, 'max_length': max_length, 'default': default, 'blank_when': blank_when}
+
+def date_text(key, date_format="%d/%m/%Y"):
+    """A date formatted with date_format, '' when empty."""
+    return {'kind': 'date', 'key': key, 'format': date_format}
+
+def blank_if_zero(key):
+    """The record value, or '' when it is 0 (or missing)."""
+    return {'kind': 'blank_if_zero', 'key': key}
+
+def default_if_empty(key, default=0):
+    """The record value, or default when it is None, '' or missing."""
+    return {'kind': 'default_if_empty', 'key': key, 'default': default}
+
+# SIAT "Contratos" report, from the rows of build_sales_invoice_query
+CONTRATOS_MAPPING = (
+    ("N°", sequence()),
+    ("TIPO DE CONTRATO O ACUERDO", field('contractType')),
+    ("TIPO TRANSACCIÓN", field('transactionType')),
+    ("OBJETO DEL CONTRATO O ACUERDO", text('contractObject', max_length=100)),
+    ("NIT/CI PROVEEDOR", constant('')),
+    # Contract type 2 (sales) has no contract number
+    ("NÚMERO CONTRATO O ACUERDO", text('contractNumber', blank_when=('contractType', 2))),
+    ("FECHA DE CONTRATO O ACUERDO", date_text('contractDate')),
+    ("IMPORTE TOTAL DEL CONTRATO O ACUERDO (BS)", field('totalAmount')),
+    ("VALOR DE LA PERMUTA (BS)", blank_if_zero('exchangeValue')),
+    ("CANTIDAD DE CUOTAS", field('numberOfInstallments', default=1)),
+    ("IMPORTE ADELANTADO, IMPORTE RETENIDO, DESCUENTOS U OTROS (BS)", default_if_empty('advanceAmount')),
+    ("OBJETO PERMUTA", text('exchangeObject', max_length=100)),
+    ("MONTO ACUMULADO (BS)", default_if_empty('accumulatedAmount')),
+)
+
+def column_names(mapping):
+    """Returns the SIAT column names of a mapping, in order."""
+    return [name for name, _ in mapping]
+
+def _make_date_formatter(date_format):
+    """Formats dates with a per-run cache: a period only has a few distinct dates."""
+    formatted = {}
+    def format_date(value):
+        if not value:
+            return ''
+        result = formatted.get(value)
+        if result is None:
+            result = formatted[value] = value.strftime(date_format)
+        return result
+    return format_date
+
+def _column_getter(name, spec):
+    """Returns getter(record, number) -> the value of one column spec."""
+    kind = spec['kind']
+    if kind == 'sequence':
+        return lambda record, number: number
+    if kind == 'constant':
+        value = spec['value']
+        return lambda record, number: value
+    if kind not in ('field', 'text', 'date', 'blank_if_zero', 'default_if_empty'):
+        raise ValueError(f"Unknown column spec '{kind}' for column '{name}'.")
+    key = spec['key']
+    if kind == 'field':
+        default = spec['default']
+        return lambda record, number: record.get(key, default)
+    if kind == 'text':
+        default = spec['default']
+        max_length = int(spec['max_length']) if spec['max_length'] is not None else None
+        blank_key, blank_value = spec['blank_when'] or (None, None)
+        def get_text(record, number):
+            if blank_key is not None and record.get(blank_key) == blank_value:
+                return ''
+            return str(record.get(key, default))[:max_length]
+        return get_text
+    if kind == 'date':
+        format_date = _make_date_formatter(spec['format'])
+        return lambda record, number: format_date(record.get(key))
+    if kind == 'blank_if_zero':
+        def get_blank_if_zero(record, number):
+            value = record.get(key, 0)
+            return value if value != 0 else ''
+        return get_blank_if_zero
+    default = spec['default']
+    def get_default_if_empty(record, number):
+        value = record.get(key)
+        return value if value is not None and value != '' else default
+    return get_default_if_empty
+
+def compile_row_mapper(mapping):
+    """
+    Compiles a mapping into a function map_row(record, number) -> tuple.
+    The specs are resolved once into one getter closure per column, so each
+    row only calls the getters, without per-column dispatch on the spec.
+    """
+    getters = tuple(_column_getter(name, spec) for name, spec in mapping)
+
+    def map_row(record, number):
+        return tuple([getter(record, number) for getter in getters])
+    return map_row
+
+def map_rows(records, mapping, start=1):
+    """Maps any iterable of records to SIAT tuples (generator), numbering rows from start."""
+    map_row = compile_row_mapper(mapping)
+    if not metrics_enabled():
+        for number, record in enumerate(records, start):
+            yield map_row(record, number)
+        return
+    # Only the mapping itself is timed, not the upstream fetch or the downstream writer
+    transform_seconds = 0.0
+    row_count = 0
+    for number, record in enumerate(records, start):
+        transform_start = time.perf_counter()
+        row = map_row(record, number)
+        transform_seconds += time.perf_counter() - transform_start
+        row_count += 1
+        yield row
+    add_time("transform", transform_seconds, row_count)
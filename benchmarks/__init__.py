@@ -0,0 +1,2 @@
+# C:\Users\willy\Projects\bancarizacion\benchmarks\__init__.py
+# This file makes the 'benchmarks' directory a Python package.
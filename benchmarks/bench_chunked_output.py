@@ -0,0 +1,57 @@
+# C:\Users\willy\Projects\bancarizacion\benchmarks\bench_chunked_output.py
+"""
+Compares writing synthetic auxiliary sales rows to one write-only workbook
+with write_chunked splitting them into chunk files written by 1 worker
+process and by more, and checks that every chunked run wrote all rows.
+
+Usage (from the project root):
+    python -m benchmarks.bench_chunked_output --rows 200000 --chunks 8 --workers 1 4
+"""
+import argparse
+import json
+import os
+import tempfile
+import time
+
+from bancarizacion.chunked_output import write_chunked
+from bancarizacion.core_logic import write_output
+from bancarizacion.rowsets import PositionalRows
+from benchmarks.synthetic import make_auxiliary_sales_rows
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rows", type=int, default=200000, help="Number of synthetic auxiliary sales rows")
+    parser.add_argument("--chunks", type=int, default=8, help="Number of chunk files")
+    parser.add_argument("--workers", type=int, nargs="+", default=[1, os.cpu_count() or 1], help="Worker process counts to compare")
+    args = parser.parse_args()
+
+    source_rows = list(make_auxiliary_sales_rows(args.rows))
+    rows = PositionalRows(list(source_rows[0]), [tuple(row.values()) for row in source_rows])
+    del source_rows
+    max_rows = -(-args.rows // args.chunks)
+
+    timings = {}
+    with tempfile.TemporaryDirectory() as output_dir:
+        start = time.perf_counter()
+        if not write_output(rows, os.path.join(output_dir, "single.xlsx")):
+            raise SystemExit("Writing the single workbook failed.")
+        timings["single workbook"] = time.perf_counter() - start
+        for workers in args.workers:
+            start = time.perf_counter()
+            manifest_path = write_chunked(rows, os.path.join(output_dir, f"chunked_{workers}.xlsx"), max_rows=max_rows, max_workers=workers)
+            timings[f"{workers} workers"] = time.perf_counter() - start
+            if not manifest_path:
+                raise SystemExit(f"Chunked write with {workers} workers failed.")
+            with open(manifest_path, encoding="utf-8") as manifest_file:
+                total_rows = json.load(manifest_file)['total_rows']
+            if total_rows != args.rows:
+                raise SystemExit(f"Mismatch: {workers} workers wrote {total_rows} of {args.rows} rows.")
+
+    print(f"\n{args.rows} auxiliary sales rows, {args.chunks} chunks of up to {max_rows} rows, {os.cpu_count()} CPUs")
+    print(f"{'writer':<18}{'seconds':>10}{'speedup':>10}")
+    baseline = timings["single workbook"]
+    for name, seconds in timings.items():
+        print(f"{name:<18}{seconds:>10.2f}{baseline / seconds:>9.1f}x")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,63 @@
+# C:\Users\willy\Projects\bancarizacion\benchmarks\bench_contract_filter.py
+"""
+Compares the row-wise df.apply filters previously used by
+process_zipped_contracts_excel with the single-pass classify_contract_rows,
+on a synthetic SIAT contracts report.
+
+Usage (from the project root):
+    python -m benchmarks.bench_contract_filter --rows 100000
+"""
+import argparse
+import time
+
+from bancarizacion.core_logic import classify_contract_rows
+from benchmarks.synthetic import make_contracts_report
+
+def legacy_filter(df):
+    """The three df.apply(axis=1) scans, as process_zipped_contracts_excel did before."""
+    mask_headers = ~df.apply(
+        lambda row: any(str(val).strip().startswith("NRO CONTRATO/ACUERDO :") if isinstance(val, str) else False
+                        for val in row), axis=1
+    )
+    df_no_headers = df[mask_headers]
+    mask_pendiente = df_no_headers.apply(
+        lambda row: any(str(val).strip() == "ESTADO CONTRATO= PENDIENTE" if isinstance(val, str) else False
+                        for val in row), axis=1
+    )
+    mask_not_concluido = ~df_no_headers.apply(
+        lambda row: any(str(val).strip() == "ESTADO CONTRATO=CONCLUIDO" if isinstance(val, str) else False
+                        for val in row), axis=1
+    )
+    return df_no_headers[mask_pendiente & mask_not_concluido]
+
+def vectorized_filter(df):
+    """The single-pass filter used by process_zipped_contracts_excel."""
+    mask_headers, mask_pendiente, mask_concluido = classify_contract_rows(df)
+    return df[~mask_headers & mask_pendiente & ~mask_concluido]
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rows", type=int, default=100000, help="Number of rows of the synthetic report")
+    args = parser.parse_args()
+
+    df = make_contracts_report(args.rows)
+
+    start = time.perf_counter()
+    legacy_result = legacy_filter(df)
+    legacy_seconds = time.perf_counter() - start
+
+    start = time.perf_counter()
+    vectorized_result = vectorized_filter(df)
+    vectorized_seconds = time.perf_counter() - start
+
+    if not legacy_result.index.equals(vectorized_result.index):
+        raise SystemExit("Mismatch: the vectorized filter selected different rows than the legacy filter.")
+
+    print(f"\nContract filter on {len(df)} rows ({len(vectorized_result)} PENDIENTE rows kept)")
+    print(f"{'filter':<12}{'seconds':>10}")
+    print(f"{'df.apply':<12}{legacy_seconds:>10.3f}")
+    print(f"{'vectorized':<12}{vectorized_seconds:>10.3f}")
+    print(f"Speedup: {legacy_seconds / vectorized_seconds:.1f}x")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,137 @@
+# C:\Users\willy\Projects\bancarizacion\benchmarks\bench_import_time.py
+"""
+Measures the start-up cost of the CLI with python -X importtime: importing
+main, main.py --help, and the zipcontratos and auxventas (CSV) paths in a
+fresh interpreter each, and lists the heavy modules every one of them
+loaded. The MySQL driver, openpyxl, pandas/numpy, pyarrow and asyncio are
+imported inside the functions that use them, so a path that does not need
+one must not load it; --check exits with status 1 when one does, or when
+importing main takes longer than --budget-ms.
+
+Usage (from the project root):
+    python -m benchmarks.bench_import_time --repeat 5
+    python -m benchmarks.bench_import_time --check --budget-ms 150
+"""
+import argparse
+import io
+import os
+import re
+import subprocess
+import sys
+import tempfile
+import time
+import zipfile
+
+PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Modules worth tracking, by top-level package name
+HEAVY_MODULES = ("mysql", "openpyxl", "pandas", "numpy", "pyarrow", "asyncio")
+
+# Scenario -> (arguments after "python -X importtime", modules it must not load).
+# {zip} and {output_dir} are filled in with the fixtures of the run.
+SCENARIOS = {
+    "import main": (
+        ["-c", "import main"],
+        HEAVY_MODULES,
+    ),
+    "main.py --help": (
+        ["main.py", "--help"],
+        HEAVY_MODULES,
+    ),
+    "zipcontratos": (
+        ["-c", "from bancarizacion.core_logic import process_zipped_contracts_excel\n"
+               "rows = process_zipped_contracts_excel({zip!r})\n"
+               "assert rows, 'no contract rows'"],
+        ("mysql", "asyncio"),  # pandas itself imports pyarrow when it is installed
+    ),
+    "auxventas csv": (
+        ["-c", "import os\n"
+               "from benchmarks.sqlite_standin import open_standin\n"
+               "from bancarizacion.core_logic import get_auxiliary_sales_data, write_output\n"
+               "cnx, _ = open_standin(2000)\n"
+               "rows = get_auxiliary_sales_data(2025, 3, cnx=cnx, use_cache=False, positional=True)\n"
+               "assert write_output(rows, os.path.join({output_dir!r}, 'auxventas.csv'), 'csv'), 'csv not written'"],
+        ("openpyxl", "pandas", "numpy", "pyarrow", "asyncio"),
+    ),
+}
+
+_IMPORT_LINE = re.compile(r"^import time:\s+(\d+) \|\s+\d+ \|\s*(\S+)")
+
+def write_contract_zip(zip_path, row_count):
+    """A zip with a Contratos.xlsx holding a synthetic "Reporte Contrato Ventas" sheet."""
+    from benchmarks.synthetic import make_contracts_report
+
+    buffer = io.BytesIO()
+    make_contracts_report(row_count).to_excel(buffer, sheet_name="Reporte Contrato Ventas", index=False)
+    with zipfile.ZipFile(zip_path, "w", zipfile.ZIP_DEFLATED) as zip_ref:
+        zip_ref.writestr("Contratos.xlsx", buffer.getvalue())
+
+def import_seconds(stderr):
+    """Total time spent importing modules, from an -X importtime log."""
+    matches = (_IMPORT_LINE.match(line) for line in stderr.splitlines())
+    return sum(int(match.group(1)) for match in matches if match) / 1e6
+
+def loaded_heavy_modules(stderr):
+    """The HEAVY_MODULES packages imported anywhere in an -X importtime log."""
+    loaded = set()
+    for line in stderr.splitlines():
+        match = _IMPORT_LINE.match(line)
+        if match and match.group(2).split(".")[0] in HEAVY_MODULES:
+            loaded.add(match.group(2).split(".")[0])
+    return sorted(loaded)
+
+def run_scenario(arguments, repeat):
+    """
+    Runs a scenario repeat times in fresh interpreters. Returns the best
+    wall and import times and the heavy modules loaded by the last run.
+    """
+    best_wall = best_import = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        completed = subprocess.run([sys.executable, "-X", "importtime"] + arguments, cwd=PROJECT_ROOT,
+                                   stdin=subprocess.DEVNULL, stdout=subprocess.PIPE, stderr=subprocess.PIPE, text=True)
+        wall = time.perf_counter() - start
+        if completed.returncode != 0:
+            errors = [line for line in completed.stderr.splitlines() if not line.startswith("import time:")]
+            raise SystemExit(f"Scenario failed ({' '.join(arguments)}):\n" + "\n".join(errors[-10:]))
+        seconds = import_seconds(completed.stderr)
+        best_wall = wall if best_wall is None else min(best_wall, wall)
+        best_import = seconds if best_import is None else min(best_import, seconds)
+    return best_wall, best_import, loaded_heavy_modules(completed.stderr)
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--repeat", type=int, default=3, help="Runs per scenario (the best is reported)")
+    parser.add_argument("--contract-rows", type=int, default=500, help="Rows of the synthetic contracts workbook")
+    parser.add_argument("--check", action="store_true", help="Exit with status 1 when a scenario loads a module it must not")
+    parser.add_argument("--budget-ms", type=float, help="With --check, also fail when importing main takes longer (import time, ms)")
+    args = parser.parse_args()
+
+    baseline_wall, _, _ = run_scenario(["-c", "pass"], args.repeat)
+    results = {}
+    with tempfile.TemporaryDirectory() as fixture_dir:
+        zip_path = os.path.join(fixture_dir, "ContratosXlsx.zip")
+        write_contract_zip(zip_path, args.contract_rows)
+        for name, (arguments, forbidden) in SCENARIOS.items():
+            arguments = [argument.format(zip=zip_path, output_dir=fixture_dir) for argument in arguments]
+            results[name] = run_scenario(arguments, args.repeat) + (forbidden,)
+
+    violations = []
+    print(f"\nBest of {args.repeat} runs, interpreter start-up alone {baseline_wall * 1000:.0f} ms")
+    print(f"{'scenario':<18}{'wall ms':>10}{'import ms':>11}  heavy modules loaded")
+    for name, (wall, seconds, loaded, forbidden) in results.items():
+        print(f"{name:<18}{wall * 1000:>10.0f}{seconds * 1000:>11.0f}  {', '.join(loaded) or '-'}")
+        unexpected = [module for module in loaded if module in forbidden]
+        if unexpected:
+            violations.append(f"{name} loaded {', '.join(unexpected)}")
+    if args.budget_ms is not None and results["import main"][1] * 1000 > args.budget_ms:
+        violations.append(f"importing main took {results['import main'][1] * 1000:.0f} ms, budget {args.budget_ms:g} ms")
+
+    if args.check:
+        if violations:
+            print("\n" + "\n".join(f"FAIL: {violation}" for violation in violations))
+            sys.exit(1)
+        print("\nOK: no scenario loaded a module it does not use.")
+
+if __name__ == "__main__":
+    main()
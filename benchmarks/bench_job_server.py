@@ -0,0 +1,117 @@
+# C:\Users\willy\Projects\bancarizacion\benchmarks\bench_job_server.py
+"""
+Compares running report jobs as one `python` process each (interpreter
+start, imports, template parsing, connection) with sending them to a
+resident JobServer, against the SQLite stand-in, and checks that every job
+produced its file.
+
+Usage (from the project root):
+    python -m benchmarks.bench_job_server --invoices 2000 --jobs 5 --pipelines contratos auxventas
+"""
+import argparse
+import json
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import urllib.request
+from types import SimpleNamespace
+
+from benchmarks.sqlite_standin import open_standin
+
+PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+YEAR, MONTH = 2025, 3
+STANDIN_POOL_SIZE = 4
+
+# One spawned job: the same work as `python main.py <pipeline>` for the period
+SPAWNED_JOB = (
+    "import sys\n"
+    "from benchmarks.bench_job_server import use_standin\n"
+    "main = use_standin({database_path!r})\n"
+    "pipelines = main.server_pipelines({project_root!r}, 'db_config.ini', 1)\n"
+    "options = main.job_options({pipeline!r}, {{}})\n"
+    "sys.exit(0 if pipelines[{pipeline!r}]({year}, {month}, options) else 1)\n"
+)
+
+def use_standin(database_path):
+    """
+    Points the pooled connections of core_logic (and main) at the stand-in
+    database file, without a result cache. Returns the main module.
+    """
+    import bancarizacion.core_logic as core_logic
+    import main
+
+    core_logic.get_pooled_connection = lambda *args, **kwargs: open_standin(0, database_path=database_path, year=YEAR, month=MONTH)[0]
+    core_logic.get_result_cache = main.get_result_cache = lambda *args: None
+    core_logic.get_connection_pool = main.get_connection_pool = lambda *args: SimpleNamespace(pool_size=STANDIN_POOL_SIZE)
+    return main
+
+def run_spawned(jobs, database_path, project_root):
+    """Runs every (pipeline) job in its own interpreter. Returns the seconds of each."""
+    timings = []
+    for pipeline in jobs:
+        code = SPAWNED_JOB.format(database_path=database_path, project_root=project_root, pipeline=pipeline, year=YEAR, month=MONTH)
+        start = time.perf_counter()
+        completed = subprocess.run([sys.executable, "-c", code], cwd=PROJECT_ROOT, stdin=subprocess.DEVNULL,
+                                   stdout=subprocess.DEVNULL, stderr=subprocess.PIPE, text=True)
+        timings.append(time.perf_counter() - start)
+        if completed.returncode != 0:
+            raise SystemExit(f"Spawned {pipeline} job failed:\n{completed.stderr[-2000:]}")
+    return timings
+
+def run_served(jobs, database_path, project_root):
+    """Sends every job to a JobServer started in this process. Returns the seconds of each (request to last event)."""
+    from bancarizacion.job_server import JobServer
+
+    main = use_standin(database_path)
+    warm_state = main.warm_up_server(project_root, "db_config.ini")
+    server = JobServer(main.server_pipelines(project_root, "db_config.ini", 1), validate_options=main.job_options,
+                       workers=1, db_concurrency=1, info=warm_state)
+    http_server = server.make_http_server("127.0.0.1", 0)
+    threading.Thread(target=http_server.serve_forever, daemon=True).start()
+    url = f"http://127.0.0.1:{http_server.server_address[1]}/jobs"
+    timings = []
+    try:
+        for pipeline in jobs:
+            request = urllib.request.Request(url, data=json.dumps({'pipeline': pipeline, 'period': f"{YEAR}-{MONTH:02d}"}).encode("utf-8"))
+            start = time.perf_counter()
+            with urllib.request.urlopen(request) as response:
+                events = [json.loads(line) for line in response]
+            timings.append(time.perf_counter() - start)
+            if events[-1]['status'] != "ok":
+                raise SystemExit(f"Served {pipeline} job failed: {events[-1]}")
+    finally:
+        http_server.shutdown()
+        http_server.server_close()
+    return timings
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--invoices", type=int, default=2000, help="Invoices of the synthetic period")
+    parser.add_argument("--jobs", type=int, default=5, help="Jobs per pipeline")
+    parser.add_argument("--pipelines", nargs="+", default=["contratos", "auxventas"], choices=["contratos", "auxventas", "conciliacion"],
+                        help="Pipelines to run")
+    args = parser.parse_args()
+
+    jobs = [pipeline for _ in range(args.jobs) for pipeline in args.pipelines]
+    with tempfile.TemporaryDirectory() as work_dir:
+        database_path = os.path.join(work_dir, "standin.sqlite")
+        open_standin(args.invoices, database_path=database_path, year=YEAR, month=MONTH)[0].close()
+        # Outputs go to a scratch project root holding copies of the templates
+        os.makedirs(os.path.join(work_dir, "data", "output"))
+        for template_name in ("PlantillaContratos.xlsx", "PlantillaVenta.xlsx"):
+            shutil.copy(os.path.join(PROJECT_ROOT, "data", template_name), os.path.join(work_dir, "data", template_name))
+
+        spawned = run_spawned(jobs, database_path, work_dir)
+        served = run_served(jobs, database_path, work_dir)
+
+    print(f"\n{len(jobs)} jobs ({', '.join(args.pipelines)}), {args.invoices} invoices")
+    print(f"{'mode':<10}{'total s':>10}{'per job s':>11}{'speedup':>10}")
+    for mode, timings in (("spawned", spawned), ("server", served)):
+        print(f"{mode:<10}{sum(timings):>10.2f}{sum(timings) / len(timings):>11.3f}{sum(spawned) / sum(timings):>9.1f}x")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,44 @@
+# C:\Users\willy\Projects\bancarizacion\benchmarks\bench_output_formats.py
+"""
+Compares the output backends of write_output (xlsx write-only, SIAT csv,
+parquet) on synthetic auxiliary sales rows: write time and file size.
+
+Usage (from the project root):
+    python -m benchmarks.bench_output_formats --rows 100000
+"""
+import argparse
+import os
+import tempfile
+import time
+
+from bancarizacion.core_logic import write_output
+from bancarizacion.output_writers import OUTPUT_FORMATS
+from bancarizacion.rowsets import PositionalRows
+from benchmarks.synthetic import make_auxiliary_sales_rows
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rows", type=int, default=100000, help="Number of synthetic auxiliary sales rows")
+    args = parser.parse_args()
+
+    source_rows = list(make_auxiliary_sales_rows(args.rows))
+    rows = PositionalRows(list(source_rows[0]), [tuple(row.values()) for row in source_rows])
+    del source_rows
+
+    results = {}
+    with tempfile.TemporaryDirectory() as output_dir:
+        for output_format in OUTPUT_FORMATS:
+            output_file_path = os.path.join(output_dir, f"bench.{output_format}")
+            start = time.perf_counter()
+            if not write_output(rows, output_file_path, output_format):
+                raise SystemExit(f"Writing {output_format} failed.")
+            results[output_format] = (time.perf_counter() - start, os.path.getsize(output_file_path))
+
+    print(f"\nAuxiliary sales result with {args.rows} rows x {len(rows.columns)} columns")
+    print(f"{'format':<10}{'write s':>10}{'MiB':>8}{'vs xlsx':>10}")
+    xlsx_seconds = results["xlsx"][0]
+    for output_format, (seconds, size) in results.items():
+        print(f"{output_format:<10}{seconds:>10.2f}{size / (1024 * 1024):>8.1f}{xlsx_seconds / seconds:>9.1f}x")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,167 @@
+# C:\Users\willy\Projects\bancarizacion\benchmarks\bench_pipeline.py
+"""
+End-to-end benchmark of the period pipelines against a synthetic database.
+Loads factura, factura_siat, datosfactura, pago, pago_factura, tipoPago,
+extractos and bancos into the SQLite stand-in (benchmarks/sqlite_standin.py)
+and runs the real queries, transforms and writers with the stage metrics
+on: Contratos (query, SIAT mapping, template), Registro Auxiliar (query,
+positional rows, write-only Excel), the Registro Auxiliar built from the
+join snapshot and the bank reconciliation.
+
+Each stage's time, rows/sec and memory can be appended to a JSON-lines
+file, and compared with a previous run (--baseline) to catch regressions:
+the exit status is 1 when a stage's rows/sec dropped by more than
+--tolerance.
+
+Usage (from the project root):
+    python -m benchmarks.bench_pipeline --scale 100k
+    python -m benchmarks.bench_pipeline --scale 1m --db data/bench_1m.sqlite --output bench.jsonl
+    python -m benchmarks.bench_pipeline --scale 100k --baseline bench.jsonl
+"""
+import argparse
+import json
+import os
+import sys
+import tempfile
+import time
+
+from bancarizacion.core_logic import (
+    get_sales_invoice_data, get_auxiliary_sales_data, get_reconciliation_data,
+    populate_excel_from_template, write_to_excel, refresh_join_snapshot, get_auxiliary_sales_data_from_snapshot
+)
+from bancarizacion.instrumentation import MetricsCollector, collecting, stage
+from bancarizacion.reconciliation import REPORT_COLUMNS, reconcile, reconciliation_report_rows
+from bancarizacion.siat_mapping import CONTRATOS_MAPPING, column_names, map_rows
+from benchmarks.sqlite_standin import open_standin, parse_scale
+
+PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+TEMPLATE_PATH = os.path.join(PROJECT_ROOT, "data", "PlantillaContratos.xlsx")
+
+YEAR = 2025
+MONTH = 3
+
+def bench_contratos(cnx, output_dir):
+    """Streamed sales invoice query, SIAT mapping and template population."""
+    rows = get_sales_invoice_data(YEAR, MONTH, stream=True, cnx=cnx, use_cache=False)
+    return populate_excel_from_template(
+        map_rows(rows, CONTRATOS_MAPPING), TEMPLATE_PATH, os.path.join(output_dir, "contratos.xlsx"),
+        column_names(CONTRATOS_MAPPING), write_only=True
+    )
+
+def bench_auxventas(cnx, output_dir):
+    """Streamed auxiliary sales query as positional rows, written write-only."""
+    rows = get_auxiliary_sales_data(YEAR, MONTH, stream=True, cnx=cnx, use_cache=False, positional=True)
+    return write_to_excel(rows, os.path.join(output_dir, "auxventas.xlsx"), write_only=True)
+
+def bench_auxventas_snapshot(cnx, output_dir):
+    """
+    Registro Auxiliar from the join snapshot: the snapshot is built once
+    ('snapshot_build'), then a repeated run refreshes it incrementally and
+    joins the period in-process.
+    """
+    snapshot_dir = os.path.join(output_dir, "snapshots")
+    with stage("snapshot_build"):
+        if refresh_join_snapshot(snapshot_dir=snapshot_dir, cnx=cnx) is None:
+            return False
+    rows = get_auxiliary_sales_data_from_snapshot(YEAR, MONTH, snapshot_dir=snapshot_dir, positional=True, cnx=cnx)
+    return write_to_excel(rows, os.path.join(output_dir, "auxventas_snapshot.xlsx"), write_only=True)
+
+def bench_conciliacion(cnx, output_dir):
+    """Payments and statement lines, reconciliation and report."""
+    payment_rows, extract_rows = get_reconciliation_data(YEAR, MONTH, cnx=cnx)
+    with stage("reconcile") as reconcile_stage:
+        result = reconcile(payment_rows, extract_rows)
+        reconcile_stage.rows = len(payment_rows)
+    return write_to_excel(reconciliation_report_rows(result), os.path.join(output_dir, "conciliacion.xlsx"),
+                          write_only=True, headers=REPORT_COLUMNS)
+
+BENCHMARKS = {
+    'contratos': bench_contratos,
+    'auxventas': bench_auxventas,
+    'auxventas_snapshot': bench_auxventas_snapshot,
+    'conciliacion': bench_conciliacion,
+}
+
+def load_baseline(file_path, scale):
+    """rows/sec per (label, stage) of the last run in a JSON-lines metrics file, for the given scale."""
+    runs = {}
+    with open(file_path, "r", encoding="utf-8") as metrics_file:
+        for line in metrics_file:
+            record = json.loads(line)
+            if record.get('scale') == scale:
+                runs.setdefault(record['run'], []).append(record)
+    if not runs:
+        return {}
+    last_run = MetricsCollector()
+    last_run.extend(runs[max(runs)])
+    return {(total['label'], total['stage']): total['rows_per_second'] for total in last_run.summary() if total['rows_per_second']}
+
+def compare_with_baseline(collector, baseline, tolerance, min_seconds=0.1):
+    """
+    Prints the rows/sec of each stage against the baseline and returns the
+    number of stages slower by more than tolerance. Stages shorter than
+    min_seconds are skipped, their timing is mostly noise.
+    """
+    regressions = 0
+    print(f"\n--- Comparison with baseline (tolerance {tolerance:.0%}) ---")
+    for total in collector.summary():
+        previous = baseline.get((total['label'], total['stage']))
+        if not previous or not total['rows_per_second'] or total['self_seconds'] < min_seconds:
+            continue
+        change = total['rows_per_second'] / previous - 1
+        regressed = change < -tolerance
+        regressions += regressed
+        print(f"{total['label']:<14}{total['stage']:<16}{previous:>10}{total['rows_per_second']:>10}{change:>+9.0%}"
+              f"{'  REGRESSION' if regressed else ''}")
+    return regressions
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--scale", default="10k", help="Number of invoices: 10k, 100k, 1m or a number")
+    parser.add_argument("--db", default=":memory:", help="SQLite file to keep the generated data between runs")
+    parser.add_argument("--only", nargs="+", choices=list(BENCHMARKS), help="Pipelines to run (default: all)")
+    parser.add_argument("--output", help="Append the stage metrics to this JSON-lines file")
+    parser.add_argument("--baseline", help="JSON-lines file of a previous run to compare rows/sec against")
+    parser.add_argument("--tolerance", type=float, default=0.2, help="Allowed rows/sec drop per stage (default 0.2)")
+    parser.add_argument("--min-seconds", type=float, default=0.1, help="Stages shorter than this are not compared (default 0.1)")
+    args = parser.parse_args()
+
+    invoice_count = parse_scale(args.scale)
+    collector = MetricsCollector()
+    with collecting(collector):
+        collector.label = "load"
+        with stage("generate") as generate_stage:
+            cnx, counts = open_standin(invoice_count, database_path=args.db, year=YEAR, month=MONTH)
+            generate_stage.rows = sum(counts.values()) if counts else None
+        print(f"Synthetic database for {invoice_count} invoices: {counts or 'reused ' + args.db}")
+
+        failures = []
+        with tempfile.TemporaryDirectory() as output_dir:
+            for name in args.only or BENCHMARKS:
+                collector.label = name
+                start = time.perf_counter()
+                if not BENCHMARKS[name](cnx, output_dir):
+                    failures.append(name)
+                print(f"{name}: {time.perf_counter() - start:.2f} s")
+        cnx.close()
+
+    collector.print_summary()
+    for record in collector.records:
+        record['scale'] = invoice_count
+    # The baseline is read before this run is appended (it may be the same file)
+    baseline = load_baseline(args.baseline, invoice_count) if args.baseline and os.path.exists(args.baseline) else None
+    if args.output:
+        collector.write_json_lines(args.output)
+
+    regressions = 0
+    if args.baseline:
+        if baseline:
+            regressions = compare_with_baseline(collector, baseline, args.tolerance, args.min_seconds)
+        else:
+            print(f"No baseline run for {invoice_count} invoices in {args.baseline}")
+    if failures:
+        print(f"Failed pipelines: {', '.join(failures)}")
+    sys.exit(1 if failures or regressions else 0)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,31 @@
+# C:\Users\willy\Projects\bancarizacion\benchmarks\bench_reconciliation.py
+"""
+Runs the reconciliation engine on synthetic payments and bank statement lines
+of growing size, to check that the time per row stays flat (linear scaling).
+
+Usage (from the project root):
+    python -m benchmarks.bench_reconciliation --payments 100000
+"""
+import argparse
+import time
+
+from bancarizacion.reconciliation import reconcile
+from benchmarks.synthetic import make_reconciliation_rows
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--payments", type=int, default=100000, help="Payments of the largest run (runs use 1/4, 1/2 and all of it)")
+    args = parser.parse_args()
+
+    print(f"\n{'payments':>10}{'lines':>10}{'seconds':>10}{'us/line':>10}  statuses")
+    for divisor in (4, 2, 1):
+        payment_rows, extract_rows = make_reconciliation_rows(args.payments // divisor)
+        start = time.perf_counter()
+        result = reconcile(payment_rows, extract_rows)
+        elapsed = time.perf_counter() - start
+        rows = len(payment_rows) + len(extract_rows)
+        statuses = ", ".join(f"{status} {count}" for status, count in sorted(result['summary'].items()))
+        print(f"{len(result['payments']):>10}{len(extract_rows):>10}{elapsed:>10.2f}{elapsed / rows * 1e6:>10.2f}  {statuses}")
+
+if __name__ == "__main__":
+    main()
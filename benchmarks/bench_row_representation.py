@@ -0,0 +1,76 @@
+# C:\Users\willy\Projects\bancarizacion\benchmarks\bench_row_representation.py
+"""
+Compares a buffered auxiliary sales result held as a list of dicts (what
+cursor(dictionary=True) returns) with a PositionalRows (column names plus
+tuples): memory held by the result and the time write_to_excel (write-only)
+needs to write it.
+
+Usage (from the project root):
+    python -m benchmarks.bench_row_representation --rows 100000
+"""
+import argparse
+import os
+import tempfile
+import time
+import tracemalloc
+
+from bancarizacion.core_logic import write_to_excel
+from bancarizacion.rowsets import PositionalRows
+from benchmarks.synthetic import make_auxiliary_sales_rows
+
+def build_dict_rows(columns, values):
+    """One dict per row, as a dictionary cursor builds them."""
+    return [dict(zip(columns, row)) for row in values]
+
+def build_positional_rows(columns, values):
+    """One tuple per row plus a single header, as a plain cursor builds them."""
+    return PositionalRows(columns, [tuple(row) for row in values])
+
+def result_mib(builder, columns, values):
+    """MiB still allocated by the result once it has been built."""
+    tracemalloc.start()
+    result = builder(columns, values)
+    current, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    del result
+    return current / (1024 * 1024)
+
+def write_seconds(result, output_file_path):
+    start = time.perf_counter()
+    write_to_excel(result, output_file_path, write_only=True)
+    return time.perf_counter() - start
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rows", type=int, default=100000, help="Number of synthetic auxiliary sales rows")
+    args = parser.parse_args()
+
+    # Row values as lists, so neither representation is favored by the source
+    source_rows = list(make_auxiliary_sales_rows(args.rows))
+    columns = list(source_rows[0])
+    values = [list(row.values()) for row in source_rows]
+    del source_rows
+
+    results = {}
+    with tempfile.TemporaryDirectory() as output_dir:
+        for name, builder in (("dicts", build_dict_rows), ("positional", build_positional_rows)):
+            mib = result_mib(builder, columns, values)
+            result = builder(columns, values)
+            start = time.perf_counter()
+            builder(columns, values)
+            build_seconds = time.perf_counter() - start
+            seconds = write_seconds(result, os.path.join(output_dir, f"bench_{name}.xlsx"))
+            results[name] = (mib, build_seconds, seconds)
+
+    print(f"\nAuxiliary sales result with {args.rows} rows x {len(columns)} columns")
+    print(f"{'rows as':<12}{'result MiB':>12}{'build s':>10}{'write s':>10}")
+    for name, (mib, build_seconds, seconds) in results.items():
+        print(f"{name:<12}{mib:>12.1f}{build_seconds:>10.2f}{seconds:>10.2f}")
+    dict_mib, _, dict_seconds = results["dicts"]
+    positional_mib, _, positional_seconds = results["positional"]
+    # The write time is dominated by openpyxl's XML serialization, the per-cell lookup is a small part of it
+    print(f"Positional rows: {dict_mib - positional_mib:.1f} MiB less ({dict_mib / positional_mib:.1f}x), "
+          f"write time ratio dicts/positional {dict_seconds / positional_seconds:.2f}")
+
+if __name__ == "__main__":
+    main()
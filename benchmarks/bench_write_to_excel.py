@@ -0,0 +1,51 @@
+# C:\Users\willy\Projects\bancarizacion\benchmarks\bench_write_to_excel.py
+"""
+Compares the default and the write-only (streaming) modes of write_to_excel.
+
+Usage (from the project root):
+    python -m benchmarks.bench_write_to_excel --rows 50000
+"""
+import argparse
+import os
+import tempfile
+import time
+import tracemalloc
+
+from bancarizacion.core_logic import write_to_excel
+from benchmarks.synthetic import make_auxiliary_sales_rows
+
+def measure(write_only, row_count, output_dir):
+    """
+    Writes row_count synthetic auxiliary sales rows and returns (seconds, peak MiB).
+    Time and memory are measured in separate runs because tracemalloc slows
+    allocation-heavy code down considerably.
+    """
+    output_file_path = os.path.join(output_dir, f"bench_write_only_{write_only}.xlsx")
+    start = time.perf_counter()
+    write_to_excel(make_auxiliary_sales_rows(row_count), output_file_path, write_only=write_only)
+    elapsed = time.perf_counter() - start
+
+    tracemalloc.start()
+    write_to_excel(make_auxiliary_sales_rows(row_count), output_file_path, write_only=write_only)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return elapsed, peak / (1024 * 1024)
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rows", type=int, default=50000, help="Number of synthetic rows to write")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as output_dir:
+        results = {}
+        for write_only in (False, True):
+            results[write_only] = measure(write_only, args.rows, output_dir)
+
+    print(f"\nwrite_to_excel with {args.rows} rows x 34 columns")
+    print(f"{'mode':<12}{'seconds':>10}{'peak MiB':>12}")
+    for write_only, (elapsed, peak_mib) in results.items():
+        mode = "write-only" if write_only else "default"
+        print(f"{mode:<12}{elapsed:>10.2f}{peak_mib:>12.1f}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,57 @@
+# C:\Users\willy\Projects\bancarizacion\benchmarks\bench_zip_ingestion.py
+"""
+Measures process_zipped_contracts_parallel on a directory of synthetic SIAT
+contract zips (one workbook per zip, as received per almacen and month)
+with 1 worker process and with more, and checks that both merge the same rows.
+
+Usage (from the project root):
+    python -m benchmarks.bench_zip_ingestion --files 8 --rows 20000 --workers 1 2 4 8
+"""
+import argparse
+import io
+import os
+import tempfile
+import time
+import zipfile
+
+from bancarizacion.core_logic import FAST_EXCEL_ENGINE, process_zipped_contracts_parallel
+from benchmarks.synthetic import make_contracts_report
+
+def write_contract_zips(output_dir, file_count, row_count):
+    """Writes file_count zips with a Contratos.xlsx holding a synthetic "Reporte Contrato Ventas" sheet."""
+    for number in range(1, file_count + 1):
+        df = make_contracts_report(row_count, seed=number)
+        buffer = io.BytesIO()
+        df.to_excel(buffer, sheet_name="Reporte Contrato Ventas", index=False)
+        with zipfile.ZipFile(os.path.join(output_dir, f"ContratosXlsx_{number:02d}.zip"), "w", zipfile.ZIP_DEFLATED) as zip_ref:
+            zip_ref.writestr("Contratos.xlsx", buffer.getvalue())
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--files", type=int, default=8, help="Number of synthetic zips")
+    parser.add_argument("--rows", type=int, default=20000, help="Rows of the report sheet in every zip")
+    parser.add_argument("--workers", type=int, nargs="+", default=[1, os.cpu_count() or 1], help="Worker process counts to compare")
+    parser.add_argument("--engine", default=None, help=f"pandas Excel engine (e.g. {FAST_EXCEL_ENGINE})")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as zip_dir:
+        write_contract_zips(zip_dir, args.files, args.rows)
+        timings = {}
+        reference_rows = None
+        for workers in args.workers:
+            start = time.perf_counter()
+            rows = process_zipped_contracts_parallel(zip_dir, engine=args.engine, max_workers=workers)
+            timings[workers] = time.perf_counter() - start
+            if reference_rows is None:
+                reference_rows = rows
+            elif rows != reference_rows:
+                raise SystemExit(f"Mismatch: {workers} workers merged different rows than {args.workers[0]}.")
+
+    print(f"\n{args.files} zips x {args.rows} rows, {len(reference_rows)} PENDIENTE rows merged, {os.cpu_count()} CPUs")
+    print(f"{'workers':>8}{'seconds':>10}{'speedup':>10}")
+    baseline = timings[args.workers[0]]
+    for workers, seconds in timings.items():
+        print(f"{workers:>8}{seconds:>10.2f}{baseline / seconds:>9.1f}x")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,236 @@
+# C:\Users\willy\Projects\bancarizacion\benchmarks\sqlite_standin.py
+"""
+SQLite stand-in for the Bancarizacion MySQL database, used by the benchmark suite.
+Creates the tables the queries read (factura, factura_siat, datosfactura,
+pago, pago_factura, tipoPago, extractos, bancos), fills them with synthetic
+data at a given scale and exposes a connection object that behaves like a
+mysql.connector connection for the code in bancarizacion/core_logic.py:
+cursor(dictionary=..., buffered=...), execute with %s parameters,
+fetchall/fetchmany, column_names, is_connected and close.
+
+The MySQL dialect used by query_builder is translated on the fly:
+%s -> ?, CONCAT(a, b, ...) -> (a || b || ...), IF( -> IIF(, ROUND(x,0) keeps
+MySQL's integer result, and date/Decimal parameters are bound as ISO strings.
+"""
+import random
+import re
+import sqlite3
+from datetime import date, timedelta
+from decimal import Decimal
+
+from bancarizacion.query_builder import RECOMMENDED_INDEXES
+
+SCALES = {
+    '10k': 10000,
+    '100k': 100000,
+    '1m': 1000000,
+}
+
+SCHEMA = """
+    CREATE TABLE datosfactura (idDatosFactura INTEGER PRIMARY KEY, autorizacion TEXT);
+    CREATE TABLE factura (
+        idFactura INTEGER PRIMARY KEY, nFactura INTEGER, fechaFac DATE, total DECIMAL, anulada INTEGER,
+        pagada INTEGER, ClienteNit TEXT, ClienteFactura TEXT, almacen INTEGER, lote INTEGER
+    );
+    CREATE TABLE factura_siat (id INTEGER PRIMARY KEY, factura_id INTEGER, montoTotal DECIMAL, cuf TEXT);
+    CREATE TABLE tipoPago (id INTEGER PRIMARY KEY, tipoPago TEXT);
+    CREATE TABLE pago (
+        idPago INTEGER PRIMARY KEY, fechaPago DATE, transferencia TEXT, tipoPago INTEGER, glosa TEXT, imagen TEXT
+    );
+    CREATE TABLE pago_factura (id INTEGER PRIMARY KEY, idPago INTEGER, idFactura INTEGER);
+    CREATE TABLE bancos (id INTEGER PRIMARY KEY, cuenta TEXT, nit TEXT);
+    CREATE TABLE extractos (
+        id INTEGER PRIMARY KEY, codigo TEXT, fecha DATE, monto DECIMAL, banco INTEGER,
+        descripcion TEXT, adicional TEXT, cheque TEXT, referencia TEXT
+    );
+"""
+
+CLIENTES = [
+    ("1028255024", "YPFB REFINACION S.A."),
+    ("181384024", "SOCIEDAD MINERA ILLAPA S.A."),
+    ("1007039026", "EMBOL S.A."),
+    ("1015497027", "AIR BP BOLIVIA S.A."),
+    ("1020415021", "MINERA SAN CRISTOBAL S.A."),
+]
+
+def parse_scale(scale):
+    """Number of invoices for a scale name ('10k', '100k', '1m') or a plain number."""
+    scale = str(scale).lower()
+    if scale in SCALES:
+        return SCALES[scale]
+    return int(scale)
+
+def _convert_decimal(value):
+    return Decimal(value.decode())
+
+def _convert_date(value):
+    return date.fromisoformat(value.decode()[:10])
+
+sqlite3.register_converter("DECIMAL", _convert_decimal)
+sqlite3.register_converter("DATE", _convert_date)
+
+_CONCAT_PATTERN = re.compile(r"CONCAT\(([^()]*(?:\([^()]*\)[^()]*)*)\)")
+_ROUND_INTEGER_PATTERN = re.compile(r"ROUND\(([^()]*),\s*0\)")
+
+def translate_query(query):
+    """Translates the MySQL constructs used by query_builder to SQLite."""
+    query = query.replace("%s", "?")
+    query = _CONCAT_PATTERN.sub(lambda match: "(" + " || ".join(_split_arguments(match.group(1))) + ")", query)
+    query = _ROUND_INTEGER_PATTERN.sub(r"CAST(ROUND(\1, 0) AS INTEGER)", query)
+    query = re.sub(r"\bIF\(", "IIF(", query)
+    return query
+
+def _split_arguments(arguments):
+    """Splits the arguments of a function call at top-level commas."""
+    parts, depth, current = [], 0, []
+    for char in arguments:
+        if char == "," and depth == 0:
+            parts.append("".join(current).strip())
+            current = []
+            continue
+        depth += char == "("
+        depth -= char == ")"
+        current.append(char)
+    parts.append("".join(current).strip())
+    return parts
+
+def _bind_value(value):
+    if isinstance(value, date):
+        return value.isoformat()
+    if isinstance(value, Decimal):
+        return str(value)
+    return value
+
+class StandinCursor:
+    """Cursor with the subset of the mysql.connector cursor API used by core_logic."""
+
+    def __init__(self, connection, dictionary=False):
+        self._cursor = connection.cursor()
+        self._dictionary = dictionary
+        self.column_names = ()
+
+    def execute(self, query, params=None):
+        self._cursor.execute(translate_query(query), tuple(_bind_value(value) for value in params or ()))
+        self.column_names = tuple(column[0] for column in self._cursor.description or ())
+
+    def _rows(self, rows):
+        if self._dictionary:
+            columns = self.column_names
+            return [dict(zip(columns, row)) for row in rows]
+        return rows
+
+    def fetchall(self):
+        return self._rows(self._cursor.fetchall())
+
+    def fetchmany(self, size=1):
+        return self._rows(self._cursor.fetchmany(size))
+
+    def close(self):
+        self._cursor.close()
+
+class StandinConnection:
+    """Wraps an sqlite3 connection so it can be passed as cnx to the get_* functions."""
+
+    def __init__(self, database_path=":memory:"):
+        self._connection = sqlite3.connect(database_path, detect_types=sqlite3.PARSE_DECLTYPES, check_same_thread=False)
+        self._open = True
+
+    def cursor(self, dictionary=False, buffered=True):
+        return StandinCursor(self._connection, dictionary=dictionary)
+
+    def is_connected(self):
+        return self._open
+
+    def commit(self):
+        self._connection.commit()
+
+    def rollback(self):
+        self._connection.rollback()
+
+    def close(self):
+        self._connection.close()
+        self._open = False
+
+    @property
+    def sqlite(self):
+        """The underlying sqlite3 connection (for loading data)."""
+        return self._connection
+
+def create_schema(connection):
+    """Creates the tables and the indexes recommended by query_builder."""
+    connection.executescript(SCHEMA)
+    for table, (index_name, columns) in RECOMMENDED_INDEXES.items():
+        connection.execute(f"CREATE INDEX {index_name} ON {table} ({', '.join(columns)})")
+    connection.execute("CREATE INDEX idx_pago_factura_pago ON pago_factura (idPago)")
+    connection.execute("CREATE INDEX idx_factura_lote ON factura (lote)")
+
+def populate(connection, invoice_count, year=2025, month=3, seed=42):
+    """
+    Fills the tables with invoice_count invoices. Most invoices belong to the
+    period; about 60% reach the 50,000 threshold, 2% are voided, 80% have a
+    payment in the period and most payments have a bank statement line.
+    Returns a dict of row counts per table.
+    """
+    rng = random.Random(seed)
+    start = date(year, month, 1)
+    period_days = ((date(year + (month == 12), month % 12 + 1, 1)) - start).days
+
+    connection.executemany("INSERT INTO tipoPago VALUES (?, ?)", [(1, "CHEQUE"), (2, "TRANSFERENCIA"), (3, "EFECTIVO")])
+    connection.executemany("INSERT INTO bancos VALUES (?, ?, ?)",
+                           [(i, f"1000{i:06d}", f"10{i:08d}") for i in range(1, 6)])
+    connection.executemany("INSERT INTO datosfactura VALUES (?, ?)",
+                           [(1, "SIAT"), (2, "SIAT"), (3, "29040011007")])
+
+    counts = {'factura': 0, 'factura_siat': 0, 'pago': 0, 'pago_factura': 0, 'extractos': 0}
+    batch = {name: [] for name in counts}
+
+    def flush():
+        connection.executemany("INSERT INTO factura VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)", batch['factura'])
+        connection.executemany("INSERT INTO factura_siat VALUES (?, ?, ?, ?)", batch['factura_siat'])
+        connection.executemany("INSERT INTO pago VALUES (?, ?, ?, ?, ?, ?)", batch['pago'])
+        connection.executemany("INSERT INTO pago_factura VALUES (?, ?, ?)", batch['pago_factura'])
+        connection.executemany("INSERT INTO extractos VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)", batch['extractos'])
+        for name, rows in batch.items():
+            counts[name] += len(rows)
+            rows.clear()
+
+    for i in range(1, invoice_count + 1):
+        # 90% of the invoices in the period, the rest earlier in the year
+        if rng.random() < 0.9 or month == 1:
+            fecha = start + timedelta(days=rng.randrange(period_days))
+        else:
+            fecha = date(year, 1, 1) + timedelta(days=rng.randrange((start - date(year, 1, 1)).days))
+        total = Decimal(rng.randint(2000000, 20000000)) / 100
+        anulada = 1 if rng.random() < 0.02 else 0
+        pagada = rng.randint(0, 1)
+        nit, nombre = rng.choice(CLIENTES)
+        batch['factura'].append((i, 3000 + i, fecha.isoformat(), str(total), anulada, pagada, nit, nombre, rng.randint(1, 4), rng.randint(1, 3)))
+        batch['factura_siat'].append((i, i, str(total), f"{rng.getrandbits(160):040X}"))
+        if rng.random() < 0.8:
+            fecha_pago = max(fecha, start) + timedelta(days=rng.randrange(3))
+            if fecha_pago >= start + timedelta(days=period_days):
+                fecha_pago = start + timedelta(days=period_days - 1)
+            tipo_pago = rng.choice((1, 2, 2, 2))
+            codigo = str(10**9 + i) if tipo_pago == 2 else ""
+            batch['pago'].append((i, fecha_pago.isoformat(), codigo, tipo_pago, "PAGO FACTURA", ""))
+            batch['pago_factura'].append((i, i, i))
+            if codigo and rng.random() < 0.9:
+                batch['extractos'].append((i, codigo, fecha_pago.isoformat(), str(total), rng.randint(1, 5),
+                                           "TRANSFERENCIA RECIBIDA", nombre, "", codigo))
+        if len(batch['factura']) >= 10000:
+            flush()
+    flush()
+    connection.commit()
+    return dict(counts, tipoPago=3, bancos=5, datosfactura=3)
+
+def open_standin(invoice_count, database_path=":memory:", year=2025, month=3, seed=42):
+    """
+    Returns (StandinConnection, row counts). An existing database file with
+    data is reused as is (row counts are then None).
+    """
+    connection = StandinConnection(database_path)
+    existing = connection.sqlite.execute("SELECT name FROM sqlite_master WHERE type = 'table' AND name = 'factura'").fetchone()
+    if existing:
+        return connection, None
+    create_schema(connection.sqlite)
+    return connection, populate(connection.sqlite, invoice_count, year=year, month=month, seed=seed)
@@ -0,0 +1,167 @@
+# C:\Users\willy\Projects\bancarizacion\benchmarks\synthetic.py
+"""
+Synthetic rows shaped like the results of the Bancarizacion queries,
+used by the benchmark scripts in this directory.
+"""
+import random
+from datetime import date, datetime, timedelta
+from decimal import Decimal
+
+CLIENTES = [
+    ("1028255024", "YPFB REFINACION S.A."),
+    ("181384024", "SOCIEDAD MINERA ILLAPA S.A."),
+    ("1007039026", "EMBOL S.A."),
+    ("1015497027", "AIR BP BOLIVIA S.A."),
+    ("1020415021", "MINERA SAN CRISTOBAL S.A."),
+]
+
+def make_auxiliary_sales_rows(row_count, year=2025, month=3, seed=42):
+    """Yields dicts with the same columns as the auxiliary sales query."""
+    rng = random.Random(seed)
+    start = date(year, month, 1)
+    for i in range(row_count):
+        nit, razon_social = rng.choice(CLIENTES)
+        fecha_factura = start - timedelta(days=rng.randint(0, 400))
+        fecha_pago = start + timedelta(days=rng.randint(0, 27))
+        monto = Decimal(rng.randint(5000000, 200000000)) / 100
+        codigo = f"1O{rng.randint(10000000, 99999999)}"
+        yield {
+            'id': f"{fecha_factura}-{monto:.0f}",
+            'tipoTransaccion': 2,
+            'formaPago': 1,
+            'nitCliente': nit,
+            'complemento': '',
+            'nombreRazonSocial': razon_social,
+            'codigoAutorizacion': f"447D970043360{rng.getrandbits(160):040X}",
+            'numeroFactura': 1000 + i,
+            'tipoDocumentoRespaldo': 2,
+            'numeroDocumentoRespaldo': 1000 + i,
+            'fechaDocumentoRespaldo': fecha_factura,
+            'montoFacturadoVenta': monto,
+            'numeroContrato': 'COLOCAREXCEL',
+            'tipoDocumentoPago': 3,
+            'fechaDocumentoPago': fecha_pago,
+            'numeroCuentaVendedor': '10000014847393',
+            'nitEntidadFinancieraAbono': '1028415020',
+            'numeroTransaccion': codigo,
+            'montoRecibido': monto,
+            'extractoDescripcion': 'TRANSFERENCIA RECIBIDA',
+            'extractoAdicional': razon_social,
+            'extractoBanco': rng.randint(1, 6),
+            'extractoCheque': '',
+            'extractoReferencia': codigo,
+            'gestion': year,
+            'idExtracto': 500000 + i,
+            'pagoTransferencia': codigo,
+            'idPago': 200000 + i,
+            'almacen': rng.randint(1, 8),
+            'pagada': 1,
+            'idFactura': 100000 + i,
+            'tipoDocPagoOriginal': '4',
+            'pagoGlosa': 'PAGO FACTURA',
+            'pagoImagen': '',
+        }
+
+def make_sales_invoice_rows(row_count, year=2025, month=3, seed=42):
+    """Yields dicts with the same columns as the sales invoice (Contratos) query."""
+    rng = random.Random(seed)
+    start = date(year, month, 1)
+    for i in range(row_count):
+        yield {
+            'contractType': 2,
+            'transactionType': 1,
+            'contractObject': 'VENTA DE MERCADERIA',
+            'providerNit': '',
+            'contractNumber': '',
+            'contractDate': start + timedelta(days=rng.randint(0, 27)),
+            'totalAmount': Decimal(rng.randint(5000000, 200000000)) / 100,
+            'exchangeValue': 0,
+            'numberOfInstallments': 1,
+            'advanceAmount': 0,
+            'exchangeObject': '',
+            'accumulatedAmount': 0,
+            'invoiceId': 100000 + i,
+            'paid': rng.randint(0, 1),
+        }
+
+CONTRACT_COLUMNS = [
+    "NRO CONTRATO/ACUERDO", "NIT", "NIT PROVEEDOR", "TIPO CONTRATO", "DESCRIPCIÓN",
+    "FECHA CONTRATO", "MONTO TOTAL", "MONTO RETENIDO", "MONTO PERMUTA",
+    "MONTO ACUMULADO", "MONTO PENDIENTE", "ESTADO CONTRATO",
+]
+
+def make_contracts_report(row_count, seed=42):
+    """
+    Builds a DataFrame laid out like the SIAT "Reporte Contrato Ventas" sheet
+    read with pd.read_excel: one block per contract with a marker row, a
+    header row, the contract row and its payment rows.
+    """
+    import pandas as pd
+
+    rng = random.Random(seed)
+    first_marker = "NRO CONTRATO/ACUERDO : CV/1/2025"
+    rows = []
+    contract_number = 1
+    while len(rows) < row_count:
+        codigo = f"CV/{contract_number}/2025"
+        estado = rng.choice(["ESTADO CONTRATO= PENDIENTE", "ESTADO CONTRATO=CONCLUIDO", "PENDIENTE", "CONCLUIDO"])
+        monto = rng.randint(50000, 1000000)
+        if contract_number > 1:
+            rows.append([f"NRO CONTRATO/ACUERDO : {codigo}"] + [float("nan")] * 11)
+        rows.append(list(CONTRACT_COLUMNS))
+        rows.append([codigo, "1000991026", 0, "VERBAL", "VENTA DE MERCADERIA",
+                     datetime.combine(date(2025, 1, 1) + timedelta(days=rng.randint(0, 180)), datetime.min.time()),
+                     monto, 0, 0, 0, monto, f"  {estado} "])
+        for _ in range(rng.randint(0, 3)):
+            rows.append([codigo, "1000991026", "HERGO LTDA.", rng.randint(1, 9999),
+                         datetime(2025, 2, rng.randint(1, 28)), f"{rng.getrandbits(160):040X}",
+                         "1028415020", "10000014847393", str(rng.randint(10**9, 10**10)),
+                         datetime(2025, 3, rng.randint(1, 28)), monto / 2, float("nan")])
+        contract_number += 1
+    columns = [first_marker] + [f"Unnamed: {i}" for i in range(1, 12)]
+    return pd.DataFrame(rows[:row_count], columns=columns)
+
+def make_reconciliation_rows(payment_count, year=2025, month=3, seed=42):
+    """
+    Builds (payment rows, statement rows) shaped like the reconciliation queries.
+    Most payments have a statement line with their transfer code; some lines
+    only match by amount and date, some codes are duplicated, some payments
+    have no line at all, and there are unrelated lines.
+    """
+    rng = random.Random(seed)
+    start = date(year, month, 1)
+    payment_rows = []
+    extract_rows = []
+
+    def add_extract(code, fecha, monto):
+        extract_rows.append({'idExtracto': len(extract_rows) + 1, 'codigo': code, 'fecha': fecha, 'monto': monto, 'banco': rng.randint(1, 5)})
+
+    for i in range(payment_count):
+        id_pago = 500000 + i
+        fecha_pago = start + timedelta(days=rng.randint(0, 27))
+        code = str(10**9 + i)
+        amount = Decimal(0)
+        for j in range(rng.choice((1, 1, 1, 2))):
+            monto_factura = Decimal(rng.randint(5000000, 200000000)) / 100
+            amount += monto_factura
+            payment_rows.append({
+                'idPago': id_pago, 'transferencia': code, 'fechaPago': fecha_pago,
+                'idFactura': 100000 + 2 * i + j, 'numeroFactura': 3000 + 2 * i + j,
+                'pagada': rng.randint(0, 1), 'montoFactura': monto_factura,
+            })
+        kind = rng.random()
+        if kind < 0.80:
+            add_extract(code, fecha_pago, amount)
+        elif kind < 0.90:
+            # Transfer code missing on the statement: amount and date are close
+            add_extract('', fecha_pago + timedelta(days=rng.randint(-2, 2)), amount - Decimal(rng.randint(0, 50)) / 100)
+        elif kind < 0.95:
+            # Same code twice: the right amount and another one
+            add_extract(code, fecha_pago, amount)
+            add_extract(code, fecha_pago, amount + 1000)
+        # else: no statement line for this payment
+
+    for _ in range(payment_count // 5):
+        add_extract(str(rng.randint(10**10, 10**11)), start + timedelta(days=rng.randint(0, 27)), Decimal(rng.randint(100, 10000000)) / 100)
+    rng.shuffle(extract_rows)
+    return payment_rows, extract_rows
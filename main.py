@@ -3,106 +3,154 @@
 Main executable script for the Bancarizacion project.
 This script orchestrates the overall process.
 """
+import argparse
+import json
 import os
 import sys # Import sys to access command-line arguments
+import threading
+import time
 from bancarizacion.core_logic import (
     get_sales_invoice_data, populate_excel_from_template, get_auxiliary_sales_data, write_to_excel,
-    process_zipped_contracts_excel  # Added for processing zipped contracts Excel
+    peek_first_row,
+    process_zipped_contracts_excel,  # Added for processing zipped contracts Excel
+    process_zipped_contracts_parallel, SOURCE_FILE_COLUMN, SOURCE_SHEET_COLUMN, FAST_EXCEL_ENGINE,
+    explain_period_queries, refresh_period_snapshot, get_reconciliation_data, refresh_payment_summary,
+    write_output, get_auxiliary_sales_data_from_snapshot, get_result_cache, get_connection_pool
 )
+from bancarizacion.chunked_output import SPLIT_FILES, SPLIT_SHEETS, DATE_GROUPINGS, write_chunked
+from bancarizacion.async_queries import (
+    DEFAULT_QUERY_CONCURRENCY, DEFAULT_PARTITION_ROWS, parse_partition_by, run_async,
+    get_sales_invoice_data_partitioned, get_auxiliary_sales_data_partitioned
+)
+from bancarizacion.output_writers import OUTPUT_FORMATS, DEFAULT_OUTPUT_FORMAT, output_file_name
+from bancarizacion.batch import (
+    DEFAULT_WORKERS, DEFAULT_DB_CONCURRENCY, parse_period, iter_periods, run_period_batch, print_batch_report,
+    pipeline_status
+)
+from bancarizacion.siat_mapping import CONTRATOS_MAPPING, column_names, map_rows
+from bancarizacion.reconciliation import (
+    DEFAULT_AMOUNT_TOLERANCE, DEFAULT_DATE_TOLERANCE_DAYS, REPORT_COLUMNS,
+    reconcile, reconciliation_report_rows, print_reconciliation_summary
+)
+from bancarizacion.instrumentation import MetricsCollector, set_collector, stage
+from bancarizacion.orchestrator import run_pipelines_concurrently, print_pipeline_report, exit_status
+from bancarizacion.excel_templates import get_excel_template
+from bancarizacion.job_server import DEFAULT_HOST, DEFAULT_PORT, JobServer
 from datetime import datetime
+from decimal import Decimal
 
-def process_contratos(project_root, config_file):
-    """Processes Sales Invoice Data (Contratos)."""
+# Period processed when no --from/--to range is given
+DEFAULT_YEAR = 2025
+DEFAULT_MONTH = 3
+
+# Column order of PlantillaContratos.xlsx, from the declarative SIAT mapping
+SIAT_COLUMN_NAMES_CONTRATOS = column_names(CONTRATOS_MAPPING)
+
+def process_contratos(project_root, config_file, year=DEFAULT_YEAR, month=DEFAULT_MONTH, incremental=False, accumulated=False,
+                      output_format=DEFAULT_OUTPUT_FORMAT, split=None, partition_by=None, query_concurrency=DEFAULT_QUERY_CONCURRENCY):
+    """
+    Processes Sales Invoice Data (Contratos) for a period.
+    With incremental=True only new or changed invoices are fetched and merged
+    into the local period snapshot, and the report is generated from the snapshot.
+    With accumulated=True, MONTO ACUMULADO is filled from the payment summary
+    (refresh it first with refresh_accumulated_amounts); not applied to incremental runs.
+    output_format "csv" or "parquet" writes the SIAT columns to a data file instead of the template.
+    split (options of chunked_output.write_chunked, see split_options) writes the records
+    in chunks, one template copy per chunk file, and returns the manifest path instead.
+    partition_by ("almacen" or "idFactura[:ROWS]") fetches the period as sub-queries, query_concurrency
+    at a time (see fetch_partitioned); not applied to incremental runs.
+    Returns the output file path, None when there are no records, or False on failure.
+    """
     print("\\n--- Processing Sales Invoice Data (Contratos) ---")
-    target_year_contratos = 2025
-    target_month_contratos = 3
+    target_year_contratos = year
+    target_month_contratos = month
     print(f"Requesting Contratos data for Year: {target_year_contratos}, Month: {target_month_contratos}")
     
-    sales_data_contratos = get_sales_invoice_data(year=target_year_contratos, month=target_month_contratos, config_file_path=config_file)
+    if incremental:
+        sales_data_contratos = refresh_period_snapshot("contratos", target_year_contratos, target_month_contratos, config_file_path=config_file)
+    elif partition_by:
+        sales_data_contratos = fetch_partitioned(get_sales_invoice_data_partitioned, config_file, target_year_contratos, target_month_contratos,
+                                                 partition_by, query_concurrency, accumulated=accumulated)
+    else:
+        # Rows are streamed from the database and mapped/written one at a time
+        sales_data_contratos = get_sales_invoice_data(year=target_year_contratos, month=target_month_contratos, config_file_path=config_file, stream=True, accumulated=accumulated)
     
     if sales_data_contratos is not None:
-        if sales_data_contratos:
-            print(f"Successfully retrieved {len(sales_data_contratos)} records for Contratos.")
-            
-            siat_column_names_contratos = [
-                "N°", "TIPO DE CONTRATO O ACUERDO", "TIPO TRANSACCIÓN",
-                "OBJETO DEL CONTRATO O ACUERDO", "NIT/CI PROVEEDOR", "NÚMERO CONTRATO O ACUERDO",
-                "FECHA DE CONTRATO O ACUERDO", "IMPORTE TOTAL DEL CONTRATO O ACUERDO (BS)",
-                "VALOR DE LA PERMUTA (BS)", "CANTIDAD DE CUOTAS",
-                "IMPORTE ADELANTADO, IMPORTE RETENIDO, DESCUENTOS U OTROS (BS)",
-                "OBJETO PERMUTA", "MONTO ACUMULADO (BS)"
-            ]
-
-            data_for_siat_template_contratos = []
-            for index, record in enumerate(sales_data_contratos):
-                numero_secuencial = index + 1
-                tipo_contrato_val = record.get('contractType')
-                tipo_transaccion_val = record.get('transactionType')
-                objeto_contrato_val = str(record.get('contractObject', ''))[:100]
-                nit_proveedor_val = '' 
-                numero_contrato_val = str(record.get('contractNumber', ''))
-                if tipo_contrato_val == 2:
-                    numero_contrato_val = ''
-                fecha_contrato_dt = record.get('contractDate')
-                fecha_contrato_str = fecha_contrato_dt.strftime("%d/%m/%Y") if fecha_contrato_dt else ''
-                importe_total_val = record.get('totalAmount')
-                valor_permuta_raw = record.get('exchangeValue', 0)
-                valor_permuta_val = valor_permuta_raw if valor_permuta_raw != 0 else ''
-                cantidad_cuotas_val = record.get('numberOfInstallments', 1)
-                importe_adelantado_raw = record.get('advanceAmount', 0)
-                importe_adelantado_val = importe_adelantado_raw if importe_adelantado_raw else 0
-                objeto_permuta_val = str(record.get('exchangeObject', ''))[:100]
-                monto_acumulado_val = record.get('accumulatedAmount', 0)
-                if monto_acumulado_val == '' or monto_acumulado_val is None:
-                    monto_acumulado_val = 0
-
-                row_dict_for_siat = {
-                    "N°": numero_secuencial,
-                    "TIPO DE CONTRATO O ACUERDO": tipo_contrato_val,
-                    "TIPO TRANSACCIÓN": tipo_transaccion_val,
-                    "OBJETO DEL CONTRATO O ACUERDO": objeto_contrato_val,
-                    "NIT/CI PROVEEDOR": nit_proveedor_val,
-                    "NÚMERO CONTRATO O ACUERDO": numero_contrato_val,
-                    "FECHA DE CONTRATO O ACUERDO": fecha_contrato_str,
-                    "IMPORTE TOTAL DEL CONTRATO O ACUERDO (BS)": importe_total_val,
-                    "VALOR DE LA PERMUTA (BS)": valor_permuta_val,
-                    "CANTIDAD DE CUOTAS": cantidad_cuotas_val,
-                    "IMPORTE ADELANTADO, IMPORTE RETENIDO, DESCUENTOS U OTROS (BS)": importe_adelantado_val,
-                    "OBJETO PERMUTA": objeto_permuta_val,
-                    "MONTO ACUMULADO (BS)": monto_acumulado_val
-                }
-                data_for_siat_template_contratos.append(row_dict_for_siat)
-
+        first_record, sales_data_contratos = peek_first_row(sales_data_contratos)
+        if first_record is not None:
             template_name_contratos = "PlantillaContratos.xlsx"
             template_path_contratos = os.path.join(project_root, "data", template_name_contratos) 
             
             timestamp_contratos = datetime.now().strftime("%Y%m%d_%H%M%S")
-            output_excel_name_contratos = f"{os.path.splitext(template_name_contratos)[0]}_SIAT_{timestamp_contratos}.xlsx"
+            output_excel_name_contratos = output_file_name(f"{os.path.splitext(template_name_contratos)[0]}_SIAT_{target_year_contratos}{target_month_contratos:02d}_{timestamp_contratos}", output_format)
             output_excel_full_path_contratos = os.path.join(project_root, "data", "output", output_excel_name_contratos)
 
-            print(f"\\nAttempting to populate template '{template_name_contratos}' with {len(data_for_siat_template_contratos)} records for SIAT format.")
-            success_contratos = populate_excel_from_template(data_for_siat_template_contratos, template_path_contratos, output_excel_full_path_contratos, siat_column_names_contratos)
-            if success_contratos:
-                print(f"Contratos Excel template populated and saved to: {output_excel_full_path_contratos}")
+            if split:
+                print(f"\\nWriting Contratos records in SIAT format to {output_format}, split by {split_description(split)}.")
+                success_contratos = write_chunked(map_rows(sales_data_contratos, CONTRATOS_MAPPING), output_excel_full_path_contratos, output_format,
+                                                  headers=SIAT_COLUMN_NAMES_CONTRATOS,
+                                                  template_file_path=template_path_contratos if output_format == "xlsx" and split.get('split_into') != SPLIT_SHEETS else None,
+                                                  **split)
+                if success_contratos:
+                    output_excel_full_path_contratos = success_contratos
+            elif output_format == "xlsx":
+                print(f"\\nAttempting to populate template '{template_name_contratos}' with Contratos records for SIAT format.")
+                success_contratos = populate_excel_from_template(map_rows(sales_data_contratos, CONTRATOS_MAPPING), template_path_contratos, output_excel_full_path_contratos, SIAT_COLUMN_NAMES_CONTRATOS, write_only=True)
             else:
+                print(f"\\nWriting Contratos records in SIAT format to {output_format}.")
+                success_contratos = write_output(map_rows(sales_data_contratos, CONTRATOS_MAPPING), output_excel_full_path_contratos, output_format, headers=SIAT_COLUMN_NAMES_CONTRATOS)
+            if success_contratos:
+                if output_format == "xlsx":
+                    print(f"Contratos Excel template populated and saved to: {output_excel_full_path_contratos}")
+                else:
+                    print(f"Contratos data successfully written to: {output_excel_full_path_contratos}")
+                return output_excel_full_path_contratos
+            if output_format == "xlsx":
                 print(f"Failed to populate Contratos Excel template. Check logs.")
-        else:
-            print("No sales invoice records found for Contratos for the specified period.")
-    else:
-        print("Failed to retrieve sales invoice data for Contratos. Check logs for errors.")
+            else:
+                print(f"Failed to write Contratos data to {output_format}. Check logs.")
+            return False
+        print("No sales invoice records found for Contratos for the specified period.")
+        return None
+    print("Failed to retrieve sales invoice data for Contratos. Check logs for errors.")
+    return False
 
-def process_auxiliary_sales(project_root, config_file):
-    """Processes Auxiliary Sales Data (Registro Auxiliar de Ventas) and writes to a new Excel file."""
+def process_auxiliary_sales(project_root, config_file, year=DEFAULT_YEAR, month=DEFAULT_MONTH, incremental=False,
+                            output_format=DEFAULT_OUTPUT_FORMAT, split=None, partition_by=None, query_concurrency=DEFAULT_QUERY_CONCURRENCY,
+                            join_snapshot=False):
+    """
+    Processes Auxiliary Sales Data (Registro Auxiliar de Ventas) for a period and writes to a new Excel file
+    (or a CSV/Parquet file, see output_format).
+    With incremental=True only new or changed rows are fetched and merged into
+    the local period snapshot, and the file is generated from the snapshot.
+    split (options of chunked_output.write_chunked, see split_options) writes the rows
+    in chunks and returns the manifest path instead.
+    partition_by ("almacen" or "idFactura[:ROWS]") fetches the period as sub-queries, query_concurrency
+    at a time, merged by invoice date (see fetch_partitioned); not applied to incremental runs.
+    With join_snapshot=True the rows are joined in-process from the local invoice/payment
+    snapshot, refreshed first (see get_auxiliary_sales_data_from_snapshot).
+    Returns the output file path, None when there are no records, or False on failure.
+    """
     print("\\\\n\\\\n--- Processing Auxiliary Sales Data (Registro Auxiliar de Ventas) ---")
-    target_year_aux_ventas = 2025
-    target_month_aux_ventas = 3
+    target_year_aux_ventas = year
+    target_month_aux_ventas = month
     print(f"Requesting Auxiliary Sales data for Year: {target_year_aux_ventas}, Month: {target_month_aux_ventas}")
 
-    aux_sales_data = get_auxiliary_sales_data(year=target_year_aux_ventas, month=target_month_aux_ventas, config_file_path=config_file)
+    if incremental:
+        aux_sales_data = refresh_period_snapshot("auxventas", target_year_aux_ventas, target_month_aux_ventas, config_file_path=config_file)
+    elif partition_by:
+        aux_sales_data = fetch_partitioned(get_auxiliary_sales_data_partitioned, config_file, target_year_aux_ventas, target_month_aux_ventas,
+                                           partition_by, query_concurrency, positional=True)
+    elif join_snapshot:
+        aux_sales_data = get_auxiliary_sales_data_from_snapshot(target_year_aux_ventas, target_month_aux_ventas, config_file_path=config_file, positional=True)
+    else:
+        # Rows are streamed from the database straight into the Excel writer
+        # as column names plus tuples (no dict per row)
+        aux_sales_data = get_auxiliary_sales_data(year=target_year_aux_ventas, month=target_month_aux_ventas, config_file_path=config_file, stream=True, positional=True)
 
     if aux_sales_data is not None:
-        if aux_sales_data:
-            print(f"Successfully retrieved {len(aux_sales_data)} records for Auxiliary Sales.")
+        first_record, aux_sales_data = peek_first_row(aux_sales_data)
+        if first_record is not None:
             
             # No specific column pre-definition needed if write_to_excel derives headers from data.
             # if aux_sales_data:
@@ -110,49 +158,444 @@ def process_auxiliary_sales(project_root, config_file):
             # else:
             #     aux_sales_column_names = []
 
-            output_aux_excel_name = f"AuxiliarySalesData_Raw_{datetime.now().strftime('%Y%m%d_%H%M%S')}.xlsx"
+            output_aux_excel_name = output_file_name(f"AuxiliarySalesData_Raw_{target_year_aux_ventas}{target_month_aux_ventas:02d}_{datetime.now().strftime('%Y%m%d_%H%M%S')}", output_format)
             output_aux_excel_full_path = os.path.join(project_root, "data", "output", output_aux_excel_name)
             
             print(f"\\\\nAttempting to save raw auxiliary sales data to a new Excel file: {output_aux_excel_full_path}")
             
-            # Call write_to_excel to create a new file with the data
-            success_aux_ventas = write_to_excel(aux_sales_data, output_aux_excel_full_path)
+            # Create a new file with the data (streamed; write-only workbook for xlsx)
+            if split:
+                print(f"Splitting by {split_description(split)}.")
+                success_aux_ventas = write_chunked(aux_sales_data, output_aux_excel_full_path, output_format, **split)
+                if success_aux_ventas:
+                    output_aux_excel_full_path = success_aux_ventas
+            else:
+                success_aux_ventas = write_output(aux_sales_data, output_aux_excel_full_path, output_format)
             
             if success_aux_ventas:
                 print(f"Auxiliary Sales data successfully written to: {output_aux_excel_full_path}")
-            else:
-                print(f"Failed to write Auxiliary Sales data to Excel. Check logs.")
-        else:
-            print("No auxiliary sales records found for the specified period.")
-    else:
-        print("Failed to retrieve auxiliary sales data. Check logs for errors.")
+                return output_aux_excel_full_path
+            print(f"Failed to write Auxiliary Sales data to Excel. Check logs.")
+            return False
+        print("No auxiliary sales records found for the specified period.")
+        return None
+    print("Failed to retrieve auxiliary sales data. Check logs for errors.")
+    return False
+
+def merged_contract_headers(rows):
+    """Column names of merged contract rows: source columns first, then every column in first-seen order."""
+    headers = {SOURCE_FILE_COLUMN: None, SOURCE_SHEET_COLUMN: None}
+    for row in rows:
+        headers.update(dict.fromkeys(row))
+    return list(headers)
 
-def process_zipped_contracts(project_root):
-    """Processes zipped contract data from ContratosXlsx.zip."""
+def process_zipped_contracts(project_root, engine=None, zip_source=None, max_workers=None, output_format=DEFAULT_OUTPUT_FORMAT):
+    """
+    Processes zipped contract data from ContratosXlsx.zip.
+    With zip_source (a directory or glob of zips, e.g. one per almacen and
+    month), every workbook and sheet is parsed in a process pool of
+    max_workers processes and the rows are merged into one file with the
+    source workbook and sheet of each row.
+    engine selects the pandas Excel parser (e.g. "calamine"); None uses the pandas default.
+    output_format selects the output file type ("xlsx", "csv" or "parquet").
+    Returns the output file path, None when there are no pending contracts, or False on failure.
+    """
     print("\n--- Processing Zipped Contracts Data ---")
     
-    # Path to the zip file
-    zip_file_path = os.path.join(project_root, "data", "ContratosXlsx.zip")
-    
-    # Process the zip file and get filtered contract data
-    contract_data = process_zipped_contracts_excel(zip_file_path)
+    headers = None
+    if zip_source:
+        contract_data = process_zipped_contracts_parallel(zip_source, engine=engine, max_workers=max_workers)
+        if contract_data:
+            headers = merged_contract_headers(contract_data)
+    else:
+        # Path to the zip file
+        zip_file_path = os.path.join(project_root, "data", "ContratosXlsx.zip")
+        
+        # Process the zip file and get filtered contract data
+        contract_data = process_zipped_contracts_excel(zip_file_path, engine=engine)
     
     if contract_data is not None:
         if contract_data:
-            print(f"Successfully processed {len(contract_data)} pending contracts from the zip file.")
+            print(f"Successfully processed {len(contract_data)} pending contracts from the zip file{'s' if zip_source else ''}.")
             
             # Define output file path
-            output_excel_name = f"FilteredContracts_{datetime.now().strftime('%Y%m%d_%H%M%S')}.xlsx"
+            output_excel_name = output_file_name(f"FilteredContracts_{'Merged_' if zip_source else ''}{datetime.now().strftime('%Y%m%d_%H%M%S')}", output_format)
             output_excel_path = os.path.join(project_root, "data", "output", output_excel_name)
             
             # Write the filtered data to an Excel file
-            print(f"\nWriting filtered contract data to Excel: {output_excel_path}")
-            write_to_excel(contract_data, output_excel_path)
-            print(f"Filtered contract data saved to: {output_excel_path}")
-        else:
-            print("No pending contracts found in the zip file after filtering.")
+            print(f"\nWriting filtered contract data to {output_format}: {output_excel_path}")
+            if write_output(contract_data, output_excel_path, output_format, headers=headers):
+                print(f"Filtered contract data saved to: {output_excel_path}")
+                return output_excel_path
+            print("Failed to write filtered contract data to Excel. Check logs.")
+            return False
+        print("No pending contracts found in the zip file after filtering.")
+        return None
+    print("Failed to process the zipped contracts file. Check logs for errors.")
+    return False
+
+def process_reconciliation(project_root, config_file, year=DEFAULT_YEAR, month=DEFAULT_MONTH,
+                           amount_tolerance=DEFAULT_AMOUNT_TOLERANCE, date_tolerance_days=DEFAULT_DATE_TOLERANCE_DAYS,
+                           output_format=DEFAULT_OUTPUT_FORMAT):
+    """
+    Reconciles the period's payments against the bank statement lines (extractos)
+    in memory and writes one row per payment and per unused statement line.
+    Returns the output file path, None when there are no payments, or False on failure.
+    """
+    print("\n--- Processing Bank Statement Reconciliation (Conciliacion) ---")
+    print(f"Requesting payments and statement lines for Year: {year}, Month: {month}")
+    data = get_reconciliation_data(year, month, config_file_path=config_file, date_tolerance_days=date_tolerance_days)
+    if data is None:
+        print("Failed to retrieve reconciliation data. Check logs for errors.")
+        return False
+    payment_rows, extract_rows = data
+    if not payment_rows:
+        print("No payments found for the specified period.")
+        return None
+
+    start = time.perf_counter()
+    with stage("transform") as transform_stage:
+        result = reconcile(payment_rows, extract_rows, amount_tolerance=amount_tolerance, date_tolerance_days=date_tolerance_days)
+        transform_stage.rows = len(payment_rows) + len(extract_rows)
+    print(f"Reconciled {len(result['payments'])} payments against {len(extract_rows)} statement lines in {time.perf_counter() - start:.2f}s")
+    print_reconciliation_summary(result)
+
+    output_excel_name = output_file_name(f"Conciliacion_{year}{month:02d}_{datetime.now().strftime('%Y%m%d_%H%M%S')}", output_format)
+    output_excel_path = os.path.join(project_root, "data", "output", output_excel_name)
+    if write_output(reconciliation_report_rows(result), output_excel_path, output_format, headers=REPORT_COLUMNS):
+        print(f"Reconciliation report saved to: {output_excel_path}")
+        return output_excel_path
+    print("Failed to write the reconciliation report. Check logs.")
+    return False
+
+PERIOD_PIPELINES = ("contratos", "auxventas")
+# Pipelines whose output format can be chosen with --format
+OUTPUT_PIPELINES = ("contratos", "auxventas", "zipcontratos", "conciliacion")
+
+def parse_output_formats(values):
+    """
+    Parses the --format values: FORMAT applies to every pipeline and
+    PIPELINE=FORMAT to one of them (e.g. ["csv", "contratos=xlsx"]).
+    Returns a dict pipeline -> format, '*' holding the default.
+    """
+    output_formats = {}
+    for value in values or ():
+        pipeline, _, output_format = value.rpartition("=")
+        pipeline = pipeline or "*"
+        if output_format not in OUTPUT_FORMATS:
+            raise ValueError(f"Unknown output format '{output_format}', expected one of {', '.join(OUTPUT_FORMATS)}.")
+        if pipeline not in ("*",) + OUTPUT_PIPELINES:
+            raise ValueError(f"Unknown pipeline '{pipeline}' in --format, expected one of {', '.join(OUTPUT_PIPELINES)}.")
+        output_formats[pipeline] = output_format
+    return output_formats
+
+def output_format_for(output_formats, pipeline):
+    """Output format of a pipeline: its own --format, else the general one, else xlsx."""
+    output_formats = output_formats or {}
+    return output_formats.get(pipeline, output_formats.get("*", DEFAULT_OUTPUT_FORMAT))
+
+def fetch_partitioned(fetch, config_file, year, month, partition_by, query_concurrency, **kwargs):
+    """
+    Fetches one period as concurrent, individually retried sub-queries
+    (bancarizacion/async_queries.py), for periods whose single query runs into
+    the database statement timeout. The results are buffered and merged before writing.
+    Returns the rows, or None on failure.
+    """
+    try:
+        return run_async(fetch([(year, month)], config_file, partition_by, query_concurrency, **kwargs), max_threads=query_concurrency)
+    except Exception as e:
+        print(f"Partitioned fetch failed: {e}")
+        return None
+
+def split_options(max_rows=None, group_by=None, split_into=SPLIT_FILES, max_workers=None):
+    """
+    write_chunked options for the period pipelines, or None when neither a row
+    limit nor a grouping is given (the output is written unsplit).
+    """
+    if not max_rows and not group_by:
+        return None
+    if max_rows is not None and max_rows < 1:
+        raise ValueError("the row limit must be positive.")
+    if group_by and group_by.partition(":")[2] not in ("",) + tuple(DATE_GROUPINGS):
+        raise ValueError(f"unknown grouping in '{group_by}', expected COLUMN or COLUMN:{'/'.join(DATE_GROUPINGS)}.")
+    if split_into not in (SPLIT_FILES, SPLIT_SHEETS):
+        raise ValueError(f"expected '{SPLIT_FILES}' or '{SPLIT_SHEETS}', got '{split_into}'.")
+    return {'max_rows': max_rows, 'group_by': group_by, 'split_into': split_into, 'max_workers': max_workers}
+
+def split_description(split):
+    """Short description of split options for the log."""
+    parts = [split['group_by']] if split.get('group_by') else []
+    if split.get('max_rows'):
+        parts.append(f"{split['max_rows']} rows")
+    return f"{' and '.join(parts)} into {split.get('split_into', SPLIT_FILES)}"
+
+def refresh_accumulated_amounts(config_file, year, month, incremental=False):
+    """
+    Brings the payment summary behind MONTO ACUMULADO up to a period, once
+    before the Contratos reports run (concurrent periods must not refresh it
+    at the same time). Returns False on failure.
+    """
+    if incremental:
+        print("--accumulated is not applied to incremental runs, the snapshots keep MONTO ACUMULADO at 0.")
+        return True
+    return refresh_payment_summary(year, month, config_file_path=config_file) is not None
+
+def run_batch(project_root, config_file, process, period_from, period_to, workers, db_concurrency, incremental=False, accumulated=False,
+              output_formats=None, split=None, partition_by=None, join_snapshot=False):
+    """
+    Runs the period pipelines for every month of a range concurrently and prints per-period timings.
+    With partition_by, the pooled connections are shared out between the periods querying at once.
+    """
+    try:
+        start_period = parse_period(period_from)
+        end_period = parse_period(period_to or period_from)
+        periods = list(iter_periods(start_period, end_period))
+    except ValueError as e:
+        print(f"Invalid period range: {e}")
+        return False
+    if process not in (None,) + PERIOD_PIPELINES:
+        print(f"Batch mode only supports {', '.join(PERIOD_PIPELINES)}.")
+        return False
+
+    try:
+        # Never let more pipelines query the database than there are pooled connections
+        pool_size = get_connection_pool(config_file).pool_size
+    except Exception as e:
+        print(f"Cannot start batch, database connection pool unavailable: {e}")
+        return False
+    db_concurrency = max(1, min(db_concurrency, pool_size))
+    query_concurrency = max(1, pool_size // db_concurrency)
+
+    all_pipelines = {
+        "contratos": lambda year, month: process_contratos(project_root, config_file, year, month, incremental, accumulated,
+                                                           output_format_for(output_formats, "contratos"), split,
+                                                           partition_by, query_concurrency),
+        "auxventas": lambda year, month: process_auxiliary_sales(project_root, config_file, year, month, incremental,
+                                                                 output_format_for(output_formats, "auxventas"), split,
+                                                                 partition_by, query_concurrency, join_snapshot),
+    }
+    pipelines = {name: all_pipelines[name] for name in PERIOD_PIPELINES if process in (None, name)}
+    if accumulated and "contratos" in pipelines and not refresh_accumulated_amounts(config_file, *periods[-1], incremental=incremental):
+        print("Cannot start batch, the payment summary could not be refreshed.")
+        return False
+
+    print(f"Batch run for {len(periods)} periods ({periods[0][0]}-{periods[0][1]:02d} to {periods[-1][0]}-{periods[-1][1]:02d}), "
+          f"pipelines: {', '.join(pipelines)}, workers: {workers}, DB concurrency: {db_concurrency}")
+    start = time.perf_counter()
+    results = run_period_batch(periods, pipelines, max_workers=workers, db_concurrency=db_concurrency)
+    print_batch_report(results, total_seconds=time.perf_counter() - start)
+    return all(entry['status'] != "failed" for entry in results)
+
+def run_all(project_root, config_file, sequential=False, incremental=False, accumulated=False, output_formats=None, split=None,
+            partition_by=None, query_concurrency=DEFAULT_QUERY_CONCURRENCY, join_snapshot=False, excel_engine=None):
+    """
+    Runs 'contratos', 'auxventas' and 'zipcontratos'. By default they run concurrently:
+    the two MySQL pipelines on threads and the zip/Excel parsing in a separate process.
+    Returns the combined exit status (0 when no pipeline failed).
+    """
+    start = time.perf_counter()
+    period_args = (project_root, config_file, DEFAULT_YEAR, DEFAULT_MONTH, incremental)
+    if accumulated and not refresh_accumulated_amounts(config_file, DEFAULT_YEAR, DEFAULT_MONTH, incremental):
+        print("Failed to refresh the payment summary, MONTO ACUMULADO stays at 0.")
+        accumulated = False
+    if not sequential:
+        # contratos and auxventas query at the same time, each gets half of the sub-query slots
+        # and never more than half of the pooled connections
+        query_concurrency = max(1, query_concurrency // 2)
+        if partition_by:
+            try:
+                query_concurrency = min(query_concurrency, max(1, get_connection_pool(config_file).pool_size // 2))
+            except Exception as e:
+                print(f"Database connection pool unavailable: {e}")
+    contratos_args = period_args + (accumulated, output_format_for(output_formats, "contratos"), split, partition_by, query_concurrency)
+    auxventas_args = period_args + (output_format_for(output_formats, "auxventas"), split, partition_by, query_concurrency, join_snapshot)
+    zipcontratos_args = (project_root, excel_engine, None, None, output_format_for(output_formats, "zipcontratos"))
+    if sequential:
+        results = []
+        for name, func, func_args in (("contratos", process_contratos, contratos_args),
+                                      ("auxventas", process_auxiliary_sales, auxventas_args),
+                                      ("zipcontratos", process_zipped_contracts, zipcontratos_args)):
+            results.extend(run_pipelines_concurrently({name: (func, func_args)}))
     else:
-        print("Failed to process the zipped contracts file. Check logs for errors.")
+        results = run_pipelines_concurrently(
+            thread_pipelines={
+                "contratos": (process_contratos, contratos_args),
+                "auxventas": (process_auxiliary_sales, auxventas_args),
+            },
+            process_pipelines={
+                "zipcontratos": (process_zipped_contracts, zipcontratos_args),
+            },
+        )
+    print_pipeline_report(results, total_seconds=time.perf_counter() - start)
+    return exit_status(results)
+
+# Options a job server request may set for each pipeline, besides pipeline and period
+JOB_OPTIONS = {
+    "contratos": ("format", "incremental", "accumulated", "partition_by", "split_rows", "split_by", "split_into"),
+    "auxventas": ("format", "incremental", "join_snapshot", "partition_by", "split_rows", "split_by", "split_into"),
+    "conciliacion": ("format",),
+}
+# Templates parsed once when the job server starts
+SERVER_TEMPLATES = ("PlantillaContratos.xlsx", "PlantillaVenta.xlsx")
+# JSON type expected for each job option
+JOB_OPTION_TYPES = {
+    "format": str, "partition_by": str, "split_by": str, "split_into": str,
+    "incremental": bool, "accumulated": bool, "join_snapshot": bool,
+}
+
+def job_options(pipeline, options):
+    """
+    Validates the options of a job server request (e.g. {"format": "csv", "split_by": "almacen"})
+    and returns the arguments of the pipeline. Raises ValueError.
+    """
+    unknown = sorted(set(options) - set(JOB_OPTIONS[pipeline]))
+    if unknown:
+        raise ValueError(f"Unknown option(s) for {pipeline}: {', '.join(unknown)}; expected {', '.join(JOB_OPTIONS[pipeline])}.")
+    for name, value in options.items():
+        expected_type = JOB_OPTION_TYPES.get(name)
+        if expected_type is not None and value is not None and not isinstance(value, expected_type):
+            raise ValueError(f"Option '{name}' must be a {'string' if expected_type is str else 'boolean'}, got {json.dumps(value)}.")
+    split_rows = options.get('split_rows')
+    if split_rows is not None:
+        # bool is an int, and a list or float would be truncated or fail in int()
+        if isinstance(split_rows, bool) or not isinstance(split_rows, (int, str)) or not str(split_rows).strip().isdigit():
+            raise ValueError(f"Option 'split_rows' must be a positive integer, got {json.dumps(split_rows)}.")
+        split_rows = int(split_rows)
+    output_format = options.get('format', DEFAULT_OUTPUT_FORMAT)
+    if output_format not in OUTPUT_FORMATS:
+        raise ValueError(f"Unknown output format '{output_format}', expected one of {', '.join(OUTPUT_FORMATS)}.")
+    if options.get('partition_by'):
+        parse_partition_by(options['partition_by'])
+    return {
+        'output_format': output_format,
+        'incremental': bool(options.get('incremental')),
+        'accumulated': bool(options.get('accumulated')),
+        'join_snapshot': bool(options.get('join_snapshot')),
+        'partition_by': options.get('partition_by'),
+        'split': split_options(split_rows, options.get('split_by'), options.get('split_into', SPLIT_FILES)),
+    }
+
+def server_pipelines(project_root, config_file, query_concurrency):
+    """Pipelines of the job server: name -> callable(year, month, options from job_options)."""
+    # Jobs of different periods must not refresh the payment summary at the same time
+    accumulated_lock = threading.Lock()
+
+    def contratos(year, month, options):
+        if options['accumulated']:
+            with accumulated_lock:
+                if not refresh_accumulated_amounts(config_file, year, month, options['incremental']):
+                    print("Failed to refresh the payment summary, MONTO ACUMULADO cannot be filled.")
+                    return False
+        return process_contratos(project_root, config_file, year, month, options['incremental'], options['accumulated'],
+                                 options['output_format'], options['split'], options['partition_by'], query_concurrency)
+
+    return {
+        "contratos": contratos,
+        "auxventas": lambda year, month, options: process_auxiliary_sales(project_root, config_file, year, month, options['incremental'],
+                                                                          options['output_format'], options['split'], options['partition_by'],
+                                                                          query_concurrency, options['join_snapshot']),
+        "conciliacion": lambda year, month, options: process_reconciliation(project_root, config_file, year, month,
+                                                                            output_format=options['output_format']),
+    }
+
+def warm_up_server(project_root, config_file):
+    """
+    Loads once what every report run would load again: the connection pool
+    (with the MySQL driver), the result cache settings and the parsed templates.
+    Returns the warm state shown by GET /health, or None when the pool is unavailable.
+    """
+    try:
+        pool_size = get_connection_pool(config_file).pool_size
+        result_cache = get_result_cache(config_file)
+    except Exception as e:
+        print(f"Cannot start the job server, database connection pool unavailable: {e}")
+        return None
+    templates = []
+    for template_name in SERVER_TEMPLATES:
+        template_path = os.path.join(project_root, "data", template_name)
+        if os.path.exists(template_path):
+            get_excel_template(template_path)
+            templates.append(template_name)
+    return {'pool_size': pool_size, 'result_cache': result_cache is not None, 'templates': templates}
+
+def run_server(project_root, config_file, host, port, workers, db_concurrency):
+    """
+    Runs the resident job server (bancarizacion/job_server.py) until interrupted.
+    As in batch runs, the pooled connections are shared out between the jobs querying at once.
+    """
+    warm_state = warm_up_server(project_root, config_file)
+    if warm_state is None:
+        return False
+    db_concurrency = max(1, min(db_concurrency, warm_state['pool_size']))
+    query_concurrency = max(1, warm_state['pool_size'] // db_concurrency)
+    server = JobServer(server_pipelines(project_root, config_file, query_concurrency), validate_options=job_options,
+                       workers=workers, db_concurrency=db_concurrency, info=warm_state)
+    try:
+        return server.serve(host, port)
+    except OSError as e:
+        print(f"Cannot start the job server on {host}:{port}: {e}")
+        return False
+
+def parse_arguments(argv):
+    """Parses the command line. The positional process is optional; no process runs all of them."""
+    parser = argparse.ArgumentParser(description="Bancarizacion reports for SIAT.")
+    parser.add_argument("process", nargs="?", choices=["contratos", "auxventas", "zipcontratos", "conciliacion", "explain", "serve"],
+                        help="Process to run. Runs 'contratos', 'auxventas' and 'zipcontratos' when omitted. "
+                             "'serve' starts the resident job server.")
+    parser.add_argument("--from", dest="period_from", metavar="YYYY-MM",
+                        help="First period of a batch run (runs 'contratos' and/or 'auxventas' for every month of the range)")
+    parser.add_argument("--to", dest="period_to", metavar="YYYY-MM",
+                        help="Last period of a batch run (defaults to --from)")
+    parser.add_argument("--workers", type=int, default=DEFAULT_WORKERS,
+                        help=f"Worker threads for batch runs and jobs running at once in 'serve' (default {DEFAULT_WORKERS})")
+    parser.add_argument("--db-concurrency", type=int, default=DEFAULT_DB_CONCURRENCY,
+                        help=f"Maximum pipelines querying the database at once in batch runs and 'serve' (default {DEFAULT_DB_CONCURRENCY})")
+    parser.add_argument("--sequential", action="store_true",
+                        help="Run the three processes one after another instead of concurrently (no process argument only)")
+    parser.add_argument("--amount-tolerance", type=Decimal, default=DEFAULT_AMOUNT_TOLERANCE,
+                        help=f"'conciliacion': maximum amount difference (Bs) of a match without transfer code (default {DEFAULT_AMOUNT_TOLERANCE})")
+    parser.add_argument("--date-tolerance", type=int, default=DEFAULT_DATE_TOLERANCE_DAYS,
+                        help=f"'conciliacion': maximum days between payment and statement line (default {DEFAULT_DATE_TOLERANCE_DAYS})")
+    parser.add_argument("--metrics", action="store_true",
+                        help="Print per-stage timings, rows/sec and memory growth at the end of the run")
+    parser.add_argument("--metrics-file", metavar="PATH",
+                        help="Append the per-stage metrics of the run to PATH as JSON lines")
+    parser.add_argument("--incremental", action="store_true",
+                        help="Fetch only new or changed rows of 'contratos'/'auxventas' and regenerate the reports from the local period snapshots")
+    parser.add_argument("--format", dest="output_formats", action="append", metavar="[PIPELINE=]FORMAT",
+                        help=f"Output format ({', '.join(OUTPUT_FORMATS)}; default {DEFAULT_OUTPUT_FORMAT}), for every pipeline "
+                             "or one of them (e.g. --format csv --format contratos=xlsx). Repeatable.")
+    parser.add_argument("--zips", metavar="DIR_OR_GLOB",
+                        help="'zipcontratos': parse every workbook and sheet of these zips in parallel and merge them (default: data/ContratosXlsx.zip only)")
+    parser.add_argument("--zip-workers", type=int,
+                        help="'zipcontratos': worker processes for --zips (default: number of CPUs)")
+    parser.add_argument("--excel-engine", choices=["openpyxl", FAST_EXCEL_ENGINE],
+                        help=f"'zipcontratos': pandas Excel parser; '{FAST_EXCEL_ENGINE}' is much faster but needs python-calamine "
+                             "(default: the pandas default)")
+    parser.add_argument("--accumulated", action="store_true",
+                        help="'contratos': fill MONTO ACUMULADO from the monthly payment summary, refreshing it up to the period first")
+    parser.add_argument("--partition-by", metavar="almacen|idFactura[:ROWS]",
+                        help="'contratos'/'auxventas': fetch the period as concurrent sub-queries, one per almacen or per invoice id "
+                             f"range of about ROWS rows (default {DEFAULT_PARTITION_ROWS}), for periods whose query hits the database statement timeout")
+    parser.add_argument("--query-concurrency", type=int, default=DEFAULT_QUERY_CONCURRENCY,
+                        help=f"Sub-queries of --partition-by running at once (default {DEFAULT_QUERY_CONCURRENCY}, capped at the pool size)")
+    parser.add_argument("--join-snapshot", action="store_true",
+                        help="'auxventas': join the payments and CUFs from the local snapshot (data/snapshots, refreshed incrementally) "
+                             "instead of resolving them in the query")
+    parser.add_argument("--split-rows", type=int, metavar="N",
+                        help="'contratos'/'auxventas': write at most N rows per output chunk (file or sheet) and a manifest")
+    parser.add_argument("--split-by", metavar="COLUMN[:week|month]",
+                        help="'contratos'/'auxventas': write one chunk per value of COLUMN (e.g. almacen) or per week/month of a date column "
+                             "(e.g. fechaFac:week), with a manifest")
+    parser.add_argument("--split-into", choices=[SPLIT_FILES, SPLIT_SHEETS], default=SPLIT_FILES,
+                        help="Write the chunks to separate files, in parallel (default), or to the sheets of one xlsx workbook")
+    parser.add_argument("--split-workers", type=int,
+                        help="Worker processes writing chunk files (default: number of CPUs)")
+    parser.add_argument("--host", default=DEFAULT_HOST,
+                        help=f"'serve': address to listen on (default {DEFAULT_HOST}, local only)")
+    parser.add_argument("--port", type=int, default=DEFAULT_PORT,
+                        help=f"'serve': port to listen on (default {DEFAULT_PORT})")
+    return parser.parse_args(argv)
 
 if __name__ == "__main__":
     print("--- Starting Bancarizacion Application ---")
@@ -162,24 +605,81 @@ if __name__ == "__main__":
     # output_file is not directly used here anymore as each function defines its own output.
     
     print(f"Using config file: {config_file}")    # Check command-line arguments
-    args = sys.argv[1:] # Get arguments, excluding the script name
+    args = parse_arguments(sys.argv[1:]) # Get arguments, excluding the script name
+    exit_code = 0
+    try:
+        output_formats = parse_output_formats(args.output_formats)
+    except ValueError as e:
+        print(f"Invalid --format: {e}")
+        sys.exit(2)
+    try:
+        if args.partition_by:
+            parse_partition_by(args.partition_by)
+    except ValueError as e:
+        print(f"Invalid --partition-by: {e}")
+        sys.exit(2)
+    try:
+        split = split_options(args.split_rows, args.split_by, args.split_into, args.split_workers)
+    except ValueError as e:
+        print(f"Invalid split options: {e}")
+        sys.exit(2)
+    metrics = MetricsCollector() if args.metrics or args.metrics_file else None
+    set_collector(metrics)
     
-    if not args:
+    if args.period_from or args.period_to:
+        if not args.period_from:
+            print("--to requires --from.")
+            exit_code = 2
+        elif not run_batch(project_root, config_file, args.process, args.period_from, args.period_to, args.workers, args.db_concurrency, args.incremental, args.accumulated,
+                           output_formats, split, args.partition_by, args.join_snapshot):
+            exit_code = 1
+    elif not args.process:
         # No arguments provided, run all processes
         print("No specific process requested, running 'contratos', 'auxventas', and 'zipcontratos'.")
-        process_contratos(project_root, config_file)
-        process_auxiliary_sales(project_root, config_file)
-        process_zipped_contracts(project_root)
-    elif "contratos" in args:
+        exit_code = run_all(project_root, config_file, sequential=args.sequential, incremental=args.incremental, accumulated=args.accumulated,
+                            output_formats=output_formats, split=split, partition_by=args.partition_by,
+                            query_concurrency=args.query_concurrency, join_snapshot=args.join_snapshot,
+                            excel_engine=args.excel_engine)
+    elif args.process == "contratos":
         print("Processing 'contratos' requested.")
-        process_contratos(project_root, config_file)
-    elif "auxventas" in args:
+        if args.accumulated and not refresh_accumulated_amounts(config_file, DEFAULT_YEAR, DEFAULT_MONTH, args.incremental):
+            print("Failed to refresh the payment summary, MONTO ACUMULADO cannot be filled.")
+            exit_code = 1
+        elif pipeline_status(process_contratos(project_root, config_file, incremental=args.incremental, accumulated=args.accumulated,
+                                               output_format=output_format_for(output_formats, "contratos"), split=split,
+                                               partition_by=args.partition_by, query_concurrency=args.query_concurrency)) == "failed":
+            exit_code = 1
+    elif args.process == "auxventas":
         print("Processing 'auxventas' requested.")
-        process_auxiliary_sales(project_root, config_file)
-    elif "zipcontratos" in args:
+        if pipeline_status(process_auxiliary_sales(project_root, config_file, incremental=args.incremental,
+                                                   output_format=output_format_for(output_formats, "auxventas"), split=split,
+                                                   partition_by=args.partition_by, query_concurrency=args.query_concurrency,
+                                                   join_snapshot=args.join_snapshot)) == "failed":
+            exit_code = 1
+    elif args.process == "zipcontratos":
         print("Processing 'zipcontratos' requested.")
-        process_zipped_contracts(project_root)
-    else:
-        print("Invalid argument. Available options: 'contratos', 'auxventas', 'zipcontratos', or no argument to run all.")
+        if pipeline_status(process_zipped_contracts(project_root, engine=args.excel_engine, zip_source=args.zips, max_workers=args.zip_workers,
+                                                    output_format=output_format_for(output_formats, "zipcontratos"))) == "failed":
+            exit_code = 1
+    elif args.process == "conciliacion":
+        print("Processing 'conciliacion' requested.")
+        if pipeline_status(process_reconciliation(project_root, config_file, amount_tolerance=args.amount_tolerance,
+                                                  date_tolerance_days=args.date_tolerance,
+                                                  output_format=output_format_for(output_formats, "conciliacion"))) == "failed":
+            exit_code = 1
+    elif args.process == "explain":
+        print("EXPLAIN of the period queries requested.")
+        explain_period_queries(year=DEFAULT_YEAR, month=DEFAULT_MONTH, config_file_path=config_file)
+    elif args.process == "serve":
+        print("Job server requested.")
+        if not run_server(project_root, config_file, args.host, args.port, args.workers, args.db_concurrency):
+            exit_code = 1
+
+    if metrics is not None:
+        if args.metrics:
+            metrics.print_summary()
+        if args.metrics_file:
+            metrics.write_json_lines(args.metrics_file)
 
     print("\\n--- Bancarizacion Application Finished ---")
+    sys.exit(exit_code)
@@ -0,0 +1,52 @@
+# C:\Users\willy\Projects\bancarizacion\tests\conftest.py
+"""
+Fixtures of the test suite. The period queries run against the SQLite
+stand-in of the benchmarks (benchmarks/sqlite_standin.py), so no MySQL
+server is needed: get_pooled_connection opens the stand-in database file
+and the connection pool and result cache lookups are replaced.
+"""
+import shutil
+import types
+
+import pytest
+
+import bancarizacion.async_queries as async_queries
+import bancarizacion.core_logic as core_logic
+from benchmarks.sqlite_standin import open_standin
+
+YEAR, MONTH = 2025, 3
+STANDIN_INVOICES = 1500
+STANDIN_POOL_SIZE = 4
+
+@pytest.fixture(scope="session")
+def standin_path(tmp_path_factory):
+    """A stand-in database file of the period. Every 7th invoice has no almacen."""
+    path = str(tmp_path_factory.mktemp("standin") / "bancarizacion.sqlite")
+    cnx, _ = open_standin(STANDIN_INVOICES, database_path=path, year=YEAR, month=MONTH)
+    cnx.sqlite.execute("UPDATE factura SET almacen = NULL WHERE idFactura % 7 = 0")
+    cnx.sqlite.commit()
+    cnx.close()
+    return path
+
+def _use_standin(monkeypatch, database_path):
+    def connect(*args, **kwargs):
+        return open_standin(0, database_path=database_path, year=YEAR, month=MONTH)[0]
+
+    pool = lambda *args: types.SimpleNamespace(pool_size=STANDIN_POOL_SIZE)
+    monkeypatch.setattr(core_logic, "get_pooled_connection", connect)
+    monkeypatch.setattr(core_logic, "get_result_cache", lambda *args: None)
+    monkeypatch.setattr(core_logic, "get_connection_pool", pool)
+    monkeypatch.setattr(async_queries, "get_connection_pool", pool)
+    return connect
+
+@pytest.fixture
+def standin(standin_path, monkeypatch):
+    """Points the pooled connections at the stand-in database; returns a function opening a connection to it."""
+    return _use_standin(monkeypatch, standin_path)
+
+@pytest.fixture
+def writable_standin(standin_path, tmp_path, monkeypatch):
+    """Like standin, on a copy of the database the test may modify."""
+    database_path = str(tmp_path / "bancarizacion.sqlite")
+    shutil.copy(standin_path, database_path)
+    return _use_standin(monkeypatch, database_path)
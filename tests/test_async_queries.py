@@ -0,0 +1,44 @@
+# C:\Users\willy\Projects\bancarizacion\tests\test_async_queries.py
+"""Partitioned period queries return the same rows as the single period query."""
+import pytest
+
+from bancarizacion.async_queries import (
+    AUXILIARY_SALES_ORDER_COLUMN, get_auxiliary_sales_data_partitioned, get_sales_invoice_data_partitioned,
+    id_ranges, run_async
+)
+from bancarizacion.core_logic import get_auxiliary_sales_data, get_sales_invoice_data
+from bancarizacion.query_builder import NULL_ALMACEN, build_partition_filter
+from tests.conftest import MONTH, YEAR
+
+PARTITIONS = ["almacen", "idFactura:200", "idFactura"]
+
+def _as_multiset(rows):
+    return sorted(repr(row) for row in rows)
+
+def test_null_almacen_partition_filters_null():
+    assert build_partition_filter(almacen=NULL_ALMACEN) == ("\n            AND f.almacen IS NULL", ())
+    assert build_partition_filter(almacen=2)[1] == (2,)
+
+@pytest.mark.parametrize("partition_by", PARTITIONS)
+def test_partitioned_contratos_equal_single_query(standin, partition_by):
+    single = get_sales_invoice_data(YEAR, MONTH, use_cache=False)
+    partitioned = run_async(get_sales_invoice_data_partitioned([(YEAR, MONTH)], partition_by=partition_by, concurrency=3, use_cache=False))
+    assert len(partitioned) == len(single)
+    assert _as_multiset(partitioned) == _as_multiset(single)
+
+@pytest.mark.parametrize("partition_by", PARTITIONS)
+def test_partitioned_auxventas_equal_single_query(standin, partition_by):
+    single = get_auxiliary_sales_data(YEAR, MONTH, use_cache=False, positional=True)
+    partitioned = run_async(get_auxiliary_sales_data_partitioned([(YEAR, MONTH)], partition_by=partition_by, concurrency=3,
+                                                                 use_cache=False, positional=True))
+    assert any(row[single.column_index('almacen')] is None for row in single.rows)
+    assert partitioned.columns == single.columns
+    assert _as_multiset(partitioned.rows) == _as_multiset(single.rows)
+    # The partitions are merged in the order of the single query
+    index = single.column_index(AUXILIARY_SALES_ORDER_COLUMN)
+    assert [row[index] for row in partitioned.rows] == [row[index] for row in single.rows]
+
+def test_id_ranges_cover_the_ids_once():
+    ranges = id_ranges(1000, 5, 4321, partition_rows=250)
+    assert ranges[0][0] == 5 and ranges[-1][1] == 4322
+    assert all(high == next_low for (_, high), (next_low, _) in zip(ranges, ranges[1:]))
@@ -0,0 +1,53 @@
+# C:\Users\willy\Projects\bancarizacion\tests\test_excel_templates.py
+"""The write-only template engine produces the same cells as loading and filling the template."""
+import os
+import warnings
+from copy import copy
+from datetime import date
+from decimal import Decimal
+
+import openpyxl
+import pytest
+from openpyxl.styles import Font
+
+from bancarizacion.core_logic import populate_excel_from_template
+from bancarizacion.excel_templates import ExcelTemplate, font_appearance, get_excel_template
+
+DATA_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "data")
+
+def _rows(width, count):
+    values = [7, "CONTRATO DE VENTA", date(2025, 3, 4), Decimal("75000.50"), None, "", 12.5]
+    return [tuple(values[(row + column) % len(values)] for column in range(width)) for row in range(count)]
+
+def _cells(file_path):
+    with warnings.catch_warnings():
+        warnings.simplefilter("ignore")
+        sheet = openpyxl.load_workbook(file_path).active
+    # Empty data cells are not written, so they show the workbook's default style
+    return [
+        [(cell.value, font_appearance(cell.font), copy(cell.fill), copy(cell.border), copy(cell.alignment), cell.number_format)
+         if cell.value is not None or cell.row == 1 else None for cell in row]
+        for row in sheet.iter_rows()
+    ]
+
+@pytest.mark.parametrize("template_name", ["PlantillaContratos.xlsx", "PlantillaVenta.xlsx"])
+def test_write_only_matches_the_loaded_template(tmp_path, template_name):
+    template_file_path = os.path.join(DATA_DIR, template_name)
+    width = len(get_excel_template(template_file_path).rows[-1])
+    rows = _rows(width, 20)
+    paths = {}
+    for write_only in (False, True):
+        paths[write_only] = str(tmp_path / f"write_only_{write_only}.xlsx")
+        assert populate_excel_from_template(rows, template_file_path, paths[write_only], column_order=None, write_only=write_only)
+    assert _cells(paths[True]) == _cells(paths[False])
+
+def test_data_cells_get_a_different_default_font(tmp_path):
+    template = ExcelTemplate(os.path.join(DATA_DIR, "PlantillaContratos.xlsx"))
+    template.default_font = Font(name="Arial", sz=9)
+    output_file_path = str(tmp_path / "arial.xlsx")
+    assert template.write(_rows(13, 3), output_file_path, None) == 3
+    with warnings.catch_warnings():
+        warnings.simplefilter("ignore")
+        sheet = openpyxl.load_workbook(output_file_path).active
+    fonts = {(cell.font.name, cell.font.sz) for row in sheet.iter_rows(min_row=2) for cell in row if cell.value is not None}
+    assert fonts == {("Arial", 9)}
@@ -0,0 +1,18 @@
+# C:\Users\willy\Projects\bancarizacion\tests\test_imports.py
+"""Importing the CLI or core_logic must not load the heavy dependencies (they are imported where used)."""
+import os
+import subprocess
+import sys
+
+import pytest
+
+PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+HEAVY_MODULES = ("mysql", "openpyxl", "pandas", "pyarrow", "numpy")
+
+@pytest.mark.parametrize("module", ["main", "bancarizacion.core_logic"])
+def test_import_loads_no_heavy_module(module):
+    code = (f"import sys, {module}\n"
+            f"print(' '.join(sorted({{name.split('.')[0] for name in sys.modules}} & set({HEAVY_MODULES!r}))))")
+    completed = subprocess.run([sys.executable, "-c", code], cwd=PROJECT_ROOT, stdin=subprocess.DEVNULL,
+                               capture_output=True, text=True, check=True)
+    assert completed.stdout.split() == []
@@ -0,0 +1,56 @@
+# C:\Users\willy\Projects\bancarizacion\tests\test_incremental.py
+"""Incremental period snapshots: the watermark merge and the re-check of changed invoices."""
+import pytest
+
+from bancarizacion.core_logic import refresh_period_snapshot
+from bancarizacion.incremental import SNAPSHOT_SPECS, PeriodSnapshot, merge_snapshot_rows
+from tests.conftest import MONTH, YEAR
+
+def _stored_rows(snapshot_dir, name):
+    rows, _ = PeriodSnapshot(snapshot_dir, name, YEAR, MONTH).load()
+    return sorted(repr(sorted(row.items())) for row in rows)
+
+def _change_period(cnx):
+    """A voided and a paid invoice, a new invoice with its payment and a bank statement for an unmatched payment."""
+    voided_id, paid_id = [row[0] for row in cnx.execute(
+        "SELECT DISTINCT f.idFactura FROM factura f JOIN pago_factura pf ON pf.idFactura = f.idFactura "
+        "JOIN pago p ON p.idPago = pf.idPago WHERE f.anulada = 0 AND f.total >= 50000 AND f.nFactura > 0 "
+        "AND p.fechaPago >= '2025-03-01' AND p.fechaPago < '2025-04-01' ORDER BY f.idFactura LIMIT 2")]
+    cnx.execute("UPDATE factura SET anulada = 1 WHERE idFactura = ?", (voided_id,))
+    cnx.execute("UPDATE factura SET pagada = 1 - pagada WHERE idFactura = ?", (paid_id,))
+    cnx.execute("INSERT INTO factura VALUES (99001, 99001, '2025-03-10', '75000.00', 0, 1, '1028255024', 'YPFB REFINACION S.A.', 2, 1)")
+    cnx.execute("INSERT INTO pago VALUES (99001, '2025-03-11', 'TRF99001', 2, 'PAGO FACTURA', '')")
+    cnx.execute("INSERT INTO pago_factura VALUES (99001, 99001, 99001)")
+    unmatched = cnx.execute(
+        "SELECT p.transferencia FROM pago p WHERE p.transferencia <> '' AND p.fechaPago >= '2025-03-01' AND p.fechaPago < '2025-04-01' "
+        "AND p.transferencia NOT IN (SELECT codigo FROM extractos) LIMIT 1").fetchone()
+    if unmatched:
+        cnx.execute("INSERT INTO extractos VALUES (99001, ?, '2025-03-20', 75000, 1, 'ABONO', '', '', '')", unmatched)
+    cnx.commit()
+
+@pytest.mark.parametrize("name", ["contratos", "auxventas"])
+def test_incremental_refresh_equals_full_refresh(writable_standin, tmp_path, name):
+    incremental_dir, full_dir = str(tmp_path / "incremental"), str(tmp_path / "full")
+    assert refresh_period_snapshot(name, YEAR, MONTH, snapshot_dir=incremental_dir)
+    cnx = writable_standin()
+    _change_period(cnx.sqlite)
+    cnx.close()
+
+    rows = refresh_period_snapshot(name, YEAR, MONTH, snapshot_dir=incremental_dir)
+    assert refresh_period_snapshot(name, YEAR, MONTH, snapshot_dir=full_dir, full=True)
+    assert _stored_rows(incremental_dir, name) == _stored_rows(full_dir, name)
+    invoice_column = SNAPSHOT_SPECS[name]['invoice_column']
+    assert 99001 in {row[invoice_column] for row in rows}
+    _, state = PeriodSnapshot(incremental_dir, name, YEAR, MONTH).load()
+    assert state['watermarks'][invoice_column] == 99001
+
+def test_merge_replaces_unmatched_payment_rows():
+    spec = SNAPSHOT_SPECS['auxventas']
+    rows = [
+        {'idFactura': 1, 'idPago': 10, 'idExtracto': None, 'fechaDocumentoRespaldo': "2025-03-02"},
+        {'idFactura': 2, 'idPago': 20, 'idExtracto': 5, 'fechaDocumentoRespaldo': "2025-03-01"},
+        {'idFactura': 3, 'idPago': 30, 'idExtracto': 6, 'fechaDocumentoRespaldo': "2025-03-03"},
+    ]
+    new_rows = [{'idFactura': 1, 'idPago': 10, 'idExtracto': 7, 'fechaDocumentoRespaldo': "2025-03-02"}]
+    merged = merge_snapshot_rows(rows, new_rows, spec, dropped_invoice_ids={"3"})
+    assert [(row['idFactura'], row['idExtracto']) for row in merged] == [(2, 5), (1, 7)]
@@ -0,0 +1,20 @@
+# C:\Users\willy\Projects\bancarizacion\tests\test_instrumentation.py
+"""Stage metrics: memory is reported as the stage's own RSS growth, not the process high-water mark."""
+from bancarizacion.instrumentation import MetricsCollector, collecting, stage
+
+MIB = 1024 * 1024
+
+def test_rss_growth_is_per_stage():
+    collector = MetricsCollector()
+    with collecting(collector):
+        with stage("allocate"):
+            block = bytearray(64 * MIB)
+        del block
+        with stage("idle"):
+            pass
+    growth = {record['stage']: record['rss_growth_mib'] for record in collector.records}
+    if growth['allocate'] is None:
+        return  # RSS cannot be read on this platform
+    assert growth['allocate'] >= 60
+    assert growth['idle'] < 8
+    assert all(record['process_peak_rss_mib'] >= 64 for record in collector.records)
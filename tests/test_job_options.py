@@ -0,0 +1,27 @@
+# C:\Users\willy\Projects\bancarizacion\tests\test_job_options.py
+"""Options of job server requests are validated before the job is queued."""
+import pytest
+
+from main import job_options
+
+@pytest.mark.parametrize("options", [
+    {'split_by': ["almacen"]},
+    {'split_by': 3},
+    {'partition_by': {'key': "almacen"}},
+    {'split_rows': [1000]},
+    {'split_rows': 1000.5},
+    {'split_rows': True},
+    {'split_rows': "mil"},
+    {'split_into': 1},
+    {'incremental': "false"},
+    {'format': ["csv"]},
+])
+def test_invalid_option_types_raise_value_error(options):
+    with pytest.raises(ValueError):
+        job_options("auxventas", options)
+
+def test_valid_options():
+    options = job_options("auxventas", {'format': "csv", 'split_rows': "1000", 'split_by': "almacen", 'incremental': True})
+    assert options['output_format'] == "csv" and options['incremental'] is True
+    assert options['split']['max_rows'] == 1000 and options['split']['group_by'] == "almacen"
+    assert job_options("auxventas", {'split_rows': 500})['split']['max_rows'] == 500
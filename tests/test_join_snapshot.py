@@ -0,0 +1,58 @@
+# C:\Users\willy\Projects\bancarizacion\tests\test_join_snapshot.py
+"""The Registro Auxiliar joined from the join snapshot equals the auxiliary sales query."""
+from decimal import Decimal
+
+from bancarizacion.core_logic import get_auxiliary_sales_data, get_auxiliary_sales_data_from_snapshot, refresh_join_snapshot
+from bancarizacion.join_snapshot import JoinSnapshot
+from tests.conftest import MONTH, YEAR
+
+def _normalized(rows, columns):
+    # SQLite returns the montoRecibido of the query as a float, MySQL and the snapshot join as a Decimal
+    index = columns.index('montoRecibido')
+    return sorted(repr(row[:index] + (None if row[index] is None else Decimal(str(row[index])),) + row[index + 1:]) for row in rows)
+
+def _assert_snapshot_equals_query(snapshot_dir):
+    query_rows = get_auxiliary_sales_data(YEAR, MONTH, use_cache=False, positional=True)
+    snapshot_rows = get_auxiliary_sales_data_from_snapshot(YEAR, MONTH, snapshot_dir=snapshot_dir, positional=True)
+    assert len(snapshot_rows) == len(query_rows) > 0
+    assert list(snapshot_rows.columns) == list(query_rows.columns)
+    assert _normalized(snapshot_rows.rows, snapshot_rows.columns) == _normalized(query_rows.rows, query_rows.columns)
+    index = query_rows.column_index('tipoDocPagoOriginal')
+    assert {row[index] for row in snapshot_rows.rows} <= {'1', '4', ''}
+    index = query_rows.column_index('fechaDocumentoRespaldo')
+    assert [row[index] for row in snapshot_rows.rows] == [row[index] for row in query_rows.rows]
+
+def test_snapshot_join_equals_query(standin, tmp_path):
+    _assert_snapshot_equals_query(str(tmp_path))
+
+def test_edited_and_new_payment_links_are_read(writable_standin, tmp_path):
+    snapshot_dir = str(tmp_path / "snapshot")
+    _assert_snapshot_equals_query(snapshot_dir)
+    cnx = writable_standin()
+    # A transfer code corrected after the refresh, and an older payment linked to another invoice
+    payment_id, invoice_id = cnx.sqlite.execute(
+        "SELECT p.idPago, pf.idFactura FROM pago p JOIN pago_factura pf ON pf.idPago = p.idPago WHERE p.transferencia <> '' LIMIT 1").fetchone()
+    cnx.sqlite.execute("UPDATE pago SET transferencia = 'CORREGIDO' WHERE idPago = ?", (payment_id,))
+    unpaid_id = cnx.sqlite.execute(
+        "SELECT f.idFactura FROM factura f WHERE f.idFactura NOT IN (SELECT idFactura FROM pago_factura) AND f.anulada = 0 LIMIT 1").fetchone()[0]
+    cnx.sqlite.execute("INSERT INTO pago_factura VALUES (?, ?, ?)", (10 ** 6, payment_id, unpaid_id))
+    cnx.sqlite.commit()
+    cnx.close()
+    _assert_snapshot_equals_query(snapshot_dir)
+
+def test_incremental_refresh_equals_full_build(writable_standin, tmp_path):
+    incremental = refresh_join_snapshot(snapshot_dir=str(tmp_path / "incremental"))
+    cnx = writable_standin()
+    # A new SIAT invoice of the period with its payment, and a pending CUF that arrives
+    cnx.sqlite.execute("INSERT INTO factura VALUES (99001, 99001, '2025-03-10', '75000.00', 0, 1, '1028255024', 'YPFB REFINACION S.A.', 2, 1)")
+    cnx.sqlite.execute("INSERT INTO factura_siat VALUES (99001, 99001, '75000.00', 'ABCDEF')")
+    cnx.sqlite.execute("INSERT INTO pago VALUES (99001, '2025-03-11', '99001', 2, 'PAGO FACTURA', '')")
+    cnx.sqlite.execute("INSERT INTO pago_factura VALUES (99001, 99001, 99001)")
+    cnx.sqlite.commit()
+    cnx.close()
+    incremental = refresh_join_snapshot(snapshot_dir=str(tmp_path / "incremental"))
+    full = refresh_join_snapshot(snapshot_dir=str(tmp_path / "full"), full=True)
+    key = lambda snapshot: sorted(map(repr, snapshot.read_documents().to_pylist()))
+    assert key(incremental) == key(full)
+    assert JoinSnapshot(str(tmp_path / "incremental")).load_state()['max_invoice_id'] == 99001
+    _assert_snapshot_equals_query(str(tmp_path / "incremental"))
@@ -0,0 +1,35 @@
+# C:\Users\willy\Projects\bancarizacion\tests\test_output_writers.py
+"""Parquet output: the schema covers every batch, not only the first one."""
+from datetime import date
+from decimal import Decimal
+
+import pyarrow as pa
+import pyarrow.parquet as pq
+
+from bancarizacion.output_writers import write_parquet
+
+HEADERS = ["idFactura", "montoRecibido", "fechaDocumentoRespaldo", "numeroCheque"]
+
+def test_null_first_batch_takes_later_types(tmp_path):
+    rows = [
+        (1, None, None, None),
+        (2, None, None, None),
+        (3, Decimal("75000.50"), date(2025, 3, 4), None),
+        (4, Decimal("12.125"), None, None),
+        (5, Decimal("7"), date(2025, 3, 5), None),
+    ]
+    output_file_path = str(tmp_path / "auxventas.parquet")
+    assert write_parquet(rows, HEADERS, output_file_path, batch_rows=2) == len(rows)
+
+    table = pq.read_table(output_file_path)
+    assert table.schema.field("montoRecibido").type == pa.decimal128(38, 3)
+    assert table.schema.field("fechaDocumentoRespaldo").type == pa.date32()
+    assert pa.types.is_null(table.schema.field("numeroCheque").type)
+    assert table.column("montoRecibido").to_pylist() == [None, None, Decimal("75000.50"), Decimal("12.125"), Decimal("7")]
+    assert table.column("idFactura").to_pylist() == [1, 2, 3, 4, 5]
+    assert not [name for name in tmp_path.iterdir() if ".tmp" in name.name]
+
+def test_empty_rows_write_the_headers(tmp_path):
+    output_file_path = str(tmp_path / "empty.parquet")
+    assert write_parquet(iter(()), HEADERS, output_file_path) == 0
+    assert pq.read_table(output_file_path).column_names == HEADERS
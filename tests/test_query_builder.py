@@ -0,0 +1,25 @@
+# C:\Users\willy\Projects\bancarizacion\tests\test_query_builder.py
+"""Index advice from EXPLAIN rows."""
+from bancarizacion.query_builder import advise_indexes
+
+def _advice(access_type, key):
+    return advise_indexes([{'table': 'f', 'type': access_type, 'key': key, 'rows': 1000}])[0]
+
+def test_full_table_scan_suggests_the_index():
+    entry = _advice('ALL', None)
+    assert entry['suggestion'] == "CREATE INDEX idx_factura_fecha ON factura (fechaFac, anulada, total);"
+    assert entry['note'] is None
+
+def test_full_scan_of_another_index_suggests_the_index():
+    entry = _advice('index', 'PRIMARY')
+    assert entry['suggestion'] == "CREATE INDEX idx_factura_fecha ON factura (fechaFac, anulada, total);"
+    assert entry['note'] == "full scan of index PRIMARY, not the recommended idx_factura_fecha"
+
+def test_full_scan_of_the_recommended_index_is_reported():
+    entry = _advice('index', 'idx_factura_fecha')
+    assert entry['suggestion'] is None
+    assert entry['note'] == "full scan of the recommended index idx_factura_fecha"
+
+def test_index_lookup_needs_no_advice():
+    entry = _advice('range', 'idx_factura_fecha')
+    assert entry['suggestion'] is None and entry['note'] is None
@@ -0,0 +1,41 @@
+# C:\Users\willy\Projects\bancarizacion\tests\test_result_cache.py
+"""Streamed results are cached batch by batch, not collected in memory."""
+from decimal import Decimal
+
+from bancarizacion.core_logic import stream_positional_from_db, iter_data_from_db
+from bancarizacion.result_cache import ResultCache
+
+QUERY = "SELECT idFactura, total, almacen FROM factura ORDER BY idFactura"
+
+def test_streamed_positional_rows_are_cached(standin, tmp_path):
+    cache = ResultCache(str(tmp_path))
+    cnx = standin()
+    streamed = stream_positional_from_db(cnx, QUERY, (), batch_size=100, cache=cache, period="2025-03")
+    rows = list(streamed)
+    cnx.close()
+    cached = cache.get(QUERY, ())
+    assert cached is not None and len(cached) == len(rows) == 1500
+    positional = cache.get(QUERY, (), positional=True)
+    assert positional.columns == streamed.columns
+    assert positional.rows == rows
+
+def test_partly_consumed_stream_is_not_cached(standin, tmp_path):
+    cache = ResultCache(str(tmp_path))
+    cnx = standin()
+    rows = iter_data_from_db(cnx, QUERY, (), batch_size=100, cache=cache)
+    assert next(rows)['idFactura'] == 1
+    rows.close()
+    cnx.close()
+    assert cache.get(QUERY, ()) is None
+    assert [path.name for path in tmp_path.iterdir() if path.suffix != ".json"] == []
+
+def test_writer_stores_dict_batches(tmp_path):
+    cache = ResultCache(str(tmp_path))
+    writer = cache.writer(QUERY, ())
+    writer.write([{'idFactura': 1, 'total': None, 'almacen': None}])
+    writer.write([{'idFactura': 2, 'total': Decimal("50000.00"), 'almacen': 3}])
+    assert writer.close()
+    assert cache.get(QUERY, ()) == [
+        {'idFactura': 1, 'total': None, 'almacen': None},
+        {'idFactura': 2, 'total': Decimal("50000.00"), 'almacen': 3},
+    ]
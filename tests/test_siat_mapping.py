@@ -0,0 +1,24 @@
+# C:\Users\willy\Projects\bancarizacion\tests\test_siat_mapping.py
+"""SIAT Contratos rows from the column specs of CONTRATOS_MAPPING."""
+from datetime import date
+from decimal import Decimal
+
+import pytest
+
+from bancarizacion.siat_mapping import CONTRATOS_MAPPING, column_names, compile_row_mapper, field, map_rows
+
+def test_contratos_rows():
+    records = [
+        {'contractType': 2, 'transactionType': 1, 'contractObject': "X" * 150, 'contractNumber': "C-1",
+         'contractDate': date(2025, 3, 1), 'totalAmount': Decimal("75000.00"), 'exchangeValue': 0, 'numberOfInstallments': 3,
+         'advanceAmount': '', 'exchangeObject': None, 'accumulatedAmount': Decimal("10.5")},
+        {'contractType': 1, 'contractNumber': "C-2", 'contractDate': None, 'exchangeValue': Decimal("5"), 'advanceAmount': 7},
+    ]
+    rows = list(map_rows(records, CONTRATOS_MAPPING, start=5))
+    assert len(rows[0]) == len(column_names(CONTRATOS_MAPPING))
+    assert rows[0] == (5, 2, 1, "X" * 100, '', '', "01/03/2025", Decimal("75000.00"), '', 3, 0, "None", Decimal("10.5"))
+    assert rows[1] == (6, 1, None, '', '', "C-2", '', None, Decimal("5"), 1, 7, '', 0)
+
+def test_unknown_spec_is_rejected():
+    with pytest.raises(ValueError):
+        compile_row_mapper((("A", field('a')), ("B", {'kind': 'upper', 'key': 'b'})))
@@ -0,0 +1,24 @@
+# C:\Users\willy\Projects\bancarizacion\tests\test_streaming_errors.py
+"""Streamed queries: errors are reported by the fetching and writing functions instead of escaping them."""
+import bancarizacion.core_logic as core_logic
+from bancarizacion.core_logic import get_sales_invoice_data, write_to_excel
+
+from tests.conftest import MONTH, YEAR
+
+def test_failing_streamed_query_returns_none(standin, monkeypatch):
+    monkeypatch.setattr(core_logic, "build_sales_invoice_query", lambda *args, **kwargs: ("SELECT * FROM missing_table", ()))
+    assert get_sales_invoice_data(YEAR, MONTH, stream=True) is None
+
+def test_streamed_query_is_read(standin):
+    rows = get_sales_invoice_data(YEAR, MONTH, stream=True)
+    assert rows is not None
+    assert len(list(rows)) > 0
+
+def test_fetch_error_midway_returns_false(tmp_path):
+    def rows():
+        yield {"idFactura": 1}
+        raise RuntimeError("Lost connection to MySQL server during query")
+
+    output_file_path = str(tmp_path / "auxventas.xlsx")
+    assert write_to_excel(rows(), output_file_path, write_only=True) is False
+    assert not (tmp_path / "auxventas.xlsx").exists()